@@ -2,6 +2,7 @@
 
 """
 from abc import ABCMeta, abstractmethod
+import json
 import logging
 import time
 import timeit
@@ -17,7 +18,9 @@ from xcb.xproto import ExposeEvent, MapNotifyEvent, PropertyNotifyEvent
 import cairo
 
 import fttpwm.paint.fonts as fonts
+from fttpwm.paint.surface import benchmarkResultsFile
 from fttpwm.utils.x import findCurrentVisual
+from fttpwm.xdg import basedir
 
 
 logger = logging.getLogger("cairo_bench")
@@ -28,6 +31,9 @@ conn = xcb.connect()
 class BenchmarkCase(object):
     __metaclass__ = ABCMeta
 
+    # The name of the `fttpwm.paint.surface` class which uses the same rendering strategy as this case, if any.
+    surfaceCacheMethod = None
+
     def __init__(self, iterations=100, repetitions=20):
         self.iterations = iterations
         self.repetitions = repetitions
@@ -280,6 +286,7 @@ class BaseX11Case(BenchmarkCase):
 
 
 class Cairo_AlwaysRedraw(BaseX11Case):
+    surfaceCacheMethod = 'NoCachingSurface'
     strokeMatrix = cairo.Matrix(x0=0.5, y0=0.5)
 
     def setupWindow(self):
@@ -375,6 +382,7 @@ class Cairo_AlwaysRedraw(BaseX11Case):
 
 
 class Cairo_XPixmapCache_XRedraw(Cairo_AlwaysRedraw):
+    surfaceCacheMethod = None
     def setupWindow(self):
         self.setupWindowContext()
 
@@ -411,6 +419,7 @@ class Cairo_XPixmapCache_XRedraw(Cairo_AlwaysRedraw):
 
 
 class Cairo_XPixmapCache_CairoRedraw(Cairo_AlwaysRedraw):
+    surfaceCacheMethod = None
     def setupWindow(self):
         self.setupWindowContext()
 
@@ -445,6 +454,7 @@ class Cairo_XPixmapCache_CairoRedraw(Cairo_AlwaysRedraw):
 
 
 class Cairo_CairoImageCache(Cairo_AlwaysRedraw):
+    surfaceCacheMethod = None
     def setupWindow(self):
         self.setupWindowContext()
 
@@ -471,6 +481,7 @@ class Cairo_CairoImageCache(Cairo_AlwaysRedraw):
 
 
 class Cairo_XPixmapCache_XRedraw_RedrawText(Cairo_AlwaysRedraw):
+    surfaceCacheMethod = 'XPixmapSurface'
     def setupWindow(self):
         self.setupWindowContext()
         self.setupWindowText(self.context)
@@ -507,6 +518,7 @@ class Cairo_XPixmapCache_XRedraw_RedrawText(Cairo_AlwaysRedraw):
 
 
 class Cairo_XPixmapCache_CairoRedraw_RedrawText(Cairo_AlwaysRedraw):
+    surfaceCacheMethod = 'CairoPixmapSurface'
     def setupWindow(self):
         self.setupWindowContext()
         self.setupWindowText(self.context)
@@ -541,6 +553,7 @@ class Cairo_XPixmapCache_CairoRedraw_RedrawText(Cairo_AlwaysRedraw):
 
 
 class Cairo_CairoImageCache_RedrawText(Cairo_AlwaysRedraw):
+    surfaceCacheMethod = 'CairoImageSurface'
     def setupWindow(self):
         self.setupWindowContext()
         self.setupWindowText(self.context)
@@ -576,6 +589,11 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.NOTSET, format="{e}90m[{e}0;1m%(levelname)-8s{e}0;90m]{e}m "
             "{e}36m%(name)s{e}90m:{e}m  {e}2;3m%(message)s{e}m".format(e='\033['))
 
+    # With --save, record each surface caching strategy's best time so FTTPWM can pick the fastest one.
+    # (see the `surfaceCacheMethod` setting)
+    save = '--save' in sys.argv[1:]
+    bestTimes = dict()
+
     width, height = 256, 32
     iterations = 500
     repetitions = 25
@@ -588,5 +606,12 @@ if __name__ == '__main__':
             Cairo_XPixmapCache_CairoRedraw_RedrawText(width, height, iterations, repetitions),
             Cairo_CairoImageCache_RedrawText(width, height, iterations, repetitions),
             ]:
-        case.run()
+        results = case.run()
+        if case.surfaceCacheMethod is not None:
+            bestTimes[case.surfaceCacheMethod] = min(results)
         time.sleep(0.2)
+
+    if save:
+        with basedir.cache.writeFile(benchmarkResultsFile, 'w') as resultsFile:
+            json.dump(bestTimes, resultsFile, indent=4, sort_keys=True)
+        logger.info("Saved results to %s.", resultsFile.name)
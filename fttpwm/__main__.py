@@ -7,6 +7,7 @@ Licensed under the MIT license; see the LICENSE file for details.
 
 """
 import logging
+import os
 
 from . import logconfig
 
@@ -19,18 +20,39 @@ logger = logging.getLogger("fttpwm")
 from .x import XConnection
 from .wm import WM
 
-try:
-    from .eventloop.zmq_loop import ZMQEventLoop
+eventloop = None
 
-    eventloop = ZMQEventLoop()
-    logger.info("Using the ZeroMQ event loop.")
+if os.environ.get('FTTPWM_EVENTLOOP') == 'asyncio':
+    try:
+        from .eventloop.asyncio_loop import AsyncioEventLoop
 
-except ImportError:
-    logger.warn("Couldn't import zmq! Falling back to polling event loop.", exc_info=True)
+        eventloop = AsyncioEventLoop()
+        logger.info("Using the asyncio event loop.")
 
-    from .eventloop.poll_loop import PollEventLoop
+    except ImportError:
+        logger.warn("Couldn't import asyncio or trollius! Falling back to the default event loop.", exc_info=True)
 
-    eventloop = PollEventLoop()
+if eventloop is None:
+    try:
+        from .eventloop.zmq_loop import ZMQEventLoop
+
+        eventloop = ZMQEventLoop()
+        logger.info("Using the ZeroMQ event loop.")
+
+    except ImportError:
+        logger.warn("Couldn't import zmq! Falling back to epoll/polling event loop.", exc_info=True)
+
+        try:
+            from .eventloop.epoll_loop import EpollEventLoop
+
+            eventloop = EpollEventLoop()
+            logger.info("Using the epoll event loop.")
+
+        except (ImportError, AttributeError):
+            # select.epoll is only available on Linux.
+            from .eventloop.poll_loop import PollEventLoop
+
+            eventloop = PollEventLoop()
 
 
 x = XConnection()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: Atom table
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+import logging
+
+from xcb.xproto import Atom
+
+import xpybutil
+import xpybutil.ewmh
+import xpybutil.icccm
+import xpybutil.util
+
+
+logger = logging.getLogger("fttpwm.atoms")
+
+
+# Atoms we use which xpybutil doesn't intern for us; these are all interned at once when the X connection is set up.
+knownAtoms = [
+        # ICCCM (the WM_S<screen> selection atom is added by `XConnection`, once we know the screen number)
+        'WM_CLIENT_MACHINE',
+
+        # EWMH
+        '_NET_WM_STATE_FOCUSED', '_NET_MOVERESIZE_WINDOW',
+
+        # Wallpaper (see setroot.py)
+        '_XROOTPMAP_ID', 'ESETROOT_PMAP_ID',
+
+        # System tray
+        '_KDE_NET_WM_SYSTEM_TRAY_WINDOW_FOR',
+
+        # FTTPWM-specific
+        '_FTTPWM_LAYOUT_INFO',
+        ]
+
+
+class AtomTable(object):
+    """Maps atom names to atom IDs, and atom IDs back to names.
+
+    An atom's ID never changes for the lifetime of the X server, so once we've interned an atom, we never need to ask
+    for it again. Use `preload` to intern many atoms in a single round-trip.
+
+    """
+    def __init__(self):
+        self.ids = dict()
+        self.names = dict()
+
+        # The predefined atoms (WM_NAME, STRING, etc.) never need to be interned.
+        for name, atomID in vars(Atom).iteritems():
+            if name.isupper() and isinstance(atomID, int) and atomID != Atom._None:
+                self.add(name, atomID)
+
+        # xpybutil interns all EWMH and ICCCM atoms in a single burst when its modules are imported; reuse any which
+        # have already been resolved. The rest are still cookies; `preload` collects their replies.
+        for name, atomID in self._xpybutilCache().iteritems():
+            if isinstance(atomID, (int, long)):
+                self.add(name, atomID)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    @staticmethod
+    def _xpybutilCache():
+        return getattr(xpybutil.util, '__atom_cache', {})
+
+    def add(self, name, atomID):
+        name = str(name)
+        self.ids[name] = atomID
+        self.names[atomID] = name
+
+    def preload(self, names, conn=None):
+        """Intern all of the given atoms which we don't already know, using a single round-trip.
+
+        This also collects the replies to the requests xpybutil sent for the EWMH and ICCCM atoms when it was imported.
+
+        """
+        if conn is None:
+            conn = xpybutil.conn
+
+        # xpybutil's cache holds the cookies of its unanswered InternAtom requests; they've already been sent.
+        cookies = [
+                (str(name), cookie)
+                for name, cookie in self._xpybutilCache().iteritems()
+                if not isinstance(cookie, (int, long)) and str(name) not in self.ids
+                ]
+        pending = set(name for name, cookie in cookies)
+
+        # Send every request before waiting on any of the replies.
+        cookies.extend(
+                (name, conn.core.InternAtom(False, len(name), name))
+                for name in set(str(name) for name in names)
+                if name not in self.ids and name not in pending
+                )
+
+        if not cookies:
+            return
+
+        conn.flush()
+
+        for name, cookie in cookies:
+            try:
+                reply = cookie.reply()
+                self.add(name, getattr(reply, 'atom', reply))
+            except Exception:
+                logger.exception("Error interning atom %r!", name)
+
+        logger.debug("Preloaded %d atoms.", len(cookies))
+
+    def get(self, name, onlyIfExists=False):
+        """Get the ID of the atom with the given name, interning it if needed.
+
+        If `onlyIfExists` is True, the atom won't be created if it doesn't exist yet; in that case, `Atom._None` is
+        returned.
+
+        """
+        name = str(name)
+
+        try:
+            return self.ids[name]
+        except KeyError:
+            pass
+
+        logger.debug("Atom %r wasn't preloaded; interning it individually.", name)
+
+        atomID = xpybutil.conn.core.InternAtom(onlyIfExists, len(name), name).reply().atom
+        if atomID != Atom._None:
+            self.add(name, atomID)
+
+        return atomID
+
+    def name(self, atomID):
+        """Get the name of the atom with the given ID, fetching it from the X server if needed.
+
+        """
+        try:
+            return self.names[atomID]
+        except KeyError:
+            pass
+
+        name = str(xpybutil.conn.core.GetAtomName(atomID).reply().name.buf())
+        self.add(name, atomID)
+
+        return name
+
+    def describe(self, atomID):
+        """Get a human-readable description of the given atom, for use in log messages.
+
+        Never contacts the X server.
+
+        """
+        try:
+            return '{} ({})'.format(self.names[atomID], atomID)
+        except KeyError:
+            return str(atomID)
+
+    def installIntoXpybutil(self):
+        """Make xpybutil look up atoms in this table, so its property helpers don't cost a round-trip per atom.
+
+        """
+        xpybutil.util.get_atom = self.get
+        xpybutil.util.get_atom_name = self.name
+
+        # These modules keep their own aliases of `get_atom`.
+        xpybutil.ewmh.atom = self.get
+        xpybutil.icccm.atom = self.get
+
+
+atoms = AtomTable()
+
+atom = atoms.get
+atomName = atoms.name
@@ -13,6 +13,8 @@ import shlex
 from string import Template
 import subprocess
 
+from .. import singletons
+
 
 logger = logging.getLogger("fttpwm.bindings.app")
 
@@ -98,6 +100,7 @@ class Command(object):
     def __call__(self, **kwargs):
         logger.debug("Running command: %s", repr(self))
         command = [arg.substituted for arg in self.args]
+        proc = None
 
         try:
             proc = subprocess.Popen(command, **kwargs)
@@ -108,6 +111,15 @@ class Command(object):
 
         return proc
 
+    def start(self, callback=None, **kwargs):
+        """Start this command on a worker thread, so the event loop isn't held up while the process is spawned.
+
+        If given, `callback` will be called on the event loop's thread with the resulting `Popen` object (or None if
+        the command couldn't be started) and the error raised, if any.
+
+        """
+        singletons.eventloop.runInExecutor(lambda: self(**kwargs), callback)
+
 
 def parseCommands(*commands):
     """Parse the given arguments into a list of command argument lists.
@@ -140,9 +152,13 @@ def startSingle(command, **kwargs):
 
     def start_(*event):
         logger.debug("Starting single command: %s", repr(command))
-        proc = command(**kwargs)
 
-        if waitForCompletion:
+        if not waitForCompletion:
+            command.start(**kwargs)
+
+        else:
+            proc = command(**kwargs)
+
             logger.debug("Waiting for PID %r to finish...", proc.pid)
             if proc.wait() != 0:
                 logger.warn("PID %r (command %s) returned non-zero exit status %r!",
@@ -164,9 +180,7 @@ def startParallel(*commands, **kwargs):
     kwargs.setdefault('close_fds', True)
     waitForCompletion = kwargs.pop('wait', False)
 
-    def start_(*event):
-        logger.debug("Starting command set:\n%s", commandsRepr(commands))
-
+    def startAll():
         procs = list()
         for command in commands:
             procs.append(command(**kwargs))
@@ -174,7 +188,17 @@ def startParallel(*commands, **kwargs):
         logger.debug("Command set started; PIDs: %s",
                 ', '.join(str(proc.pid) if proc else '<START FAILED>' for proc in procs))
 
-        if waitForCompletion:
+        return procs
+
+    def start_(*event):
+        logger.debug("Starting command set:\n%s", commandsRepr(commands))
+
+        if not waitForCompletion:
+            singletons.eventloop.runInExecutor(startAll)
+
+        else:
+            procs = startAll()
+
             logger.debug("Waiting for all commands in command set to finish...")
 
             for idx, proc in enumerate(procs):
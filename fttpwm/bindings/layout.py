@@ -194,3 +194,17 @@ def moveNext(*event):
 def movePrevious(*event):
     wm = singletons.wm
     wm.workspaces.current.layout.moveFrame(wm.focusedWindow, -1)
+
+
+def resizeWindow(amount):
+    """Grow (amount > 0) or shrink (amount < 0) the focused window, in layouts which support it. (see `SplitTree`)
+
+    """
+    def resizeWindow_(*event):
+        wm = singletons.wm
+        layout = wm.workspaces.current.layout
+
+        if hasattr(layout, 'resizeFrame') and wm.focusedWindow is not None:
+            layout.resizeFrame(wm.focusedWindow, amount)
+
+    return resizeWindow_
@@ -146,7 +146,7 @@ class Callbacks(object):
     def onError(self):
         return self.callOnError
 
-    @onReturn.setter
+    @onError.setter
     def onError(self, callback):
         #TODO: Locking?
         if self.isError is True:
@@ -3,6 +3,7 @@ from os.path import expanduser
 
 from fttpwm.layout.floating import Floating
 from fttpwm.layout.simpletile import Columns, Rows
+from fttpwm.layout.splittree import SplitTree
 from fttpwm.layout.tabbed import TabbedMaximized
 from fttpwm.themes.default import Default
 import fttpwm.paint.fonts as fonts
@@ -10,7 +11,7 @@ import fttpwm.resources as resources
 from fttpwm.paint.wallpaper import SVG
 from fttpwm.bindings.app import startSingle, startParallel
 from fttpwm.bindings.layout import Floating as FloatingBindings, setLayout, _RaiseWindow
-from fttpwm.bindings.layout import moveNext, movePrevious, focusNext, focusPrevious
+from fttpwm.bindings.layout import moveNext, movePrevious, focusNext, focusPrevious, resizeWindow
 from fttpwm.bindings.wm import quit, switchWorkspace
 import fttpwm.xdg.autostart as xdg_autostart
 
@@ -36,12 +37,15 @@ keys = {
         META + 'G': setLayout(TabbedMaximized()),
         META + 'C': setLayout(Columns()),
         META + 'R': setLayout(Rows()),
+        META + 'S': setLayout(SplitTree()),
         META + 'tab': FloatingBindings.nextWindow,
         META + 'Shift+tab': FloatingBindings.previousWindow,
         META + 'T': focusNext,
         META + 'N': focusPrevious,
         META + 'Shift+T': moveNext,
         META + 'Shift+N': movePrevious,
+        META + 'equal': resizeWindow(0.05),
+        META + 'minus': resizeWindow(-0.05),
         }
 
 mouse = {
@@ -0,0 +1,247 @@
+"""asyncio event loop
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+import logging
+import time
+import warnings
+
+try:
+    import asyncio
+except ImportError:
+    # Python 2 doesn't have asyncio; use the `trollius` backport instead.
+    import trollius as asyncio
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from ..dbus.proto.errors import MethodCallError
+from .. import singletons
+from .base import BaseEventLoop, StreamEvents
+from .idle import IdlePriority
+from .timers import TimerWheel
+
+
+logger = logging.getLogger("fttpwm.eventloop.asyncio_loop")
+
+
+class AsyncioEventLoop(BaseEventLoop):
+    """An event loop built on top of an `asyncio` (or `trollius`) event loop.
+
+    This lets D-Bus and remote control handlers be written as coroutines; use `waitForReply` and `waitForDBusReply`
+    to get futures which can be waited on from inside a coroutine. If `uvloop` is installed, it will be used in place
+    of the default asyncio loop.
+
+    """
+    def __init__(self, loop=None):
+        super(AsyncioEventLoop, self).__init__()
+
+        if loop is None:
+            if uvloop is not None:
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+                logger.info("Using uvloop.")
+
+            loop = asyncio.get_event_loop()
+
+        self.loop = loop
+        self.idleRunScheduled = False
+
+        # As with the ZeroMQ loop, we keep our timers in our own timer wheel (so they can be cancelled and rescheduled
+        # through `TimerHandle`s) and only keep a single asyncio timer armed for the earliest one.
+        self.timers = TimerWheel()
+        self.timers.scheduled.connect(self.onTimerScheduled)
+        self.timeout = None
+        self.timeoutDeadline = None
+
+    def callAt(self, deadline, callback):
+        """Call the given `callback` at the time given by `deadline`.
+
+        `deadline` should be in seconds since the Epoch (a UNIX timestamp), in local time.
+
+        Returns a `TimerHandle`.
+
+        """
+        return self.timers.add(self.now() + (deadline - time.time()), callback)
+
+    def callAfter(self, delay, callback):
+        """Call the given `callback` after `delay` seconds.
+
+        Returns a `TimerHandle`.
+
+        """
+        return self.timers.add(self.now() + self.asTimedelta(delay).total_seconds(), callback)
+
+    def onTimerScheduled(self, timer):
+        if self.timeoutDeadline is None or timer.deadline < self.timeoutDeadline:
+            self.armTimeout()
+
+    def armTimeout(self):
+        """(Re-)arm the asyncio timer for our earliest timer.
+
+        """
+        if self.timeout is not None:
+            self.timeout.cancel()
+            self.timeout = None
+
+        self.timeoutDeadline = self.timers.nextDeadline
+        if self.timeoutDeadline is None:
+            return
+
+        # asyncio's clock is monotonic too, but not necessarily the same clock as ours, so convert via the delay.
+        delay = max(0, self.timeoutDeadline - self.now())
+        self.timeout = self.loop.call_at(self.loop.time() + delay, self.runTimers)
+
+    def runTimers(self):
+        """Run all timers that have reached their deadline, and arm the asyncio timer for the next one.
+
+        """
+        self.timeout = None
+
+        for timer in self.timers.advance(self.now()):
+            try:
+                self.runTimer(timer)
+            except Exception:
+                logger.exception("Error while calling timer %r!", timer)
+
+        self.armTimeout()
+
+    def callWhenIdle(self, callback, allowDuplicates=False, priority=IdlePriority.Normal, key=None):
+        """Call the given `callback` the next time there are no waiting events.
+
+        See `BaseEventLoop.callWhenIdle` for details.
+
+        """
+        queued = super(AsyncioEventLoop, self).callWhenIdle(callback, allowDuplicates, priority, key)
+
+        if queued and not self.idleRunScheduled:
+            self.idleRunScheduled = True
+            self.loop.call_soon(self.runIdleCallbacks)
+
+        return queued
+
+    def runIdleCallbacks(self):
+        """Run queued idle callbacks, until the queue is empty or we've used up `idleTimeBudget`.
+
+        If we run out of time, the remaining callbacks are run on the asyncio loop's next iteration.
+
+        """
+        self.idleRunScheduled = False
+
+        count = super(AsyncioEventLoop, self).runIdleCallbacks()
+
+        if self.idleQueue and not self.idleRunScheduled:
+            self.idleRunScheduled = True
+            self.loop.call_soon(self.runIdleCallbacks)
+
+        return count
+
+    def register(self, stream, handler, events=(StreamEvents.INCOMING, ), event=None):
+        """Register a `handler` for a given `event` on the given `stream`.
+
+        `handler` will be called with `stream` and `event` as arguments.
+
+        """
+        fd = self.fileDescriptorFor(stream)
+
+        if event is not None:
+            warnings.warn("'event' is deprecated! Use 'events' instead.", DeprecationWarning)
+            events = [event]
+
+        if StreamEvents.INCOMING in events:
+            self.loop.add_reader(fd, self.stats.call, handler, stream, StreamEvents.INCOMING)
+        else:
+            self.loop.remove_reader(fd)
+
+        if StreamEvents.OUTGOING in events:
+            self.loop.add_writer(fd, self.stats.call, handler, stream, StreamEvents.OUTGOING)
+        else:
+            self.loop.remove_writer(fd)
+
+    def createFuture(self):
+        """Create a future attached to the asyncio loop.
+
+        """
+        try:
+            return self.loop.create_future()
+        except AttributeError:
+            # Older versions of asyncio (and trollius) don't have `create_future`.
+            return asyncio.Future(loop=self.loop)
+
+    def waitForReply(self, cookie):
+        """Get a future which will be resolved with the reply to the given XCB request `cookie`.
+
+        The reply isn't waited on here; it's fetched along with any other outstanding replies when the X connection
+        next becomes readable. (see `XConnection.whenReplied`)
+
+        """
+        future = self.createFuture()
+
+        def onReply(value, error):
+            if future.cancelled():
+                return
+
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+        singletons.x.whenReplied(cookie, onReply)
+
+        return future
+
+    def waitForDBusReply(self, callbacks):
+        """Get a future which will be resolved with the response to a D-Bus method call, given the `Callbacks` object
+        returned by `Connection.callMethod`.
+
+        If the method call returns an error, the future's exception will be set to a `MethodCallError` with the error
+        response as its argument.
+
+        """
+        future = self.createFuture()
+
+        def onReturn(response):
+            if not future.done():
+                future.set_result(response)
+
+        def onError(response):
+            if not future.done():
+                future.set_exception(MethodCallError(response))
+
+        callbacks.onReturn = onReturn
+        callbacks.onError = onError
+
+        return future
+
+    def isRunning(self):
+        """Check whether the event loop is currently running.
+
+        """
+        return self.loop.is_running()
+
+    def exit(self):
+        """Exit the event loop.
+
+        Calling this will cause run() to return after this iteration.
+
+        """
+        self.loop.stop()
+
+    def run(self):
+        """Start the event loop.
+
+        This should not return until the program exits.
+
+        """
+        logger.info("Starting main event loop.")
+        self.startInstrumentation()
+
+        try:
+            self.loop.run_forever()
+        finally:
+            self.stopInstrumentation()
+
+        logger.info("Event loop terminated; shutting down normally.")
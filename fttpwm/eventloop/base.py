@@ -4,9 +4,15 @@
 from abc import ABCMeta, abstractmethod
 import datetime
 import logging
+import math
 import numbers
 
 from .. import singletons
+from ..settings import settings
+from ..utils.time import monotonic
+from .executor import ThreadPoolExecutor
+from .idle import IdlePriority, IdleQueue
+from .stats import LoopStats
 
 
 logger = logging.getLogger("fttpwm.eventloop.base")
@@ -21,24 +27,59 @@ class BaseEventLoop(object):
     __metaclass__ = ABCMeta
 
     class RecurringCallback(object):
-        def __init__(self, eventloop, interval, callback):
-            self.eventloop = eventloop
+        """Calls `callback` every `interval` seconds for as long as it returns a true value.
+
+        Each call is scheduled relative to the previous call's deadline instead of the time the callback actually ran,
+        so the schedule doesn't drift. If the loop falls more than a full interval behind, the missed calls are skipped
+        instead of being fired in a burst.
+
+        """
+        def __init__(self, interval, callback):
             self.interval = interval
             self.callback = callback
+            self.handle = None
+
+        def __call__(self):
+            if self.callback():
+                handle = self.handle
+                now = handle.scheduler.clock()
+
+                nextDeadline = handle.deadline + self.interval
+                if nextDeadline <= now:
+                    nextDeadline += self.interval * math.ceil((now - nextDeadline) / self.interval)
+
+                handle.rescheduleAt(nextDeadline)
 
-        def __call__(self, *args, **kwargs):
-            if self.callback(*args, **kwargs):
-                self.callAfter(self.interval, self)
+    # The maximum amount of time (in seconds) to spend running idle callbacks before checking for events again.
+    idleTimeBudget = 0.02
 
     def __init__(self):
         if singletons.eventloop is None:
             singletons.eventloop = self
 
+        self.idleQueue = IdleQueue()
+        self.stats = LoopStats()
+        self.statsReporter = None
+        self.executor = None
+
+    @staticmethod
+    def now():
+        """Get the current time according to the event loop's clock.
+
+        This clock is monotonic; it is only meaningful relative to other values returned by `now()` and to the
+        deadlines of `TimerHandle`s.
+
+        """
+        return monotonic()
+
     @abstractmethod
     def callAt(self, deadline, callback):
         """Call the given `callback` at the time given by `deadline`.
 
-        `deadline` should be in seconds since the Epoch (a UNIX timestamp), in local time.
+        `deadline` should be in seconds since the Epoch (a UNIX timestamp), in local time. It is converted to the
+        event loop's monotonic clock when the call is scheduled, so later changes to the system clock won't affect it.
+
+        Returns a `TimerHandle`.
 
         """
 
@@ -48,22 +89,84 @@ class BaseEventLoop(object):
 
         `delay` should either be a `datetime.timedelta`, or a number representing seconds.
 
+        Returns a `TimerHandle`.
+
         """
 
     def callEvery(self, interval, callback):
-        """Call the given `callback` once every `interval`.
+        """Call the given `callback` once every `interval`, until it returns a false value.
 
         `interval` should either be a `datetime.timedelta`, or a number representing seconds.
 
+        Returns a `TimerHandle`; cancelling it stops any further calls.
+
         """
-        cb = self.RecurringCallback(self, interval, callback)
-        self.callAfter(interval, cb)
+        interval = self.asTimedelta(interval).total_seconds()
 
-    @abstractmethod
-    def callWhenIdle(self, callback, allowDuplicates=False):
+        cb = self.RecurringCallback(interval, callback)
+        cb.handle = self.callAfter(interval, cb)
+        return cb.handle
+
+    def callWhenIdle(self, callback, allowDuplicates=False, priority=IdlePriority.Normal, key=None):
         """Call the given `callback` the next time there are no waiting events.
 
+        Idle callbacks are run in order of `priority` (see `IdlePriority`), and in the order they were queued within
+        each priority. Unless `allowDuplicates` is True, `callback` will not be queued if there's already a callback
+        queued with the same `key`; `key` defaults to `callback` itself.
+
+        Returns True if the callback was queued.
+
+        """
+        return self.idleQueue.add(callback, priority, key, allowDuplicates)
+
+    def runIdleCallbacks(self):
+        """Run queued idle callbacks, until the queue is empty or we've used up `idleTimeBudget`.
+
         """
+        count = self.idleQueue.run(self.idleTimeBudget, self.stats.call)
+
+        if count:
+            self.stats.idleBatchSizes.record(count)
+
+        return count
+
+    def runInExecutor(self, func, callback=None):
+        """Run `func` on a worker thread, so it can block without holding up the event loop.
+
+        When `func` finishes, `callback` will be called on the event loop's thread with two arguments: the value `func`
+        returned (or None if it raised an exception), and the exception `func` raised (or None if it succeeded).
+
+        `func` must not touch the main X connection or any other state the event loop's thread might be using.
+
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self, settings.executorThreads)
+
+        self.executor.submit(func, callback)
+
+    def runTimer(self, timer):
+        """Run the given expired `timer`, recording how late it fired.
+
+        """
+        if not timer.cancelled:
+            self.stats.timerLateness.record(self.now() - timer.deadline)
+            self.stats.call(timer)
+
+    def startInstrumentation(self):
+        """Start the stall watchdog and periodic statistics reports, as configured.
+
+        """
+        self.stats.startWatchdog(settings.eventLoopStallThreshold)
+
+        if settings.eventLoopStatsInterval is not None and self.statsReporter is None:
+            self.statsReporter = self.callEvery(settings.eventLoopStatsInterval, self.stats.logReport)
+
+    def stopInstrumentation(self):
+        self.stats.stopWatchdog()
+
+        if self.statsReporter is not None:
+            self.statsReporter.cancel()
+            self.statsReporter = None
 
     @abstractmethod
     def register(self, stream, handler, event=StreamEvents.INCOMING):
@@ -95,6 +198,20 @@ class BaseEventLoop(object):
 
         """
 
+    @staticmethod
+    def fileDescriptorFor(stream):
+        """Get the file descriptor number for the given stream.
+
+        """
+        # This should cover most cases.
+        try:
+            return stream.fileno()
+        except TypeError:
+            return stream.fileno
+        except AttributeError:
+            # Stupid xpyb not conforming to the file-like object protocol.
+            return stream.get_file_descriptor()
+
     @staticmethod
     def asTimedelta(interval):
         """Convert `interval` to a `datetime.timedelta` if needed.
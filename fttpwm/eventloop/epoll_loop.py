@@ -0,0 +1,56 @@
+"""epoll-based event loop
+
+"""
+import logging
+import select
+
+from .base import StreamEvents
+from .poll_loop import PollEventLoop
+
+
+logger = logging.getLogger("fttpwm.eventloop.epoll_loop")
+
+
+streamEventsToEpollEvents = {
+        StreamEvents.INCOMING: select.EPOLLIN,
+        StreamEvents.OUTGOING: select.EPOLLOUT,
+        }
+
+
+class EpollEventLoop(PollEventLoop):
+    """An event loop built on Linux's `epoll` interface.
+
+    Streams which are only registered for incoming events are registered edge-triggered, so we only get woken up when
+    new data arrives instead of on every iteration until it's read; handlers for these streams must read everything
+    available each time they're called. (as `XConnection.handleXCBComm` does) Streams registered for outgoing events
+    stay level-triggered, since writers like the D-Bus connection only flush their buffers when told the stream is
+    writable.
+
+    """
+    streamEventMasks = {
+            StreamEvents.INCOMING: select.EPOLLIN | select.EPOLLHUP | select.EPOLLERR,
+            StreamEvents.OUTGOING: select.EPOLLOUT,
+            }
+
+    def __init__(self):
+        super(EpollEventLoop, self).__init__()
+
+        self.poll = select.epoll()
+
+    def registerDescriptor(self, fd, events):
+        mask = sum(streamEventsToEpollEvents[event] for event in events)
+
+        if StreamEvents.OUTGOING not in events:
+            mask |= select.EPOLLET
+
+        if fd in self.handlers:
+            self.poll.modify(fd, mask)
+        else:
+            self.poll.register(fd, mask)
+
+    def waitForEvents(self, timeout):
+        """Wait up to `timeout` seconds (or forever, if `timeout` is None) for events, and return them as a list of
+        `(fd, event)` tuples.
+
+        """
+        return self.poll.poll(-1 if timeout is None else timeout)
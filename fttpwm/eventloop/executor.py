@@ -0,0 +1,128 @@
+"""Thread pool for running blocking work off of the event loop
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+from collections import deque
+import errno
+import fcntl
+import logging
+import os
+import Queue
+import threading
+
+from ..settings import settings
+
+
+logger = logging.getLogger("fttpwm.eventloop.executor")
+
+
+settings.setDefaults(
+        # The maximum number of worker threads to use for running blocking work off of the event loop.
+        executorThreads=4,
+        )
+
+
+class Wakeup(object):
+    """A self-pipe, used to wake up the event loop from another thread.
+
+    """
+    def __init__(self):
+        self.readFD, self.writeFD = os.pipe()
+
+        for fd in (self.readFD, self.writeFD):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+            flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+            fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+    def fileno(self):
+        return self.readFD
+
+    def notify(self):
+        try:
+            os.write(self.writeFD, b'\0')
+        except OSError as ex:
+            # If the pipe is full, the loop already has a wakeup pending.
+            if ex.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def drain(self):
+        # Read everything, since the descriptor may be registered edge-triggered.
+        while True:
+            try:
+                if not os.read(self.readFD, 4096):
+                    return
+            except OSError as ex:
+                if ex.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+
+
+class ThreadPoolExecutor(object):
+    """Runs functions on a bounded pool of worker threads, and delivers their results back on the event loop's thread.
+
+    Worker threads are started as needed, up to `maxWorkers`.
+
+    """
+    def __init__(self, eventloop, maxWorkers):
+        self.maxWorkers = maxWorkers
+        self.workers = []
+        self.idleWorkers = 0
+        self.lock = threading.Lock()
+
+        self.tasks = Queue.Queue()
+        self.completed = deque()
+
+        self.wakeup = Wakeup()
+        eventloop.register(self.wakeup, self.onWakeup)
+
+    def submit(self, func, callback=None):
+        """Run `func` on a worker thread.
+
+        When `func` finishes, `callback` will be called on the event loop's thread with two arguments: the value `func`
+        returned (or None if it raised an exception), and the exception `func` raised (or None if it succeeded).
+
+        """
+        with self.lock:
+            # `idleWorkers` goes negative when all workers are busy and tasks are waiting in the queue.
+            if self.idleWorkers <= 0 and len(self.workers) < self.maxWorkers:
+                worker = threading.Thread(target=self.work, name="Executor worker {}".format(len(self.workers)))
+                worker.daemon = True
+                self.workers.append(worker)
+                worker.start()
+            else:
+                self.idleWorkers -= 1
+
+        self.tasks.put((func, callback))
+
+    def work(self):
+        while True:
+            func, callback = self.tasks.get()
+
+            result, error = None, None
+            try:
+                result = func()
+            except Exception as ex:
+                logger.exception("Error in %r, called from executor!", func)
+                error = ex
+
+            if callback is not None:
+                self.completed.append((callback, result, error))
+                self.wakeup.notify()
+
+            with self.lock:
+                self.idleWorkers += 1
+
+    def onWakeup(self, stream, event):
+        self.wakeup.drain()
+
+        while self.completed:
+            callback, result, error = self.completed.popleft()
+
+            try:
+                callback(result, error)
+            except Exception:
+                logger.exception("Error in executor completion callback %r!", callback)
@@ -0,0 +1,126 @@
+"""Idle callback queue
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+from bisect import insort
+from collections import OrderedDict
+import logging
+
+from ..utils.time import monotonic
+
+
+logger = logging.getLogger("fttpwm.eventloop.idle")
+
+
+class IdlePriority(object):
+    """Priorities for idle callbacks; lower values run first.
+
+    The ordering means that when a burst of events queues up work, windows are arranged before they're configured,
+    configured before they're painted, and painted before we flush their properties back to the X server, so each
+    stage sees the final result of the one before it.
+
+    """
+    Layout = 0
+    Configure = 10
+    Normal = 20
+    Paint = 30
+    Properties = 40
+
+
+class IdleQueue(object):
+    """A queue of callbacks to run when the event loop is idle.
+
+    Callbacks run in priority order, and in FIFO order within a priority. Each callback is queued under a key
+    (defaulting to the callback itself, so bound methods like `frame.paint` are deduplicated per object); queueing a
+    callback under a key which is already queued does nothing.
+
+    """
+    def __init__(self, clock=monotonic):
+        self.clock = clock
+        self.priorities = []
+        self.queues = dict()
+        self.queuedKeys = dict()
+
+    def __len__(self):
+        return len(self.queuedKeys)
+
+    def __contains__(self, key):
+        return key in self.queuedKeys
+
+    def add(self, callback, priority=IdlePriority.Normal, key=None, allowDuplicates=False):
+        """Queue `callback` to be run with the given `priority`.
+
+        Returns True if the callback was queued, or False if another callback with the same key was already queued.
+
+        """
+        if allowDuplicates:
+            key = object()
+        elif key is None:
+            key = callback
+
+        if key in self.queuedKeys:
+            return False
+
+        try:
+            queue = self.queues[priority]
+        except KeyError:
+            queue = self.queues[priority] = OrderedDict()
+            insort(self.priorities, priority)
+
+        queue[key] = callback
+        self.queuedKeys[key] = priority
+        return True
+
+    def discard(self, key):
+        """Remove the callback queued under `key`, if any.
+
+        """
+        priority = self.queuedKeys.pop(key, None)
+        if priority is not None:
+            del self.queues[priority][key]
+
+    def pop(self):
+        """Remove and return the next callback to run.
+
+        """
+        for priority in self.priorities:
+            queue = self.queues[priority]
+            if queue:
+                key, callback = queue.popitem(last=False)
+                del self.queuedKeys[key]
+                return callback
+
+        raise IndexError("pop from empty IdleQueue")
+
+    def run(self, budget=None, call=None):
+        """Run queued callbacks until the queue is empty, or until `budget` seconds have elapsed.
+
+        Callbacks queued while this is running are run in the same pass, in priority order. If given, `call` is called
+        with each callback instead of calling it directly. Returns the number of callbacks that were run.
+
+        """
+        start = self.clock()
+        count = 0
+
+        while self.queuedKeys:
+            callback = self.pop()
+
+            try:
+                if call is None:
+                    callback()
+                else:
+                    call(callback)
+            except Exception:
+                logger.exception("Error while calling idle callback %r!", callback)
+
+            count += 1
+
+            if budget is not None and self.clock() - start >= budget:
+                if self.queuedKeys:
+                    logger.debug("Idle callback budget of %ss exhausted after %d callbacks; %d left for next time.",
+                            budget, count, len(self.queuedKeys))
+                break
+
+        return count
@@ -1,34 +1,40 @@
 """Polling socket event loop
 
 """
-import heapq
 import logging
+import math
 import select
 import sys
 import time
 import warnings
 
 from .base import BaseEventLoop, StreamEvents
+from .timers import TimerWheel
 
 
-logger = logging.getLogger("fttpwm.eventloop.zmq_loop")
+logger = logging.getLogger("fttpwm.eventloop.poll_loop")
 
 
 streamEventsToPollEvents = {
         StreamEvents.INCOMING: select.POLLIN,
         StreamEvents.OUTGOING: select.POLLOUT,
         }
-pollEventsToStreamEvents = dict((v, k) for k, v in streamEventsToPollEvents.iteritems())
 
 
 class PollEventLoop(BaseEventLoop):
+    # Poll events which should be reported to handlers as the given stream event, in addition to the event itself.
+    # (hangups and errors are reported as incoming data, so the handler will try to read and discover the problem)
+    streamEventMasks = {
+            StreamEvents.INCOMING: select.POLLIN | select.POLLHUP | select.POLLERR,
+            StreamEvents.OUTGOING: select.POLLOUT,
+            }
+
     def __init__(self):
         super(PollEventLoop, self).__init__()
 
         self.running = False
         self.handlers = dict()
-        self.timers = []
-        self.idleCallbacks = set()
+        self.timers = TimerWheel()
 
         # select.poll won't work on Windows, but at the moment I don't particularly care. This can be implemented with
         # select.select later if someone wants it.
@@ -39,25 +45,29 @@ class PollEventLoop(BaseEventLoop):
 
         `deadline` should be in seconds since the Epoch (a UNIX timestamp), in local time.
 
+        Returns a `TimerHandle`.
+
         """
-        heapq.heappush(self.timers, (deadline, callback))
+        return self.timers.add(self.now() + (deadline - time.time()), callback)
 
     def callAfter(self, delay, callback):
         """Call the given `callback` after `delay` seconds.
 
-        """
-        self.callAt(time.time() + self.asTimedelta(delay).total_seconds(), callback)
-
-    def callWhenIdle(self, callback, allowDuplicates=False):
-        """Call the given `callback` the next time there are no waiting events.
+        Returns a `TimerHandle`.
 
         """
-        if allowDuplicates or callback not in self.idleCallbacks:
-            self.idleCallbacks.add(callback)
+        return self.timers.add(self.now() + self.asTimedelta(delay).total_seconds(), callback)
 
     @property
     def timeToNextTimer(self):
-        return self.timers[0] - time.time()
+        """The number of seconds until the next timer is due, or None if there are no timers scheduled.
+
+        """
+        deadline = self.timers.nextDeadline
+        if deadline is None:
+            return None
+
+        return max(0, deadline - self.now())
 
     def register(self, stream, handler, events=(StreamEvents.INCOMING, ), event=None):
         """Register a `handler` for a given `event` on the given `stream`.
@@ -65,47 +75,69 @@ class PollEventLoop(BaseEventLoop):
         `handler` will be called with `stream` and `event` as arguments.
 
         """
-        # This should cover most cases.
-        try:
-            fd = stream.fileno()
-        except TypeError:
-            fd = stream.fileno
-        except AttributeError:
-            # Stupid xpyb not conforming to the file-like object protocol.
-            fd = stream.get_file_descriptor()
+        fd = self.fileDescriptorFor(stream)
 
         if event is not None:
             warnings.warn("'event' is deprecated! Use 'events' instead.", DeprecationWarning)
             events = [event]
 
-        events = sum(streamEventsToPollEvents[event] for event in events)
+        self.registerDescriptor(fd, events)
+        self.handlers[fd] = self.createDispatcher(stream, handler)
+
+    def registerDescriptor(self, fd, events):
+        mask = sum(streamEventsToPollEvents[event] for event in events)
+
+        if fd in self.handlers:
+            self.poll.modify(fd, mask)
+        else:
+            self.poll.register(fd, mask)
 
+    def createDispatcher(self, stream, handler):
         def callHandler(fd, evt):
-            try:
-                handler(stream, pollEventsToStreamEvents[evt])
-            except KeyError:
-                warnings.warn("Unrecognized poll event: {!r}".format(evt), RuntimeWarning)
+            for streamEvt, mask in self.streamEventMasks.iteritems():
+                if evt & mask:
+                    handler(stream, streamEvt)
 
-        key = fd, events
-        self.poll.register(*key)
-        self.handlers[key] = callHandler
+        # Lets instrumentation report the handler's name instead of this dispatcher's.
+        callHandler.__wrapped__ = handler
+
+        return callHandler
 
     def missingHandler(self, fd, evt):
         logger.error("Couldn't find handler for event %r on descriptor %r!", evt, fd)
 
-    def doPoll(self, timeoutMS):
-        wakeups = self.poll.poll(timeoutMS)
+    def waitForEvents(self, timeout):
+        """Wait up to `timeout` seconds (or forever, if `timeout` is None) for events, and return them as a list of
+        `(fd, event)` tuples.
+
+        """
+        if timeout is None:
+            return self.poll.poll()
+
+        return self.poll.poll(int(math.ceil(timeout * 1000)))
+
+    def doPoll(self, timeout):
+        wakeups = self.waitForEvents(timeout)
+        if len(wakeups) == 0 and not self.idleQueue:
+            return
+
+        start = self.now()
 
         for fd, evt in wakeups:
-            self.handlers.get((fd, evt), self.missingHandler)(fd, evt)
+            self.stats.call(self.handlers.get(fd, self.missingHandler), fd, evt)
+
+        if len(wakeups) == 0:
+            # No waiting events; run queued idle callbacks.
+            self.runIdleCallbacks()
 
-        if len(wakeups) == 0 and self.idleCallbacks:
-            # No waiting events; run all the callbacks in idleCallbacks, and clear it.
-            callbacks = self.idleCallbacks
-            self.idleCallbacks = set()
+        self.stats.iterationTimes.record(self.now() - start)
 
-            for callback in callbacks:
-                callback()
+    def runTimers(self):
+        """Run all timers that have reached their deadline.
+
+        """
+        for timer in self.timers.advance(self.now()):
+            self.runTimer(timer)
 
     def isRunning(self):
         """Check whether the event loop is currently running.
@@ -129,17 +161,16 @@ class PollEventLoop(BaseEventLoop):
         """
         logger.info("Starting main event loop.")
         self.running = True
+        self.startInstrumentation()
 
         try:
             while self.running:
-                # Poll for events until the next timer is due.
-                timeoutMS = int(self.timeToNextTimer / 1000)
-                self.doPoll(timeoutMS)
+                # Poll for events until the next timer is due. (or don't wait at all if there are idle callbacks which
+                # are waiting to run)
+                timeout = 0 if self.idleQueue else self.timeToNextTimer
+                self.doPoll(timeout)
 
-                # Process all timers that have reached their deadline.
-                while self.timers[0][0] < time.time():
-                    deadline, callback = heapq.heappop(self.timers)
-                    callback()
+                self.runTimers()
 
                 # Check to see if we're idle.
                 self.doPoll(0)
@@ -148,4 +179,7 @@ class PollEventLoop(BaseEventLoop):
             logger.exception("Error in main event loop! Exiting with error status.")
             sys.exit(1)
 
+        finally:
+            self.stopInstrumentation()
+
         logger.info("Event loop terminated; shutting down normally.")
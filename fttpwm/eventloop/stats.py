@@ -0,0 +1,253 @@
+"""Event loop instrumentation
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+from collections import defaultdict
+import logging
+import sys
+import threading
+import traceback
+
+from ..settings import settings
+from ..utils.time import monotonic
+
+
+logger = logging.getLogger("fttpwm.eventloop.stats")
+
+
+settings.setDefaults(
+        # Log a stack trace whenever a single callback blocks the event loop for longer than this many seconds. (set to
+        # None to disable the watchdog)
+        eventLoopStallThreshold=0.25,
+        # Log a summary of event loop statistics every this many seconds. (set to None to disable)
+        eventLoopStatsInterval=None,
+        )
+
+
+def describeCallback(callback):
+    """Get a short, human-readable name for the given callback, for use in statistics and log messages.
+
+    """
+    # Unwrap dispatchers, timer handles and recurring callbacks to get at the function which actually does the work.
+    while True:
+        wrapped = getattr(callback, '__wrapped__', None) or getattr(callback, 'callback', None)
+        if wrapped is None:
+            break
+        callback = wrapped
+
+    func = getattr(callback, 'im_func', callback)
+    name = getattr(func, '__name__', None)
+    if name is None:
+        return repr(callback)
+
+    owner = getattr(callback, 'im_self', None)
+    if owner is not None:
+        return '{}.{}'.format(type(owner).__name__, name)
+
+    if name == '<lambda>':
+        return '{}.<lambda>:{}'.format(func.__module__, func.func_code.co_firstlineno)
+
+    return '{}.{}'.format(func.__module__, name)
+
+
+class Histogram(object):
+    """A log-linear histogram, in the style of HdrHistogram.
+
+    Values are recorded as integers in units of `1 / scale` (microseconds, by default); each power-of-two range is
+    split into `2 ** subBucketBits` equally-sized buckets, so every recorded value is accurate to within about
+    `1 / 2 ** subBucketBits` of its true value, no matter how large it is, while memory use only grows with the log of
+    the largest value.
+
+    """
+    def __init__(self, scale=1000000, subBucketBits=5):
+        self.scale = scale
+        self.subBucketBits = subBucketBits
+        self.subBucketCount = 1 << subBucketBits
+        self.reset()
+
+    def reset(self):
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def bucketIndex(self, value):
+        if value < self.subBucketCount * 2:
+            return value
+
+        shift = value.bit_length() - self.subBucketBits - 1
+        return (shift << self.subBucketBits) + (value >> shift)
+
+    def bucketRange(self, index):
+        """Get the lowest and highest (integer) values which fall into the bucket with the given `index`.
+
+        """
+        if index < self.subBucketCount * 2:
+            return index, index
+
+        shift = (index >> self.subBucketBits) - 1
+        top = index - (shift << self.subBucketBits)
+        return top << shift, ((top + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, int(value * self.scale))
+
+        self.buckets[self.bucketIndex(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """Get the value below which `percent` percent of recorded values fall. (to within the histogram's precision)
+
+        """
+        if not self.count:
+            return 0
+
+        threshold = self.count * percent / 100.0
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= threshold:
+                return min(self.bucketRange(index)[1], self.max) / float(self.scale)
+
+        return self.max / float(self.scale)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0
+
+        return self.total / float(self.count) / self.scale
+
+    def summary(self, unit=1000, unitName='ms'):
+        return "n={} mean={:.3f}{u} p50={:.3f}{u} p90={:.3f}{u} p99={:.3f}{u} p99.9={:.3f}{u} max={:.3f}{u}".format(
+                self.count,
+                self.mean * unit,
+                self.percentile(50) * unit,
+                self.percentile(90) * unit,
+                self.percentile(99) * unit,
+                self.percentile(99.9) * unit,
+                self.max * unit / float(self.scale),
+                u=unitName,
+                )
+
+
+class StallWatchdog(threading.Thread):
+    """Watches the event loop from a separate thread, and logs the loop thread's stack whenever a single callback runs
+    for longer than `threshold` seconds.
+
+    """
+    def __init__(self, stats, threshold):
+        super(StallWatchdog, self).__init__(name="Event loop watchdog")
+        self.daemon = True
+
+        self.stats = stats
+        self.threshold = threshold
+        self.loopThreadID = threading.current_thread().ident
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        reported = None
+
+        while not self.stopped.wait(self.threshold / 2.0):
+            current = self.stats.currentCall
+            if current is None or current is reported:
+                continue
+
+            name, started = current
+            elapsed = self.stats.clock() - started
+            if elapsed < self.threshold:
+                continue
+
+            # Only report each stall once.
+            reported = current
+
+            frame = sys._current_frames().get(self.loopThreadID)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else "(stack unavailable)\n"
+
+            logger.warn("Event loop stalled! %s has been running for %.3fs:\n%s", name, elapsed, stack.rstrip())
+
+
+class LoopStats(object):
+    """Collects timing statistics for an event loop.
+
+    Callbacks run through `call` have their wall time recorded per callback (see `describeCallback`), and are watched
+    by the stall watchdog if it's running.
+
+    """
+    def __init__(self, clock=monotonic):
+        self.clock = clock
+
+        self.callbackTimes = defaultdict(Histogram)
+        self.iterationTimes = Histogram()
+        self.timerLateness = Histogram()
+        self.idleBatchSizes = Histogram(scale=1)
+
+        # A (name, start time) tuple for the callback that's currently running, if any.
+        self.currentCall = None
+
+        self.watchdog = None
+
+    def call(self, callback, *args):
+        """Call `callback` with the given arguments, recording how long it took.
+
+        """
+        name = describeCallback(callback)
+        start = self.clock()
+        self.currentCall = (name, start)
+
+        try:
+            return callback(*args)
+
+        finally:
+            self.currentCall = None
+            self.callbackTimes[name].record(self.clock() - start)
+
+    def startWatchdog(self, threshold):
+        self.stopWatchdog()
+
+        if threshold is not None:
+            self.watchdog = StallWatchdog(self, threshold)
+            self.watchdog.start()
+
+    def stopWatchdog(self):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog.join()
+            self.watchdog = None
+
+    def reset(self):
+        self.callbackTimes.clear()
+        self.iterationTimes.reset()
+        self.timerLateness.reset()
+        self.idleBatchSizes.reset()
+
+    def report(self, topCallbacks=10):
+        """Get a summary of the collected statistics as a list of lines.
+
+        """
+        lines = [
+                "Loop iterations: " + self.iterationTimes.summary(),
+                "Timer lateness: " + self.timerLateness.summary(),
+                "Idle batch sizes: " + self.idleBatchSizes.summary(1, ''),
+                "Slowest callbacks (by total time):",
+                ]
+
+        byTotal = sorted(self.callbackTimes.iteritems(), key=lambda (name, hist): hist.total, reverse=True)
+        for name, hist in byTotal[:topCallbacks]:
+            lines.append("    {}: {}".format(name, hist.summary()))
+
+        return lines
+
+    def logReport(self):
+        logger.info("Event loop statistics:\n%s", '\n'.join(self.report()))
+
+        # Keep going if we're being called from `callEvery`.
+        return True
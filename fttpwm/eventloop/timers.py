@@ -0,0 +1,303 @@
+"""Timer scheduling
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+from itertools import count
+import datetime
+import logging
+import math
+
+from ..signals import Signal
+from ..utils.time import monotonic
+
+
+logger = logging.getLogger("fttpwm.eventloop.timers")
+
+
+class TimerHandle(object):
+    """A handle to a scheduled timer, which may be used to cancel or reschedule it.
+
+    `deadline` is measured on the scheduler's clock, which is monotonic, so it is NOT comparable to `time.time()`; use
+    `remaining` to find out how long it is until the timer fires.
+
+    """
+    _sequence = count()
+
+    def __init__(self, scheduler, deadline, callback):
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+        # Used to keep timers with identical deadlines in the order they were scheduled.
+        self.sequence = next(self._sequence)
+
+        # Managed by the scheduler.
+        self.tick = None
+        self.slot = None
+
+    def __repr__(self):
+        return "<TimerHandle for {!r} at {!r}{}>".format(
+                self.callback, self.deadline, " (cancelled)" if self.cancelled else "")
+
+    def __call__(self):
+        if not self.cancelled:
+            self.callback()
+
+    def cancel(self):
+        """Cancel this timer. Cancelling a timer which has already fired (or been cancelled) does nothing.
+
+        """
+        if not self.cancelled:
+            self.cancelled = True
+            self.scheduler.remove(self)
+
+    def reschedule(self, delay):
+        """Reschedule this timer to fire `delay` seconds from now.
+
+        This works whether or not the timer has already fired or been cancelled. `delay` should either be a
+        `datetime.timedelta`, or a number representing seconds.
+
+        """
+        if isinstance(delay, datetime.timedelta):
+            delay = delay.total_seconds()
+
+        self.rescheduleAt(self.scheduler.clock() + delay)
+
+    def rescheduleAt(self, deadline):
+        """Reschedule this timer to fire at `deadline`, as measured by the scheduler's (monotonic) clock.
+
+        """
+        self.scheduler.remove(self)
+
+        self.cancelled = False
+        self.deadline = deadline
+        self.scheduler.schedule(self)
+
+    @property
+    def remaining(self):
+        """The number of seconds until this timer fires, or None if it's not scheduled.
+
+        """
+        if not self.pending:
+            return None
+
+        return max(0, self.deadline - self.scheduler.clock())
+
+    @property
+    def pending(self):
+        return self.slot is not None
+
+
+class TimerWheel(object):
+    """A hierarchical timing wheel.
+
+    Level 0 has `2 ** slotBits` slots, each `resolution` seconds wide; each slot in a higher level spans one full
+    rotation of the level below it. Timers are placed in the lowest level whose range covers their deadline, and are
+    cascaded down into lower levels as the wheel turns, so inserting and cancelling a timer are both O(1).
+
+    The default settings give 1ms resolution and cover a little over 12 days; timers further out than that are kept
+    in a separate set until they come within range.
+
+    Deadlines are measured by `clock`, which defaults to a monotonic clock so that changes to the system time (NTP
+    adjustments, the user setting the clock, etc.) don't cause timers to fire early or stall.
+
+    """
+    def __init__(self, resolution=0.001, slotBits=6, levels=5, clock=monotonic):
+        self.resolution = resolution
+        self.slotBits = slotBits
+        self.slotCount = 1 << slotBits
+        self.mask = self.slotCount - 1
+        self.maxTicks = (1 << (slotBits * levels)) - 1
+        self.clock = clock
+
+        self.wheel = [[set() for _ in range(self.slotCount)] for _ in range(levels)]
+        self.currentTick = int(clock() / resolution)
+        self.count = 0
+
+        # Timers whose deadline had already passed when they were added; these fire on the next call to `advance`.
+        self.due = set()
+
+        # Timers too far in the future for the wheel to hold; these are placed on the wheel once they're within range.
+        self.overflow = set()
+
+        # Emitted with the timer whenever a timer is scheduled or rescheduled.
+        self.scheduled = Signal()
+
+    def __len__(self):
+        return self.count + len(self.due) + len(self.overflow)
+
+    def add(self, deadline, callback):
+        """Schedule `callback` to be called at `deadline`, and return a `TimerHandle` for it.
+
+        """
+        timer = TimerHandle(self, deadline, callback)
+        self.schedule(timer)
+        return timer
+
+    def schedule(self, timer):
+        """Place the given (unscheduled) timer on the wheel according to its deadline.
+
+        """
+        timer.tick = int(math.ceil(timer.deadline / self.resolution))
+        self._place(timer)
+        self.scheduled(timer)
+
+    def remove(self, timer):
+        """Remove the given timer from the wheel, if it's still scheduled.
+
+        """
+        if timer.slot is not None:
+            timer.slot.discard(timer)
+
+            if timer.slot is not self.due and timer.slot is not self.overflow:
+                self.count -= 1
+
+            timer.slot = None
+
+    def _place(self, timer):
+        delta = timer.tick - self.currentTick
+
+        if delta <= 0:
+            slot = self.due
+
+        elif delta > self.maxTicks:
+            slot = self.overflow
+
+        else:
+            level = 0
+            while delta >= (1 << (self.slotBits * (level + 1))) and level < len(self.wheel) - 1:
+                level += 1
+
+            slot = self.wheel[level][(timer.tick >> (self.slotBits * level)) & self.mask]
+            self.count += 1
+
+        slot.add(timer)
+        timer.slot = slot
+
+    def _placeOverflow(self):
+        """Move any out-of-range timers which have come within range onto the wheel.
+
+        """
+        limit = self.currentTick + self.maxTicks
+        for timer in [timer for timer in self.overflow if timer.tick <= limit]:
+            self.overflow.discard(timer)
+            self._place(timer)
+
+    def _cascade(self, level):
+        """Re-place all timers from the current slot of the given level into the lower levels.
+
+        """
+        index = (self.currentTick >> (self.slotBits * level)) & self.mask
+        slot = self.wheel[level][index]
+        self.wheel[level][index] = set()
+
+        for timer in slot:
+            self.count -= 1
+            self._place(timer)
+
+        if index == 0 and level + 1 < len(self.wheel):
+            self._cascade(level + 1)
+
+    def _expire(self, slot, expired):
+        for timer in slot:
+            timer.slot = None
+
+        if slot is not self.due:
+            self.count -= len(slot)
+
+        expired.extend(slot)
+        slot.clear()
+
+    def _nextActiveTick(self):
+        """Find the next tick at which a slot on any level needs to be expired or cascaded.
+
+        Returns None if the wheel is empty.
+
+        """
+        nextTick = None
+
+        # Out-of-range timers need to be moved onto the wheel as soon as they come within range.
+        if self.overflow:
+            nextTick = min(timer.tick for timer in self.overflow) - self.maxTicks
+
+        for level, slots in enumerate(self.wheel):
+            shift = self.slotBits * level
+            base = self.currentTick >> shift
+
+            for offset in xrange(1, self.slotCount + 1):
+                if slots[(base + offset) & self.mask]:
+                    tick = (base + offset) << shift
+                    if nextTick is None or tick < nextTick:
+                        nextTick = tick
+                    break
+
+        return nextTick
+
+    def advance(self, now=None):
+        """Advance the wheel to `now`, returning the timers which have expired, ordered by deadline.
+
+        """
+        if now is None:
+            now = self.clock()
+
+        expired = list()
+        self._expire(self.due, expired)
+
+        targetTick = int(now / self.resolution)
+        level0 = self.wheel[0]
+
+        # Rather than stepping through every tick, jump straight to each tick where something actually happens.
+        while self.count or self.overflow:
+            tick = self._nextActiveTick()
+            if tick > targetTick:
+                break
+
+            self.currentTick = tick
+            index = tick & self.mask
+
+            if self.overflow:
+                self._placeOverflow()
+
+            if index == 0:
+                self._cascade(1)
+
+                # Cascading may have turned up timers which are due on exactly this tick.
+                self._expire(self.due, expired)
+
+            if level0[index]:
+                self._expire(level0[index], expired)
+
+        self.currentTick = max(self.currentTick, targetTick)
+
+        expired.sort(key=lambda timer: (timer.deadline, timer.sequence))
+        return expired
+
+    @property
+    def nextDeadline(self):
+        """The deadline of the next timer to fire, or None if there are no timers scheduled.
+
+        """
+        if self.due:
+            return min(timer.deadline for timer in self.due)
+
+        earliest = None
+        if self.overflow:
+            earliest = min(timer.deadline for timer in self.overflow)
+
+        # Slots on each level are ordered by time starting just after the current position, so the first occupied slot
+        # on each level holds that level's earliest timers; the overall earliest deadline is the minimum of those.
+        for level, slots in enumerate(self.wheel):
+            index = (self.currentTick >> (self.slotBits * level)) & self.mask
+
+            for offset in xrange(1, self.slotCount + 1):
+                slot = slots[(index + offset) & self.mask]
+                if slot:
+                    deadline = min(timer.deadline for timer in slot)
+                    if earliest is None or deadline < earliest:
+                        earliest = deadline
+                    break
+
+        return earliest
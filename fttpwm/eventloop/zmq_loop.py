@@ -1,13 +1,17 @@
 """0MQ event loop
 
 """
+import datetime
 import logging
+import time
 import warnings
 
 import zmq
 import zmq.eventloop.ioloop
 
 from .base import BaseEventLoop, StreamEvents
+from .idle import IdlePriority
+from .timers import TimerWheel
 
 
 logger = logging.getLogger("fttpwm.eventloop.zmq_loop")
@@ -20,57 +24,102 @@ streamEventsToZMQEvents = {
 
 
 class ZMQEventLoop(BaseEventLoop):
+    # The longest we'll let the IOLoop sleep before checking our timers again. The IOLoop measures its timeouts with
+    # the wall clock, so this limits how long a change to the system clock can delay our (monotonic) timers.
+    maxTimerSleep = 1.0
+
     def __init__(self):
         super(ZMQEventLoop, self).__init__()
         self.io_loop = zmq.eventloop.ioloop.IOLoop.instance()
-        self.idleCallbacks = set()
+        self.idleRunScheduled = False
+
+        # Rather than giving each timer its own IOLoop timeout, we keep them in our own timer wheel, and only ever
+        # have a single IOLoop timeout armed for the earliest one.
+        self.timers = TimerWheel()
+        self.timers.scheduled.connect(self.onTimerScheduled)
+        self.timeout = None
+        self.timeoutDeadline = None
 
     def callAt(self, deadline, callback):
         """Call the given `callback` at the time given by `deadline`.
 
         `deadline` should be in seconds since the Epoch (a UNIX timestamp), in local time.
 
+        Returns a `TimerHandle`.
+
         """
-        return self.io_loop.add_timeout(deadline, callback)
+        return self.timers.add(self.now() + (deadline - time.time()), callback)
 
     def callAfter(self, delay, callback):
         """Call the given `callback` after `delay` seconds.
 
+        Returns a `TimerHandle`.
+
         """
-        return self.io_loop.add_timeout(self.asTimedelta(delay), callback)
+        return self.timers.add(self.now() + self.asTimedelta(delay).total_seconds(), callback)
+
+    def onTimerScheduled(self, timer):
+        if self.timeoutDeadline is None or timer.deadline < self.timeoutDeadline:
+            self.armTimeout()
+
+    def armTimeout(self):
+        """(Re-)arm the IOLoop timeout for our earliest timer.
+
+        """
+        if self.timeout is not None:
+            self.io_loop.remove_timeout(self.timeout)
+            self.timeout = None
+
+        self.timeoutDeadline = self.timers.nextDeadline
+        if self.timeoutDeadline is None:
+            return
+
+        delay = min(max(0, self.timeoutDeadline - self.now()), self.maxTimerSleep)
+        self.timeout = self.io_loop.add_timeout(datetime.timedelta(seconds=delay), self.runTimers)
+
+    def runTimers(self):
+        """Run all timers that have reached their deadline, and arm the IOLoop timeout for the next one.
 
-    def callWhenIdle(self, callback, allowDuplicates=False):
+        """
+        self.timeout = None
+
+        for timer in self.timers.advance(self.now()):
+            try:
+                self.runTimer(timer)
+            except Exception:
+                logger.exception("Error while calling timer %r!", timer)
+
+        self.armTimeout()
+
+    def callWhenIdle(self, callback, allowDuplicates=False, priority=IdlePriority.Normal, key=None):
         """Call the given `callback` the next time there are no waiting events.
 
+        See `BaseEventLoop.callWhenIdle` for details.
+
         """
-        if allowDuplicates:
-            self.io_loop.add_callback(callback)
-        elif callback not in self.idleCallbacks:
-            def callCB():
-                self.idleCallbacks.discard(callback)
-                callback()
+        queued = super(ZMQEventLoop, self).callWhenIdle(callback, allowDuplicates, priority, key)
 
-            self.idleCallbacks.add(callback)
-            self.io_loop.add_callback(callCB)
+        if queued and not self.idleRunScheduled:
+            self.idleRunScheduled = True
+            self.io_loop.add_callback(self.runIdleCallbacks)
 
-    def callEvery(self, interval, callback):
-        """Call the given `callback` once every `interval`.
+        return queued
 
-        `interval` should either be a `datetime.timedelta`, or a number representing seconds.
+    def runIdleCallbacks(self):
+        """Run queued idle callbacks, until the queue is empty or we've used up `idleTimeBudget`.
+
+        If we run out of time, the remaining callbacks are run on the IOLoop's next iteration.
 
         """
-        cb = None
+        self.idleRunScheduled = False
+
+        count = super(ZMQEventLoop, self).runIdleCallbacks()
 
-        def call():
-            if not callback():
-                cb.stop()
+        if self.idleQueue and not self.idleRunScheduled:
+            self.idleRunScheduled = True
+            self.io_loop.add_callback(self.runIdleCallbacks)
 
-        cb = zmq.eventloop.ioloop.PeriodicCallback(
-                call,
-                self.asTimedelta(interval).total_seconds() * 1000,
-                self.io_loop
-                )
-        cb.start()
+        return count
 
     def register(self, stream, handler, events=(StreamEvents.INCOMING, ), event=None):
         """Register a `handler` for a given `event` on the given `stream`.
@@ -78,14 +127,7 @@ class ZMQEventLoop(BaseEventLoop):
         `handler` will be called with `stream` and `event` as arguments.
 
         """
-        # This should cover most cases.
-        try:
-            fd = stream.fileno()
-        except TypeError:
-            fd = stream.fileno
-        except AttributeError:
-            # Stupid xpyb not conforming to the file-like object protocol.
-            fd = stream.get_file_descriptor()
+        fd = self.fileDescriptorFor(stream)
 
         if event is not None:
             warnings.warn("'event' is deprecated! Use 'events' instead.", DeprecationWarning)
@@ -96,7 +138,7 @@ class ZMQEventLoop(BaseEventLoop):
         def callHandler(fd, evt):
             for streamEvt, zmqEvt in streamEventsToZMQEvents.iteritems():
                 if evt & zmqEvt:
-                    handler(stream, streamEvt)
+                    self.stats.call(handler, stream, streamEvt)
 
         self.io_loop.add_handler(fd, callHandler, events)
 
@@ -120,4 +162,9 @@ class ZMQEventLoop(BaseEventLoop):
         This should not return until the program exits.
 
         """
-        self.io_loop.start()
+        self.startInstrumentation()
+
+        try:
+            self.io_loop.start()
+        finally:
+            self.stopInstrumentation()
@@ -1,4 +1,4 @@
-from xpybutil.util import get_atom as atom
+from .atoms import atom
 
 
 class EWMHAction(object):
@@ -11,16 +11,17 @@ import logging
 import time
 
 import xcb
-from xcb.xproto import Atom, CW, ConfigWindow, ConfigureNotifyEvent, PropMode, StackMode
+from xcb.xproto import Atom, CW, ConfigWindow, PropMode, StackMode
 
 import xpybutil
 import xpybutil.event
 import xpybutil.ewmh as ewmh
 import xpybutil.icccm as icccm
-from xpybutil.util import get_atom as atom
 
 import cairo
 
+from .atoms import atom
+from .eventloop.idle import IdlePriority
 from .ewmh import EWMHAction, EWMHWindowState
 from .signals import Signal
 from .signaled import SignaledSet, SignaledDict
@@ -28,6 +29,7 @@ from .settings import settings
 from .themes.default import Default
 from .paint import fonts
 from .paint.context import pushContext
+from .paint.damage import DamageRegion
 from .utils.geometry import Rect
 from .utils.x import convertAttributes
 from . import singletons
@@ -61,6 +63,9 @@ class WindowFrame(object):
     #TODO: Implement "shaded" mode; also, use this to display tabs/titlebars for hidden windows in layouts like
     # TabbedLayout and StackedLayout.
 
+    # The back buffer is only re-created when the frame grows, or shrinks by more than this many pixels.
+    resizeThreshold = 20
+
     def __init__(self, clientWindowID):
         self.frameWindowID = xcb.NONE
         self.clientWindowID = clientWindowID
@@ -74,9 +79,22 @@ class WindowFrame(object):
         self.requestShow = Signal()
         self.closed = Signal()
 
+        self.requestedGeometry = None  # The geometry we last asked the X server to give the frame window
+
+        self.title = None
+        self.visibleTitle = None  # The title as displayed, which may be shortened to fit (see `setVisibleTitle`)
+        self.publishedVisibleTitle = None  # The value of the client's _NET_WM_VISIBLE_NAME, if we've set it
+
         self.surface = None
         self.context = None
 
+        # We paint into an off-screen back buffer, and only copy the damaged parts of it to the frame window.
+        self.backSurface = None
+        self.backContext = None
+        self.backBufferSize = (0, 0)
+        self.staleArea = DamageRegion()  # Areas of the back buffer which need to be redrawn
+        self.damage = DamageRegion()  # Areas of the frame window which need to be copied from the back buffer
+
         self.clientMapped = False  # Whether or not the client window is currently mapped on the screen
         self.frameMapped = False  # Whether or not the frame window is currently mapped on the screen
         self.clientDestroyed = False  # Whether or not the client window has been destroyed
@@ -88,11 +106,12 @@ class WindowFrame(object):
         self._icccmIconWindowID = xcb.NONE
         self.addedToWorkspace = None  # When this frame was added to its workspace
 
+        # (Signals only keep weak references to their handlers, so these have to be methods rather than lambdas.)
         self.ewmhStates = SignaledSet()
-        self.ewmhStates.updated.connect(lambda: singletons.eventloop.callWhenIdle(self._updateEWMHState))
+        self.ewmhStates.updated.connect(self._scheduleEWMHStateUpdate)
 
         self.layoutInfo = SignaledDict()
-        self.layoutInfo.updated.connect(lambda: singletons.eventloop.callWhenIdle(self._updateLayoutInfo))
+        self.layoutInfo.updated.connect(self._scheduleLayoutInfoUpdate)
 
         self.subscribeToClientEvents()
 
@@ -105,10 +124,10 @@ class WindowFrame(object):
         xpybutil.event.connect('MapNotify', self.clientWindowID, self.onClientMapNotify)
         xpybutil.event.connect('UnmapNotify', self.clientWindowID, self.onClientUnmapNotify)
         xpybutil.event.connect('DestroyNotify', self.clientWindowID, self.onClientDestroyNotify)
-        #TODO: Listen for all property changes on the client window so we can respond to changes? Actually, this should
-        # probably be handling for ClientMessage requests sent to the root instead.
+        xpybutil.event.connect('PropertyNotify', self.clientWindowID, self.onClientPropertyNotify)
 
         xpybutil.window.listen(self.clientWindowID, 'PropertyChange', 'StructureNotify')
+        singletons.x.properties.watch(self.clientWindowID)
 
     def subscribeToFrameEvents(self):
         self.logger.info("Subscribing to frame window events.")
@@ -137,6 +156,9 @@ class WindowFrame(object):
             xpybutil.event.disconnect('MapNotify', self.clientWindowID)
             xpybutil.event.disconnect('UnmapNotify', self.clientWindowID)
             xpybutil.event.disconnect('DestroyNotify', self.clientWindowID)
+            xpybutil.event.disconnect('PropertyNotify', self.clientWindowID)
+
+            singletons.x.properties.forget(self.clientWindowID)
 
         # Frame window events
         if self.frameWindowID is not None:
@@ -227,21 +249,19 @@ class WindowFrame(object):
 
         # If this window is viewable, map it.
         if self.viewable:
-            cookies = list()
-
-            if not self.clientMapped:
-                self.logger.debug("_doShow: Mapping client window.")
-                cookies.append(xpybutil.conn.core.MapWindowChecked(self.clientWindowID))
+            def checkResult(value, error):
+                if error is not None:
+                    self.logger.error("_doShow: Error mapping %r or its client: %s", self, error)
 
-            if not self.frameMapped:
-                self.logger.debug("_doShow: Mapping frame window.")
-                cookies.append(xpybutil.conn.core.MapWindowChecked(self.frameWindowID))
+            # Check the results along with the rest of the current batch, instead of waiting on each frame in turn.
+            with singletons.x.batch() as batch:
+                if not self.clientMapped:
+                    self.logger.debug("_doShow: Mapping client window.")
+                    batch.add(xpybutil.conn.core.MapWindowChecked(self.clientWindowID), checkResult)
 
-            for cookie in cookies:
-                try:
-                    cookie.check()
-                except:
-                    self.logger.exception("_doShow: Error mapping %r or its client!", self)
+                if not self.frameMapped:
+                    self.logger.debug("_doShow: Mapping frame window.")
+                    batch.add(xpybutil.conn.core.MapWindowChecked(self.frameWindowID), checkResult)
 
             self.icccmState = icccm.State.Normal
             #FIXME: EWMH state!
@@ -250,8 +270,17 @@ class WindowFrame(object):
             self.logger.warn("_doShow called, but frame is not viewable!")
 
     def moveResize(self, x, y, width, height, flush=True):
-        if (self.x, self.y, self.width, self.height) == (x, y, width, height):
+        """Move and resize the frame, unless it's already at (or on its way to) the given geometry.
+
+        Returns True if a ConfigureWindow request was sent.
+
+        """
+        geometry = (x, y, width, height)
+        if geometry == self.requestedGeometry:
             self.logger.trace("moveResize: Geometry didn't change; skipping ConfigureWindow call.")
+            return False
+
+        self.requestedGeometry = geometry
 
         attributes = convertAttributes({
                 ConfigWindow.X: x,
@@ -264,6 +293,8 @@ class WindowFrame(object):
         if flush:
             xpybutil.conn.flush()
 
+        return True
+
     def focus(self, flush=True):
         """Focus this window.
 
@@ -313,6 +344,7 @@ class WindowFrame(object):
         return self.layoutInfo.get(layout.layoutInfoKey, {})
 
     def setLayoutInfo(self, layout, data):
+        # Only changed values are written back to the client's _FTTPWM_LAYOUT_INFO property. (see `SignaledDict`)
         self.layoutInfo[layout.layoutInfoKey] = data
 
     ## Frame events ####
@@ -321,22 +353,19 @@ class WindowFrame(object):
         if event.window != self.frameWindowID:
             return
 
-        # If there's any other ConfigureNotify events for this window in the queue, ignore this one.
-        xpybutil.event.read(block=False)
-        for ev in xpybutil.event.peek():
-            if isinstance(ev, ConfigureNotifyEvent) and ev.event == ev.window and ev.event == self.frameWindowID:
-                self.logger.debug("onConfigureNotify: Ignoring event; more are in the queue.")
-                return
-
         self.x, self.y = event.x, event.y
         self.width, self.height = event.width, event.height
 
+        # Something else (like a mouse drag) may have moved us; make sure the next `moveResize` isn't skipped.
+        self.requestedGeometry = (event.x, event.y, event.width, event.height)
+
         self.logger.debug("onConfigureNotify: Window geometry changed to %rx%r+%r+%r",
                 self.width, self.height, self.x, self.y)
 
-        # Window size changed; resize surface and reset clip region.
+        # Window size changed; resize surfaces and reset clip region.
         self.surface.set_size(event.width, event.height)
         self.context.reset_clip()
+        self.resizeBackBuffer(event.width, event.height)
 
         # Send client window a ConfigureNotify as well (regardless of whether the client's geometry actually changed)
         # so windows can update if their absolute coordinates changed.
@@ -350,7 +379,7 @@ class WindowFrame(object):
                 })
         xpybutil.conn.core.ConfigureWindow(self.clientWindowID, *attributes)
 
-        singletons.eventloop.callWhenIdle(self.paint)
+        self.invalidate()
 
     def onEnterNotify(self, event):
         self.logger.trace("onEnterNotify: %r", event.__dict__)
@@ -359,12 +388,15 @@ class WindowFrame(object):
             self.focus
 
     def onExpose(self, event):
-        singletons.eventloop.callWhenIdle(self.paint)
+        # The back buffer is still up to date; we only need to copy the exposed area back to the window.
+        self.damage.add(Rect(event.x, event.y, event.width, event.height))
+
+        singletons.eventloop.callWhenIdle(self.paint, priority=IdlePriority.Paint)
 
     def onMapNotify(self, event):
         self.frameMapped = True
 
-        singletons.eventloop.callWhenIdle(self.paint)
+        self.invalidate()
 
     def onUnmapNotify(self, event):
         self.frameMapped = False
@@ -399,16 +431,9 @@ class WindowFrame(object):
         # in the Withdrawn state)
         self.logger.debug("onClientMapRequest: Client window initial map notification received; setting up frame.")
 
-        # Start fetching some information about the client window.
-        cookies = Namespace()
-        cookies.geometry = xpybutil.conn.core.GetGeometry(self.clientWindowID)
-        cookies.ewmhTitle = ewmh.get_wm_name(self.clientWindowID)
-        cookies.icccmTitle = icccm.get_wm_name(self.clientWindowID)
-        cookies.icccmProtocols = icccm.get_wm_protocols(self.clientWindowID)
-        cookies.icccmClientHints = icccm.get_wm_hints(self.clientWindowID)
-        xpybutil.conn.flush()
-
-        if self.frameWindowID == xcb.NONE:
+        # Allocate the frame window's ID right away, so the WM can start tracking it before the frame is set up.
+        createFrame = self.frameWindowID == xcb.NONE
+        if createFrame:
             self.frameWindowID = xpybutil.conn.generate_id()
             self.frameWindowAttributes = {
                     CW.OverrideRedirect: 1,
@@ -422,10 +447,36 @@ class WindowFrame(object):
             self.logger.debug("Creating frame window; logger renaming to %r.", newLoggerName)
             self.logger = logging.getLogger(newLoggerName)
 
+        # Start fetching some information about the client window; we'll finish setting up once the current batch of
+        # requests is resolved.
+        properties = singletons.x.properties
+
+        with singletons.x.batch() as batch:
+            replies = Namespace()
+            replies.geometry = batch.add(xpybutil.conn.core.GetGeometry(self.clientWindowID))
+            replies.ewmhTitle = properties.get(self.clientWindowID, '_NET_WM_NAME', ewmh.get_wm_name)
+            replies.icccmTitle = properties.get(self.clientWindowID, 'WM_NAME', icccm.get_wm_name)
+            replies.icccmProtocols = properties.get(self.clientWindowID, 'WM_PROTOCOLS', icccm.get_wm_protocols)
+            replies.icccmClientHints = properties.get(self.clientWindowID, 'WM_HINTS', icccm.get_wm_hints)
+
+            # WorkspaceManager.placeOnWorkspace reads this once we're finished; fetch it in the same round-trip.
+            properties.get(self.clientWindowID, '_NET_WM_DESKTOP', ewmh.get_wm_desktop)
+
+            batch.whenResolved(lambda: self.finishClientMapRequest(replies, createFrame))
+
+    def finishClientMapRequest(self, replies, createFrame):
+        if replies.geometry.error is not None:
+            self.logger.warn("finishClientMapRequest: Couldn't get client window geometry; it was probably destroyed "
+                    "before we could set it up. (%s)", replies.geometry.error)
+            return
+
+        cookies = Namespace()
+        geom = replies.geometry.value
+
+        if createFrame:
             # Get window geometry.
-            geom = cookies.geometry.reply()
-            del cookies.geometry
             self.x, self.y, self.width, self.height = geom.x, geom.y, geom.width, geom.height
+            self.requestedGeometry = (geom.x, geom.y, geom.width, geom.height)
 
             # Create the frame window.
             self.frameWindowID, cookies.createWindow = singletons.x.createWindow(
@@ -437,22 +488,17 @@ class WindowFrame(object):
             self.surface = cairo.XCBSurface(xpybutil.conn, self.frameWindowID, singletons.x.visual,
                     self.width, self.height)
             self.context = cairo.Context(self.surface)
+            self.resizeBackBuffer(self.width, self.height)
 
             self.activateBindings()
 
         else:
-            # Get window geometry.
-            geom = cookies.geometry.reply()
-            del cookies.geometry
-
             # Move and resize the frame window.
             self.moveResize(geom.x, geom.y, geom.width, geom.height, flush=False)
 
         # Set window title.
-        self.title = cookies.ewmhTitle.reply() or cookies.icccmTitle.reply()
+        self.title = replies.ewmhTitle.value or replies.icccmTitle.value
         self.logger.info("New window has title %r", self.title)
-        del cookies.ewmhTitle
-        del cookies.icccmTitle
 
         # Set the frame's _NET_WM_NAME to match the client's title.
         cookies.setTitle = ewmh.set_wm_name_checked(self.frameWindowID, self.title)
@@ -475,8 +521,7 @@ class WindowFrame(object):
                 EWMHAction.Close,
                 ])
 
-        self.icccmClientHints = cookies.icccmClientHints.reply()
-        del cookies.icccmClientHints
+        self.icccmClientHints = replies.icccmClientHints.value
 
         icccmFlags = defaultdict(bool)
         if self.icccmClientHints is not None and 'flags' in self.icccmClientHints:
@@ -506,7 +551,6 @@ class WindowFrame(object):
         #TODO: Respect more of the above hints!
 
         #TODO: Honor the initial value of _NET_WM_STATE (ewmh.get_wm_state), suppressing _updateEWMHState!
-        #TODO: Honor the initial value of _NET_WM_DESKTOP! (ewmh.get_wm_desktop)
         #TODO: Copy _FTTPWM_LAYOUT_INFO into self.layoutInfo, suppressing _updateLayoutInfo!
 
         # Default to showing the window normally.
@@ -545,8 +589,7 @@ class WindowFrame(object):
         self.subscribeToFrameEvents()
 
         # Get ICCCM _NET_WM_PROTOCOLS property.
-        self.protocols = cookies.icccmProtocols.reply()
-        del cookies.icccmProtocols
+        self.protocols = replies.icccmProtocols.value
 
         #TODO: Implement _NET_WM_PING!
         #if atom('_NET_WM_PING') in self.protocols:
@@ -554,13 +597,17 @@ class WindowFrame(object):
 
         self.initialized = True
 
-        # Flush the connection, and make sure all of our requests succeeded.
-        xpybutil.conn.flush()
-        for name, cookie in cookies._get_kwargs():
-            try:
-                cookie.check()
-            except:
-                self.logger.exception("Error while checking results of %s query!", name)
+        # Make sure all of our requests succeeded; these get checked together with the rest of the current batch.
+        def checkResult(name):
+            def onResult(value, error):
+                if error is not None:
+                    self.logger.error("Error while checking results of %s query: %s", name, error)
+
+            return onResult
+
+        with singletons.x.batch() as batch:
+            for name, cookie in cookies._get_kwargs():
+                batch.add(cookie, checkResult(name))
 
         singletons.wm.workspaces.placeOnWorkspace(self)
 
@@ -611,6 +658,10 @@ class WindowFrame(object):
         except:
             self.logger.exception("Error hiding frame window!")
 
+    def onClientPropertyNotify(self, event):
+        if event.atom in (atom('_NET_WM_NAME'), Atom.WM_NAME) and self.initialized:
+            self.updateTitle()
+
     def onClientDestroyNotify(self, event):
         self.logger.debug("onClientDestroyNotify: %r", event.__dict__)
 
@@ -641,6 +692,11 @@ class WindowFrame(object):
         if self.surface is not None:
             self.surface.finish()
 
+        self.backContext = None
+        if self.backSurface is not None:
+            self.backSurface.finish()
+            self.backSurface = None
+
         self.icccmState = icccm.State.Withdrawn
 
         # Emit 'closed' signal.
@@ -763,7 +819,7 @@ class WindowFrame(object):
             return
 
         self._icccmState = state
-        singletons.eventloop.callWhenIdle(self._updateICCCMState)
+        singletons.eventloop.callWhenIdle(self._updateICCCMState, priority=IdlePriority.Properties)
 
     @property
     def icccmIconWindowID(self):
@@ -775,7 +831,7 @@ class WindowFrame(object):
             return
 
         self._icccmIconWindowID = window
-        singletons.eventloop.callWhenIdle(self._updateICCCMState)
+        singletons.eventloop.callWhenIdle(self._updateICCCMState, priority=IdlePriority.Properties)
 
     ## Update Methods ####
     def _updateICCCMState(self):
@@ -784,6 +840,12 @@ class WindowFrame(object):
                     self.icccmState, self.icccmIconWindowID)
             icccm.set_wm_state(self.clientWindowID, self.icccmState, self.icccmIconWindowID)
 
+    def _scheduleEWMHStateUpdate(self):
+        singletons.eventloop.callWhenIdle(self._updateEWMHState, priority=IdlePriority.Properties)
+
+    def _scheduleLayoutInfoUpdate(self):
+        singletons.eventloop.callWhenIdle(self._updateLayoutInfo, priority=IdlePriority.Properties)
+
     def _updateEWMHState(self):
         if self.clientWindowID is not None:
             self.logger.trace("_updateEWMHState: Setting _NET_WM_STATE: %r", self.ewmhStates)
@@ -795,11 +857,142 @@ class WindowFrame(object):
             self.logger.trace("_updateLayoutInfo: Setting _FTTPWM_LAYOUT_INFO: %r", json.dumps(self.layoutInfo))
             self.setClientProperty(atom('_FTTPWM_LAYOUT_INFO'), json.dumps(self.layoutInfo))
 
+    ## Title ####
+    def updateTitle(self):
+        """Re-read the client's title. (the property cache only asks the server for whichever title property changed)
+
+        """
+        properties = singletons.x.properties
+
+        with singletons.x.batch() as batch:
+            ewmhTitle = properties.get(self.clientWindowID, '_NET_WM_NAME', ewmh.get_wm_name)
+            icccmTitle = properties.get(self.clientWindowID, 'WM_NAME', icccm.get_wm_name)
+
+            batch.whenResolved(lambda: self.setTitle(ewmhTitle.value or icccmTitle.value))
+
+    def setTitle(self, title):
+        if title == self.title or self.frameWindowID is None:
+            return
+
+        self.logger.debug("Title changed to %r", title)
+        self.title = title
+
+        # Keep the frame's _NET_WM_NAME in sync with the client's title.
+        ewmh.set_wm_name(self.frameWindowID, title)
+
+        self.invalidateTitlebar()
+
+        # Our tab is also shown in the titlebars of the other frames sharing our tab bar.
+        tabBar = self.tabBar
+        if tabBar is not None:
+            tabBar.invalidate()
+
+    def setVisibleTitle(self, visibleTitle):
+        """Record the title as the theme actually displays it; called by the theme each time it draws our tab.
+
+        """
+        if visibleTitle == self.visibleTitle:
+            return
+
+        self.visibleTitle = visibleTitle
+        singletons.eventloop.callWhenIdle(self._updateVisibleName, priority=IdlePriority.Properties)
+
+    def _updateVisibleName(self):
+        if self.clientWindowID is None or self.clientDestroyed:
+            return
+
+        # Per EWMH, _NET_WM_VISIBLE_NAME is only set while we display something other than _NET_WM_NAME.
+        visibleName = self.visibleTitle if self.visibleTitle != self.title else None
+        if visibleName == self.publishedVisibleTitle:
+            return
+
+        if visibleName is None:
+            self.logger.trace("_updateVisibleName: Removing _NET_WM_VISIBLE_NAME")
+            xpybutil.conn.core.DeleteProperty(self.clientWindowID, atom('_NET_WM_VISIBLE_NAME'))
+        else:
+            self.logger.trace("_updateVisibleName: Setting _NET_WM_VISIBLE_NAME: %r", visibleName)
+            ewmh.set_wm_visible_name(self.clientWindowID,
+                    visibleName.encode('utf-8') if isinstance(visibleName, unicode) else visibleName)
+
+        self.publishedVisibleTitle = visibleName
+
     ## Visual Stuff ####
     def applyTheme(self):
         settings.theme.apply(self)
 
-        singletons.eventloop.callWhenIdle(self.paint)
+        self.invalidate()
+
+        # Our tab is also shown in the titlebars of the other frames sharing our tab bar.
+        tabBar = self.tabBar
+        if tabBar is not None:
+            tabBar.invalidate()
+
+    @property
+    def tabBar(self):
+        if self._workspace is None:
+            return None
+
+        return self._workspace.layout.tabBar(self)
+
+    @property
+    def decorationRects(self):
+        """The areas of the frame which aren't covered by the client window. (the titlebar and borders)
+
+        """
+        left, right, top, bottom = settings.theme.getFrameExtents(self)
+        innerHeight = self.height - top - bottom
+
+        rects = [
+                Rect(0, 0, self.width, top),
+                Rect(0, self.height - bottom, self.width, bottom),
+                Rect(0, top, left, innerHeight),
+                Rect(self.width - right, top, right, innerHeight),
+                ]
+        return [rect for rect in rects if not rect.empty]
+
+    def invalidate(self, rect=None):
+        """Mark the given area of the frame (or all of its decorations, if `rect` is None) as needing to be redrawn.
+
+        """
+        # Until the back buffer is created, there's nothing to invalidate; all of it will be drawn once it exists.
+        if self.backSurface is not None:
+            for rect in ([rect] if rect is not None else self.decorationRects):
+                self.staleArea.add(rect)
+                self.damage.add(rect)
+
+        singletons.eventloop.callWhenIdle(self.paint, priority=IdlePriority.Paint)
+
+    def invalidateTitlebar(self):
+        if self.backSurface is not None:
+            self.invalidate(Rect(0, 0, self.width, settings.theme.getFrameThemeValue(self, 'titlebarHeight')))
+
+    def resizeBackBuffer(self, width, height):
+        """Make sure the back buffer is big enough for a frame of the given size.
+
+        Like `XPixmapSurface`, we don't bother re-creating the buffer for changes within `resizeThreshold` pixels.
+
+        """
+        bufferWidth, bufferHeight = self.backBufferSize
+        rst = self.resizeThreshold
+
+        if self.backSurface is not None and bufferWidth >= width and bufferHeight >= height \
+                and width + 2 * rst >= bufferWidth and height + 2 * rst >= bufferHeight:
+            return
+
+        if self.backSurface is not None:
+            self.backContext = None
+            self.backSurface.finish()
+
+        # A surface similar to the frame's window surface is a server-side pixmap, so copying from it is cheap.
+        self.backBufferSize = (width + rst, height + rst)
+        self.backSurface = self.surface.create_similar(cairo.CONTENT_COLOR, *self.backBufferSize)
+        self.backContext = cairo.Context(self.backSurface)
+
+        # The new buffer is empty, so all of our decorations need to be redrawn. (the rest is covered by the client)
+        self.staleArea.clear()
+        for rect in self.decorationRects:
+            self.staleArea.add(rect)
+            self.damage.add(rect)
 
     def paint(self):
         if not self.initialized or self.frameWindowID is None or self.clientWindowID is None \
@@ -807,38 +1000,46 @@ class WindowFrame(object):
             # Skip painting.
             return
 
-        self.context.set_operator(cairo.OPERATOR_OVER)
+        if self.staleArea:
+            with pushContext(self.backContext):
+                self.staleArea.clip(self.backContext)
+                self.paintBackBuffer()
 
-        tabs = self.workspace.layout.tabs(self)
-        if tabs:
-            self.logger.debug("paint: painting tabs in frame %r", self)
-            tabSpacing, titlebarHeight = settings.theme.getFrameThemeValues(self, 'tabSpacing', 'titlebarHeight')
+            self.staleArea.clear()
 
-            tabWidth = (self.width - (tabSpacing * (len(tabs) - 1))) / len(tabs)
-            tabX = 0
+        if self.damage:
+            # Copy the damaged areas from the back buffer to the window.
+            with pushContext(self.context):
+                self.damage.clip(self.context)
+                self.context.set_operator(cairo.OPERATOR_SOURCE)
+                self.context.set_source_surface(self.backSurface, 0, 0)
+                self.context.paint()
 
-            # Draw the window border and our tab.
-            ourIndex = tabs.index(self)
-            ourTabGeom = [(tabWidth + tabSpacing) * ourIndex, 0, tabWidth, titlebarHeight]
+            self.damage.clear()
+            self.surface.flush()
 
-            with pushContext(self.context):
-                settings.theme.paintWindow(self.context, self, ourTabGeom)
+    def paintBackBuffer(self):
+        """Redraw the stale areas of the back buffer. (drawing is clipped to `staleArea`)
 
-            # Draw other tabs.
-            for tabbedFrame in tabs:
-                # We already painted the tab for this frame; skip it.
-                if tabbedFrame is not self:
-                    tabGeom = [tabX, 0, tabWidth, titlebarHeight]
-                    self.logger.debug("paint: painting tab for %sframe %r at %r",
-                            'focused ' if tabbedFrame.focused else '', tabbedFrame, tabGeom)
+        """
+        context = self.backContext
+        context.set_operator(cairo.OPERATOR_OVER)
 
-                    with pushContext(self.context):
-                        settings.theme.paintTab(self.context, tabbedFrame, tabGeom)
+        tabBar = self.tabBar
+        if tabBar is not None:
+            self.logger.debug("paint: painting tabs in frame %r", self)
 
-                tabX += tabWidth + tabSpacing
+            # Draw the window border; the theme leaves the titlebar to the tab bar.
+            with pushContext(context):
+                settings.theme.paintWindow(context, self)
+
+            # Copy the tabs (including ours) from the strip shared by all frames in this layout; it's only re-rendered
+            # when one of its tabs changes.
+            with pushContext(context):
+                context.set_source_surface(tabBar.render(self.backSurface), 0, 0)
+                context.rectangle(0, 0, tabBar.width + 1, tabBar.height + 1)
+                context.fill()
 
         else:
             self.logger.debug("paint: painting full window for frame %r", self)
-            settings.theme.paintWindow(self.context, self)
-
-        self.surface.flush()
+            settings.theme.paintWindow(context, self)
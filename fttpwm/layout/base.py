@@ -7,11 +7,12 @@ Licensed under the MIT license; see the LICENSE file for details.
 """
 from abc import ABCMeta, abstractmethod
 import importlib
-import math
 
 import xpybutil
 
-from ..utils import between, loggerFor
+from ..utils import loggerFor
+from ..utils.linkedlist import LinkedList
+from .. import singletons
 
 
 class BaseLayout(object):
@@ -49,6 +50,12 @@ class BaseLayout(object):
     def tabs(self, frame):
         return None
 
+    def tabBar(self, frame):
+        """Get the `TabBar` shown in the given frame's titlebar, if this layout shows tabs.
+
+        """
+        return None
+
 
 class TilingLayout(BaseLayout):
     def __init__(self, padding=0, *args, **kwargs):
@@ -58,10 +65,26 @@ class TilingLayout(BaseLayout):
 
 
 class ListLayout(BaseLayout):
-    """Base class for layouts which track all of their windows in a single sortable list.
+    """Base class for layouts which track all of their windows in a single ordered list.
+
+    The order of each workspace's frames is kept in a `LinkedList`, so finding a frame's siblings and moving a frame
+    don't need to sort anything. Each frame's position is saved to its layout info as 'index' (so it survives restarts)
+    when the workspace is next arranged.
 
     """
+    def __init__(self, *args, **kwargs):
+        # Maps each workspace to a `LinkedList` of its viewable frames, in layout order.
+        self.frameOrders = dict()
+
+        super(ListLayout, self).__init__(*args, **kwargs)
+
     def arrange(self, ws):
+        """Position all viewable frames on the given workspace.
+
+        Only frames which actually changed are touched: `moveResize` skips frames which are already in place, and
+        layout info is only rewritten for frames whose index moved.
+
+        """
         frames = self.sortedFrames(ws)
         frameCount = len(frames)
 
@@ -69,15 +92,23 @@ class ListLayout(BaseLayout):
 
         self.startArrange(ws, frameCount)
 
-        for index, frame in enumerate(frames):
-            geometry = self.framePosition(index, frame, ws, frameCount)
-            self.logger.debug("Moving/resizing %r to %r.", frame, geometry)
-            frame.moveResize(*geometry, flush=False)
+        moved = 0
+        with singletons.x.batch():
+            for index, frame in enumerate(frames):
+                geometry = self.framePosition(index, frame, ws, frameCount)
+                if frame.moveResize(*geometry, flush=False):
+                    self.logger.debug("Moved/resized %r to %r.", frame, geometry)
+                    moved += 1
+
+                self.onFramePositioned(index, frame, ws, frameCount)
 
-            self.onFramePositioned(index, frame, ws, frameCount)
+                # Update all frame indices to be consecutive integers.
+                if frame.getLayoutInfo(self).get('index') != index:
+                    frame.setLayoutInfo(self, {'index': index})
 
-            # Update all frame indices to be consecutive integers.
-            frame.setLayoutInfo(self, {'index': index})
+            self.finishArrange(ws, frames)
+
+        self.logger.debug("arrange: Moved/resized %d of %d frames.", moved, frameCount)
 
         xpybutil.conn.flush()
 
@@ -85,6 +116,9 @@ class ListLayout(BaseLayout):
     def startArrange(self, ws, frameCount):
         pass
 
+    def finishArrange(self, ws, frames):
+        pass
+
     @abstractmethod
     def framePosition(self, index, frame, ws, frameCount):
         pass
@@ -93,46 +127,76 @@ class ListLayout(BaseLayout):
         # By default, ensure all frames are visible
         frame._doShow()
 
-    def sortedFrames(self, ws):
-        return sorted(ws.viewableFrames, key=lambda frame: frame.getLayoutInfo(self).get('index', float('inf')))
+    def frameOrder(self, ws):
+        """Get the `LinkedList` of viewable frames on the given workspace, updated to match the workspace's frames.
 
-    def moveFrame(self, frame, n):
-        """Move the frame forward or backward within its list of siblings by the given number of positions.
+        Frames which are new to the list are inserted at the index saved in their layout info, or at the end if they
+        don't have one; frames which are no longer viewable are dropped.
+
+        """
+        try:
+            order = self.frameOrders[ws]
+        except KeyError:
+            order = self.frameOrders[ws] = LinkedList()
+
+        frames = ws.viewableFrames
+        viewable = set(frames)
+
+        for frame in [frame for frame in order if frame not in viewable]:
+            order.remove(frame)
+
+        savedIndex = lambda frame: frame.getLayoutInfo(self).get('index', float('inf'))
+        for frame in sorted((frame for frame in frames if frame not in order), key=savedIndex):
+            index = savedIndex(frame)
+            if index == float('inf'):
+                order.append(frame)
+            else:
+                order.insert(int(index), frame)
+
+        return order
+
+    def frameOrderContaining(self, frame):
+        """Get the order of `frame`'s workspace, only updating it if it doesn't contain `frame` yet.
 
         """
-        currentPos = frame.getLayoutInfo(self).get('index', float('inf'))
-        targetPos = currentPos + n
+        order = self.frameOrders.get(frame.workspace)
+        if order is None or frame not in order:
+            order = self.frameOrder(frame.workspace)
 
-        frame.setLayoutInfo(self, {
-                'index': targetPos
-                })
+        return order
 
-        # Shift each sibling between the original and new positions by +1 or -1, to make room.
-        shiftSiblingsBy = -int(math.copysign(1, n))
+    def sortedFrames(self, ws):
+        return list(self.frameOrder(ws))
 
-        self.logger.debug("Moving frame %r from position %r to %r; shifting siblings by %r.",
-                frame, currentPos, targetPos, shiftSiblingsBy)
+    def moveFrame(self, frame, n):
+        """Move the frame forward or backward within its list of siblings by the given number of positions.
 
-        for sibling in frame.workspace.viewableFrames:
-            if sibling != frame:
-                siblingPos = sibling.getLayoutInfo(self).get('index', float('inf'))
+        """
+        order = self.frameOrderContaining(frame)
+        if frame not in order:
+            self.logger.warn("moveFrame: %r isn't viewable on its workspace; not moving it.", frame)
+            return
 
-                if between(siblingPos, currentPos, targetPos) or siblingPos == targetPos:
-                    self.logger.debug("Sibling frame %r (index %r) is in the range to be moved.", sibling, siblingPos)
-                    sibling.setLayoutInfo(self, {
-                            'index': siblingPos + shiftSiblingsBy
-                            })
-                else:
-                    self.logger.debug("Sibling frame %r (index %r) is not in the range to be moved.",
-                            sibling, siblingPos)
+        self.logger.debug("Moving frame %r by %r positions.", frame, n)
+        order.move(frame, n)
 
-        # Now, rearrange the window's workspace. (will convert all indices back to consecutive integers)
+        # Now, rearrange the window's workspace. (which will also save the frames' new indices)
         frame.workspace.arrangeWindows()
 
     def focusSiblingFrame(self, frame, n):
         """Focus the frame `n` positions before (n < 0) or after (n > 0) the given one.
 
         """
-        frames = self.sortedFrames(frame.workspace)
-        siblingIdx = (frames.index(frame) + n) % len(frames)
-        frames[siblingIdx].focus()
+        order = self.frameOrderContaining(frame)
+        if frame not in order:
+            self.logger.warn("focusSiblingFrame: %r isn't viewable on its workspace.", frame)
+            return
+
+        # Skip over any frames which were closed or hidden since the workspace was last arranged.
+        sibling = order.sibling(frame, n)
+        for _ in range(len(order)):
+            if sibling.valid and sibling.viewable:
+                break
+            sibling = order.sibling(sibling, 1 if n > 0 else -1)
+
+        sibling.focus()
@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: Split tree window layout
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+import xpybutil
+
+from ..settings import settings
+from ..utils.linkedlist import LinkedList
+from .. import singletons
+from .base import TilingLayout
+
+
+settings.setDefaults(
+        # Where split tree layouts put new windows: 'splitH' (split the focused window's space in half, and put the new
+        # window beside it), 'splitV' (the same, but above or below it), 'newCol' (add a new screen-height column) or
+        # 'newRow' (add a new screen-width row)
+        onNewWindow='splitH',
+        # How much space new columns and rows get: 'fair' (1/(n+1) of the screen, shrinking all other columns or rows
+        # equally to compensate) or 'nearby' (half of the space of the column or row they're added next to)
+        newContainerPolicy='fair',
+        # Which side new windows and columns are added on: 'left' or 'right'
+        newContainerDirectionH='right',
+        # Which side new windows and rows are added on: 'above' or 'below'
+        newContainerDirectionV='below',
+        )
+
+
+class Node(object):
+    def __init__(self, ratio=1.0):
+        self.parent = None
+
+        # The fraction of the parent's space this node takes up; the ratios of a split's children always add up to 1.
+        self.ratio = ratio
+
+        # The bounds this node was last placed at, and whether it needs to be placed again even if they don't change.
+        self.bounds = None
+        self.dirty = True
+
+
+class Leaf(Node):
+    def __init__(self, frame, ratio=1.0):
+        super(Leaf, self).__init__(ratio)
+        self.frame = frame
+
+    def __repr__(self):
+        return '<Leaf {:.3f} {!r}>'.format(self.ratio, self.frame)
+
+    def describe(self):
+        return {'ratio': self.ratio, 'window': self.frame.clientWindowID}
+
+
+class Split(Node):
+    def __init__(self, horizontal, ratio=1.0):
+        super(Split, self).__init__(ratio)
+
+        # If True, children are placed side by side; otherwise, they're stacked from top to bottom.
+        self.horizontal = horizontal
+        self.children = []
+
+    def __repr__(self):
+        return '<Split {} {:.3f} {!r}>'.format('H' if self.horizontal else 'V', self.ratio, self.children)
+
+    def describe(self):
+        return {
+                'ratio': self.ratio,
+                'horizontal': self.horizontal,
+                'children': [child.describe() for child in self.children],
+                }
+
+    def insert(self, index, child):
+        child.parent = self
+        self.children.insert(index, child)
+
+    def normalize(self):
+        """Scale the children's ratios so they add up to 1 again.
+
+        """
+        total = sum(child.ratio for child in self.children)
+        for child in self.children:
+            child.ratio = child.ratio / total if total > 0 else 1.0 / len(self.children)
+
+
+class Tree(object):
+    """One workspace's tree of splits, with a frame in each leaf.
+
+    The frames are also kept in a `LinkedList` in the order their leaves appear in the tree, (left to right and top to
+    bottom) so stepping through them doesn't need to walk the tree.
+
+    """
+    def __init__(self):
+        self.root = None
+        self.leaves = dict()
+        self.order = LinkedList()
+
+        # Whether the tree's structure or ratios have changed since it was last saved.
+        self.changed = False
+
+        # Whether every node should be placed on the next arrange, even if its bounds didn't change.
+        self.forcePlacement = False
+
+        # Whether we've looked for a tree saved in the workspace's layout info yet.
+        self.restored = False
+
+    def __contains__(self, frame):
+        return frame in self.leaves
+
+    def invalidate(self):
+        self.forcePlacement = True
+
+    def clear(self):
+        self.root = None
+        self.leaves.clear()
+        self.order.clear()
+
+    def markDirty(self, node):
+        """Mark `node` and all of its ancestors as needing to be placed again.
+
+        """
+        while node is not None:
+            node.dirty = True
+            node = node.parent
+
+        self.changed = True
+
+    def replace(self, old, new):
+        """Put `new` in `old`'s place in the tree, with `old`'s ratio.
+
+        """
+        parent, new.ratio = old.parent, old.ratio
+
+        if parent is None:
+            self.root = new
+            new.parent = None
+        else:
+            parent.children[parent.children.index(old)] = new
+            new.parent = parent
+
+        # The new node takes over the old one's bounds, so if it was placed before, it needs to be placed again.
+        new.bounds = None
+        self.markDirty(new)
+
+    def addFirst(self, frame):
+        leaf = self.root = Leaf(frame)
+        self.leaves[frame] = leaf
+        self.order.append(frame)
+        self.markDirty(leaf)
+
+    def split(self, target, frame, horizontal, after):
+        """Split the space of the leaf `target` in half, and put `frame` in a new leaf after (or before) it.
+
+        """
+        leaf = Leaf(frame)
+        parent = target.parent
+
+        if parent is not None and parent.horizontal == horizontal:
+            # The target's parent is already split in this direction, so just add the new leaf beside the target.
+            leaf.ratio = target.ratio / 2
+            target.ratio -= leaf.ratio
+            parent.insert(parent.children.index(target) + (1 if after else 0), leaf)
+            self.markDirty(parent)
+
+        else:
+            split = Split(horizontal)
+            self.replace(target, split)
+
+            target.ratio = 0.5
+            leaf.ratio = 0.5
+            split.insert(0, target)
+            split.insert(1 if after else 0, leaf)
+
+        self.leaves[frame] = leaf
+        if after:
+            self.order.insertAfter(frame, target.frame)
+        else:
+            self.order.insertBefore(frame, target.frame)
+
+    def addAtEdge(self, frame, horizontal, atEnd, fair):
+        """Add `frame` in a new full-height column (or full-width row) at one end of the tree.
+
+        """
+        if not (isinstance(self.root, Split) and self.root.horizontal == horizontal):
+            split = Split(horizontal)
+            oldRoot = self.root
+            self.replace(oldRoot, split)
+            split.insert(0, oldRoot)
+            oldRoot.ratio = 1.0
+
+        root = self.root
+        leaf = Leaf(frame)
+
+        if fair:
+            count = len(root.children)
+            for child in root.children:
+                child.ratio *= float(count) / (count + 1)
+            leaf.ratio = 1.0 / (count + 1)
+
+        else:
+            neighbor = root.children[-1 if atEnd else 0]
+            leaf.ratio = neighbor.ratio / 2
+            neighbor.ratio -= leaf.ratio
+
+        root.insert(len(root.children) if atEnd else 0, leaf)
+        self.markDirty(root)
+
+        self.leaves[frame] = leaf
+        if atEnd:
+            self.order.append(frame)
+        else:
+            self.order.insertBefore(frame, self.order.first)
+
+    def remove(self, frame):
+        """Remove `frame`'s leaf, giving its space to its siblings; splits left with a single child are collapsed.
+
+        """
+        leaf = self.leaves.pop(frame)
+        self.order.remove(frame)
+
+        parent = leaf.parent
+        if parent is None:
+            self.root = None
+            self.changed = True
+            return
+
+        parent.children.remove(leaf)
+        parent.normalize()
+
+        if len(parent.children) == 1:
+            self.replace(parent, parent.children[0])
+        else:
+            self.markDirty(parent)
+
+    def swap(self, frame, other):
+        """Swap the leaves of two frames which are next to each other in `order`.
+
+        """
+        leaf, otherLeaf = self.leaves[frame], self.leaves[other]
+        leaf.frame, otherLeaf.frame = other, frame
+        self.leaves[frame], self.leaves[other] = otherLeaf, leaf
+
+        self.order.move(frame, 1 if self.order.next(frame, wrap=False) == other else -1)
+
+        self.markDirty(leaf)
+        self.markDirty(otherLeaf)
+
+    def resize(self, frame, amount, minRatio):
+        """Grow (or shrink, if `amount` is negative) `frame`'s share of its parent split by `amount`, taking the space
+        from (or giving it to) its siblings in proportion to their size.
+
+        """
+        leaf = self.leaves[frame]
+        parent = leaf.parent
+        if parent is None:
+            return
+
+        ratio = min(max(leaf.ratio + amount, minRatio), 1 - minRatio * (len(parent.children) - 1))
+        others = 1 - leaf.ratio
+        scale = (1 - ratio) / others if others > 0 else 0
+
+        for child in parent.children:
+            if child is not leaf:
+                child.ratio *= scale
+        leaf.ratio = ratio
+
+        self.markDirty(parent)
+
+    def restore(self, description, framesByWindowID):
+        """Rebuild the tree from a saved description, leaving out any windows which aren't in `framesByWindowID`.
+
+        """
+        self.clear()
+
+        def build(description, ratio):
+            if 'window' in description:
+                frame = framesByWindowID.get(description['window'])
+                if frame is None or frame in self.leaves:
+                    return None
+
+                leaf = self.leaves[frame] = Leaf(frame, ratio)
+                self.order.append(frame)
+                return leaf
+
+            descriptions = description.get('children', ())
+            children = [
+                    child
+                    for child in (build(child, child.get('ratio', 1.0)) for child in descriptions)
+                    if child is not None
+                    ]
+
+            if not children:
+                return None
+
+            if len(children) == 1:
+                children[0].ratio = ratio
+                return children[0]
+
+            split = Split(description.get('horizontal', True), ratio)
+            for child in children:
+                split.insert(len(split.children), child)
+
+            # Only rescale if windows were left out; otherwise, keep the saved ratios exactly as they were.
+            if len(children) != len(descriptions):
+                split.normalize()
+
+            return split
+
+        self.root = build(description, 1.0)
+        if self.root is not None:
+            self.root.ratio = 1.0
+            self.markDirty(self.root)
+
+
+class SplitTree(TilingLayout):
+    """Arranges frames in a tree of horizontal and vertical splits, each of which divides its space among its children
+    by ratio.
+
+    Where new windows go is decided by the `onNewWindow`, `newContainerPolicy`, `newContainerDirectionH` and
+    `newContainerDirectionV` settings, each of which can be overridden by passing it to the constructor. Each
+    workspace's tree (including its ratios) is saved in the workspace's layout info, so it survives restarts.
+
+    Arranging only walks into the parts of the tree which changed; subtrees whose bounds didn't change are skipped.
+
+    """
+    policyNames = ('onNewWindow', 'newContainerPolicy', 'newContainerDirectionH', 'newContainerDirectionV')
+
+    # The smallest share of a split that `resizeFrame` will shrink a window to.
+    minRatio = 0.05
+
+    def __init__(self, *args, **kwargs):
+        self.policies = dict((name, kwargs.pop(name)) for name in self.policyNames if name in kwargs)
+
+        # Maps each workspace to its `Tree`.
+        self.trees = dict()
+
+        super(SplitTree, self).__init__(*args, **kwargs)
+
+    def policy(self, name):
+        try:
+            return self.policies[name]
+        except KeyError:
+            return getattr(settings, name)
+
+    def treeFor(self, ws):
+        try:
+            return self.trees[ws]
+        except KeyError:
+            tree = self.trees[ws] = Tree()
+
+            # Frames are hidden along with their workspace, so everything needs to be shown again when it comes back.
+            ws.visibilityChanged.connect(tree.invalidate)
+
+            return tree
+
+    def updateTree(self, ws):
+        """Bring the given workspace's tree up to date with its viewable frames.
+
+        """
+        tree = self.treeFor(ws)
+        frames = ws.viewableFrames
+
+        if not tree.restored and ws.layoutInfoLoaded:
+            tree.restored = True
+
+            saved = ws.getLayoutInfo(self).get('tree')
+            if saved:
+                self.logger.debug("updateTree: Restoring saved tree.")
+                tree.restore(saved, dict((frame.clientWindowID, frame) for frame in frames))
+
+        viewable = set(frames)
+        for frame in [frame for frame in tree.order if frame not in viewable]:
+            tree.remove(frame)
+
+        for frame in sorted((frame for frame in frames if frame not in tree), key=ws.sortByAddedTime):
+            self.insertFrame(tree, ws, frame)
+
+        return tree
+
+    def insertFrame(self, tree, ws, frame):
+        if tree.root is None:
+            tree.addFirst(frame)
+            return
+
+        onNewWindow = self.policy('onNewWindow')
+        afterH = self.policy('newContainerDirectionH') != 'left'
+        afterV = self.policy('newContainerDirectionV') != 'above'
+
+        if onNewWindow == 'newCol':
+            tree.addAtEdge(frame, True, afterH, self.policy('newContainerPolicy') == 'fair')
+
+        elif onNewWindow == 'newRow':
+            tree.addAtEdge(frame, False, afterV, self.policy('newContainerPolicy') == 'fair')
+
+        else:
+            if onNewWindow not in ('splitH', 'splitV'):
+                self.logger.warn("insertFrame: Unsupported onNewWindow policy %r; using 'splitH'.", onNewWindow)
+                onNewWindow = 'splitH'
+
+            horizontal = onNewWindow == 'splitH'
+            tree.split(self.insertionTarget(tree, ws), frame, horizontal, afterH if horizontal else afterV)
+
+    def insertionTarget(self, tree, ws):
+        """Get the leaf new windows should split: the most recently-focused one, or failing that, the last one.
+
+        """
+        for frame in ws.focusHistory:
+            if frame in tree:
+                return tree.leaves[frame]
+
+        return tree.leaves[tree.order.last]
+
+    def arrange(self, ws):
+        tree = self.updateTree(ws)
+        if tree.root is None:
+            return
+
+        padding = self.padding
+        bounds = (
+                ws.innerX + padding,
+                ws.innerY + padding,
+                ws.innerWidth - 2 * padding,
+                ws.innerHeight - 2 * padding
+                )
+
+        placed = []
+        self.place(tree.root, bounds, tree.forcePlacement, placed)
+        tree.forcePlacement = False
+
+        self.logger.debug("arrange: Placing %d of %d frames.", len(placed), len(tree.leaves))
+
+        with singletons.x.batch():
+            for leaf in placed:
+                leaf.frame.moveResize(*leaf.bounds, flush=False)
+                leaf.frame._doShow()
+
+        xpybutil.conn.flush()
+
+        if tree.changed and ws.layoutInfoLoaded:
+            ws.setLayoutInfo(self, {'tree': tree.root.describe()})
+            tree.changed = False
+
+    def place(self, node, bounds, force, placed):
+        """Place `node` and its descendants within `bounds`, adding every leaf which needs to be moved or shown to
+        `placed`.
+
+        """
+        if not (force or node.dirty) and node.bounds == bounds:
+            return
+
+        node.bounds = bounds
+        node.dirty = False
+
+        if isinstance(node, Leaf):
+            placed.append(node)
+            return
+
+        x, y, width, height = bounds
+        childCount = len(node.children)
+        available = (width if node.horizontal else height) - self.padding * (childCount - 1)
+
+        # Round each child's far edge instead of its size, so rounding errors don't add up along the split; every child
+        # gets at least one pixel, without pushing the last one past the end.
+        start, cumulativeRatio = 0, 0.0
+        for index, child in enumerate(node.children):
+            cumulativeRatio += child.ratio
+            end = available if index == childCount - 1 else int(round(cumulativeRatio * available))
+            end = min(max(end, start + 1), available - (childCount - 1 - index))
+            size = max(end - start, 1)
+            offset = start + self.padding * index
+
+            if node.horizontal:
+                childBounds = (x + offset, y, size, height)
+            else:
+                childBounds = (x, y + offset, width, size)
+
+            self.place(child, childBounds, force, placed)
+            start = end
+
+    def focusSiblingFrame(self, frame, n):
+        """Focus the frame `n` positions before (n < 0) or after (n > 0) the given one, in tree order.
+
+        """
+        tree = self.trees.get(frame.workspace)
+        if tree is None or frame not in tree:
+            self.logger.warn("focusSiblingFrame: %r isn't in its workspace's tree.", frame)
+            return
+
+        # Skip over any frames which were closed or hidden since the workspace was last arranged.
+        sibling = tree.order.sibling(frame, n)
+        for _ in range(len(tree.order)):
+            if sibling.valid and sibling.viewable:
+                break
+            sibling = tree.order.sibling(sibling, 1 if n > 0 else -1)
+
+        sibling.focus()
+
+    def moveFrame(self, frame, n):
+        """Move the frame forward or backward in tree order by the given number of positions, by swapping it with its
+        neighbors.
+
+        """
+        tree = self.trees.get(frame.workspace)
+        if tree is None or frame not in tree:
+            self.logger.warn("moveFrame: %r isn't in its workspace's tree; not moving it.", frame)
+            return
+
+        for _ in range(abs(n)):
+            if n > 0:
+                neighbor = tree.order.next(frame, wrap=False)
+            else:
+                neighbor = tree.order.previous(frame, wrap=False)
+
+            if neighbor is None:
+                break
+
+            tree.swap(frame, neighbor)
+
+        frame.workspace.arrangeWindows()
+
+    def resizeFrame(self, frame, amount):
+        """Grow (amount > 0) or shrink (amount < 0) the given frame's share of the split it's in.
+
+        """
+        tree = self.trees.get(frame.workspace)
+        if tree is None or frame not in tree:
+            self.logger.warn("resizeFrame: %r isn't in its workspace's tree; not resizing it.", frame)
+            return
+
+        tree.resize(frame, amount, self.minRatio)
+        frame.workspace.arrangeWindows()
@@ -5,13 +5,114 @@ Copyright (c) 2012-2013 David H. Bronke
 Licensed under the MIT license; see the LICENSE file for details.
 
 """
+import cairo
+
+from ..settings import settings
+from ..utils.geometry import Rect
 from .base import ListLayout, TilingLayout
 
 
+class TabBar(object):
+    """The strip of tabs shared by all frames of a tabbed layout on one workspace.
+
+    Tab geometry is laid out once per arrange, and the whole strip is rendered once into a shared surface (similar to
+    the frames' surfaces, so it lives in a server-side pixmap) which every frame copies into its titlebar.
+
+    """
+    def __init__(self):
+        self.frames = []
+        self.indices = dict()
+        self.width = 0
+        self.tabGeometry = []
+
+        self.surface = None
+        self.surfaceSize = None
+        self.stale = True
+
+    def __contains__(self, frame):
+        return frame in self.indices
+
+    @property
+    def height(self):
+        return settings.theme.getThemeValue('titlebarHeight')
+
+    def update(self, frames, width):
+        """Lay out tabs for the given frames, each of which is `width` pixels wide.
+
+        """
+        if frames == self.frames and width == self.width:
+            return
+
+        previousFrames = self.frames
+
+        self.frames = list(frames)
+        self.indices = dict((frame, index) for index, frame in enumerate(self.frames))
+        self.width = width
+
+        tabSpacing = settings.theme.getThemeValue('tabSpacing')
+        tabCount = len(self.frames)
+        tabWidth = (width - (tabSpacing * (tabCount - 1))) / tabCount if tabCount else 0
+
+        self.tabGeometry = [
+                Rect((tabWidth + tabSpacing) * index, 0, tabWidth, self.height)
+                for index in range(tabCount)
+                ]
+
+        self.invalidate(previousFrames)
+
+    def geometryFor(self, frame):
+        return self.tabGeometry[self.indices[frame]]
+
+    def invalidate(self, previousFrames=()):
+        """Mark the strip as needing to be redrawn, and have every frame showing it repaint its titlebar.
+
+        """
+        self.stale = True
+
+        for frame in set(self.frames).union(previousFrames):
+            frame.invalidateTitlebar()
+
+    def render(self, target):
+        """Get the rendered strip, redrawing it first if it's stale. `target` is the Cairo surface it will be drawn to.
+
+        """
+        # Bevels are drawn along the tabs' far edges, so the strip needs an extra pixel in each direction.
+        size = (self.width + 1, self.height + 1)
+
+        if self.surface is None or self.surfaceSize != size:
+            if self.surface is not None:
+                self.surface.finish()
+
+            self.surface = target.create_similar(cairo.CONTENT_COLOR_ALPHA, *size)
+            self.surfaceSize = size
+            self.stale = True
+
+        if self.stale:
+            context = cairo.Context(self.surface)
+
+            context.set_operator(cairo.OPERATOR_CLEAR)
+            context.paint()
+            context.set_operator(cairo.OPERATOR_OVER)
+
+            for frame, tabGeom in zip(self.frames, self.tabGeometry):
+                settings.theme.drawTab(context, frame, tabGeom)
+
+            self.surface.flush()
+            self.stale = False
+
+        return self.surface
+
+
 class TabbedMaximized(ListLayout, TilingLayout):
     """Shows the focused window maximized, and rolls all other windows into tabs.
 
     """
+    def __init__(self, *args, **kwargs):
+        # Maps each workspace to its `TabBar`.
+        self.tabBars = dict()
+
+        super(TabbedMaximized, self).__init__(*args, **kwargs)
+
     def startArrange(self, ws, frameCount):
         self.frameX = ws.innerX + self.padding
         self.frameY = ws.innerY + self.padding
@@ -42,5 +143,20 @@ class TabbedMaximized(ListLayout, TilingLayout):
             self.logger.debug("onFramePositioned: Hiding non-focused frame: %r", frame)
             frame.hide()
 
+    def finishArrange(self, ws, frames):
+        try:
+            tabBar = self.tabBars[ws]
+        except KeyError:
+            tabBar = self.tabBars[ws] = TabBar()
+
+        tabBar.update(frames, self.frameWidth)
+
+    def tabBar(self, frame):
+        tabBar = self.tabBars.get(frame.workspace)
+        if tabBar is not None and frame in tabBar:
+            return tabBar
+
     def tabs(self, frame):
-        return frame.workspace.viewableFrames
+        tabBar = self.tabBar(frame)
+        if tabBar is not None:
+            return tabBar.frames
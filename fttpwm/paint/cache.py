@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: Render cache
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+from collections import OrderedDict
+import logging
+
+import cairo
+
+
+logger = logging.getLogger("fttpwm.paint.cache")
+
+
+class RenderCache(object):
+    """A least-recently-used cache of pre-rendered Cairo surfaces, limited to a total size in bytes.
+
+    Surfaces are created similar to the surface they're first drawn onto, so when drawing onto X windows or pixmaps,
+    cached images live in server-side pixmaps, and drawing one is a single copy on the X server.
+
+    """
+    bytesPerPixel = 4
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, target, width, height, render):
+        """Get the cached surface for `key`, rendering it if needed.
+
+        On a cache miss, a new `width` by `height` surface similar to `target` (a Cairo surface) is created, and
+        `render` is called with a Cairo context for it. Returns None if the surface would be too big to cache.
+
+        """
+        try:
+            entry = self.entries.pop(key)
+        except KeyError:
+            pass
+        else:
+            # Move the entry to the most-recently-used end.
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+
+        size = width * height * self.bytesPerPixel
+        if size > self.budget:
+            return None
+
+        surface = target.create_similar(cairo.CONTENT_COLOR_ALPHA, width, height)
+        render(cairo.Context(surface))
+        surface.flush()
+
+        self.entries[key] = (surface, size)
+        self.used += size
+        self.evict()
+
+        return surface
+
+    def evict(self):
+        while self.used > self.budget and self.entries:
+            key, (surface, size) = self.entries.popitem(last=False)
+            self.used -= size
+
+            # Free the underlying pixmap now, instead of whenever the surface happens to be garbage collected.
+            surface.finish()
+
+    def clear(self):
+        while self.entries:
+            key, (surface, size) = self.entries.popitem()
+            surface.finish()
+
+        self.used = 0
@@ -10,9 +10,11 @@ from contextlib import contextmanager
 import cairo
 
 from .color import Color
+from .gradients import gradientCache
 from ..utils.geometry import Rect
 
 from . import fonts
+from . import text as text_
 
 
 oddWidthStrokeMatrix = cairo.Matrix(x0=0.5, y0=0.5)
@@ -60,18 +62,32 @@ def drawBevel(context, rect, highlightColor=Color.rgba(1, 1, 1, 0.3), shadowColo
         context.stroke()
 
 
+transparent = cairo.SolidPattern(0, 0, 0, 0.0)
+
+
 def drawFill(context, rect, pattern, clip=True):
     with pushContext(context):
         if pattern is None:
             # If no pattern was given, assume we want to fill the area with transparent black.
-            pattern = cairo.SolidPattern(0, 0, 0, 0.0)
-
-        # Set a matrix to position and scale the pattern so it covers the given rect.
-        fillMatrix = cairo.Matrix()
-        fillMatrix.translate(*rect.topLeft)
-        fillMatrix.scale(*rect.size)
-        fillMatrix.invert()
-        pattern.set_matrix(fillMatrix)
+            pattern = transparent
+
+        if isinstance(pattern, cairo.SolidPattern):
+            # Solid colors look the same at any position and scale.
+            pass
+
+        elif isinstance(pattern, cairo.Gradient):
+            # Use a copy of the gradient pre-rendered at this size.
+            context.translate(*rect.topLeft)
+            rect = rect.move(-rect.x, -rect.y)
+            pattern = gradientCache.get(pattern, *rect.size)
+
+        else:
+            # Set a matrix to position and scale the pattern so it covers the given rect.
+            fillMatrix = cairo.Matrix()
+            fillMatrix.translate(*rect.topLeft)
+            fillMatrix.scale(*rect.size)
+            fillMatrix.invert()
+            pattern.set_matrix(fillMatrix)
 
         if clip:
             context.rectangle(*rect)
@@ -82,22 +98,26 @@ def drawFill(context, rect, pattern, clip=True):
         context.paint()
 
 
-def drawText(context, text, rect=None, textColor=Color.rgb(0, 0, 0), font=None, fontSize=10.0,
-        fontOptions=fonts.options.fontOptions, clip=True):
+def drawText(context, text, rect=None, textColor=Color.rgb(0, 0, 0), font=None, clip=True):
+    """Draw `text`, centered in `rect` if given, or at the current point otherwise.
 
-    with pushContext(context):
-        if rect:
-            context.rectangle(*rect)
-            context.clip()
+    If `font` (a `text.FontSpec`) is given, the text is drawn with the configured text backend, which caches its
+    measurements; otherwise, the context's current font is used, and the text is measured every time.
 
+    """
+    with pushContext(context):
         # Set up title text drawing
         context.set_source_rgba(*textColor)
 
         if font:
-            context.set_font_face(font)
+            backend = text_.backend()
+            textExtents = lambda: backend.extents(font, text)
+            showText = lambda: backend.show(context, font, text)
 
-        context.set_font_options(fonts.options.fontOptions)
-        context.set_font_size(fontSize)
+        else:
+            context.set_font_options(fonts.options.fontOptions)
+            textExtents = lambda: context.text_extents(text)
+            showText = lambda: context.show_text(text)
 
         if rect:
             if clip:
@@ -106,10 +126,10 @@ def drawText(context, text, rect=None, textColor=Color.rgb(0, 0, 0), font=None,
                 context.clip()
 
             # Determine rendered text extents.
-            textRect = Rect(*context.text_extents(text)[:4])
+            textRect = Rect(*textExtents()[:4])
 
             # Position the current point to center the text in the given rect.
             context.move_to(*(rect.center - textRect.center))
 
         # Draw text
-        context.show_text(text)
+        showText()
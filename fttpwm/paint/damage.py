@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: Damage tracking
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+from ..utils.geometry import Rect
+
+
+class DamageRegion(object):
+    """Tracks the areas of a surface which need to be repainted, as a short list of rectangles.
+
+    Rectangles which overlap (or share an edge) with an existing one are merged into it, as long as that doesn't add
+    more than `mergeSlack` times their combined area in undamaged pixels; if the list grows past `maxRects`, it is
+    collapsed into its bounding box, since past that point it's cheaper to overdraw than to clip to every rectangle.
+
+    """
+    maxRects = 8
+    mergeSlack = 0.25
+
+    def __init__(self):
+        self.rects = []
+
+    def __nonzero__(self):
+        return bool(self.rects)
+
+    def __iter__(self):
+        return iter(self.rects)
+
+    def add(self, rect):
+        if not isinstance(rect, Rect):
+            rect = Rect(*rect)
+
+        if rect.empty:
+            return
+
+        # Keep merging until the new rect doesn't touch anything else; merging can make it touch new rects.
+        merged = True
+        while merged:
+            merged = False
+
+            for index, other in enumerate(self.rects):
+                if self.shouldMerge(rect, other):
+                    rect = rect.union(other)
+                    del self.rects[index]
+                    merged = True
+                    break
+
+        self.rects.append(rect)
+
+        if len(self.rects) > self.maxRects:
+            self.rects = [self.bounds]
+
+    def shouldMerge(self, rect, other):
+        # Rects which only share an edge don't intersect, so grow one by a pixel when checking.
+        if rect.move(-1, -1).grow(2).intersection(other) is None:
+            return False
+
+        union = rect.union(other)
+        return union.area <= (rect.area + other.area) * (1 + self.mergeSlack)
+
+    @property
+    def bounds(self):
+        """The smallest rect which covers all damaged areas, or None if nothing is damaged.
+
+        """
+        if not self.rects:
+            return None
+
+        return reduce(Rect.union, self.rects)
+
+    @property
+    def area(self):
+        return sum(rect.area for rect in self.rects)
+
+    def intersects(self, rect):
+        if not isinstance(rect, Rect):
+            rect = Rect(*rect)
+
+        return any(rect.intersection(damaged) is not None for damaged in self.rects)
+
+    def clip(self, context):
+        """Restrict drawing on the given Cairo context to the damaged areas.
+
+        """
+        for rect in self.rects:
+            context.rectangle(*rect)
+        context.clip()
+
+    def clear(self):
+        del self.rects[:]
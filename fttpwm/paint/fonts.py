@@ -6,6 +6,8 @@ Licensed under the MIT license; see the LICENSE file for details.
 
 """
 from argparse import Namespace
+from bisect import bisect_right
+from collections import namedtuple, OrderedDict
 
 import cairo
 
@@ -79,13 +81,125 @@ class _FontOptions(object):
 options = _FontOptions()
 
 
+def optionsKey(fontOptions):
+    """Get a hashable value describing the given `cairo.FontOptions`.
+
+    """
+    return (fontOptions.get_antialias(), fontOptions.get_hint_metrics(), fontOptions.get_hint_style(),
+            fontOptions.get_subpixel_order())
+
+
+TextMetrics = namedtuple('TextMetrics', 'extents glyphs')
+
+
+class TextCache(object):
+    """A least-recently-used cache of text extents and glyph arrays, keyed by scaled font and string.
+
+    Measuring or drawing text with Cairo's toy API converts the string to glyphs every time; window titles and status
+    text are repainted far more often than they change, so we do that once per string and reuse the result. Scaled
+    fonts come from `getScaledFont`, so identical fonts are always the same object.
+
+    """
+    maxEntries = 2048
+
+    def __init__(self):
+        self.entries = OrderedDict()
+
+    def measure(self, scaledFont, text):
+        key = (scaledFont, text)
+
+        try:
+            metrics = self.entries.pop(key)
+        except KeyError:
+            # Older versions of pycairo can't give us glyphs; we'll fall back to `show_text` for those.
+            try:
+                glyphs = scaledFont.text_to_glyphs(0, 0, text, False)
+            except AttributeError:
+                glyphs = None
+
+            metrics = TextMetrics(scaledFont.text_extents(text), glyphs)
+
+            if len(self.entries) >= self.maxEntries:
+                self.entries.popitem(last=False)
+
+        # (re)insert the entry at the most-recently-used end.
+        self.entries[key] = metrics
+        return metrics
+
+    def extents(self, scaledFont, text):
+        return self.measure(scaledFont, text).extents
+
+    def ellipsize(self, scaledFont, text, maxWidth, ellipsis=u'\u2026'):
+        """Get the longest prefix of `text` that fits in `maxWidth` with `ellipsis` appended; `text` itself if it fits.
+
+        Prefix widths come from the positions of the text's cached glyphs, so this only measures `text` once, no
+        matter how many prefixes are tried.
+
+        """
+        if not text:
+            return text
+
+        metrics = self.measure(scaledFont, text)
+        if metrics.extents[4] <= maxWidth:
+            return text
+
+        # Work with characters, not bytes, so we never cut a character in half.
+        if isinstance(text, str):
+            text = text.decode('utf-8', 'replace')
+            metrics = self.measure(scaledFont, text)
+
+        available = maxWidth - self.extents(scaledFont, ellipsis)[4]
+
+        if metrics.glyphs is not None and len(metrics.glyphs) == len(text):
+            # The width of the first N characters is the X position of glyph N.
+            prefixWidths = [glyphX for index, glyphX, glyphY in metrics.glyphs]
+            length = max(bisect_right(prefixWidths, available) - 1, 0)
+
+        else:
+            # No usable glyphs (older pycairo, or characters which don't map to exactly one glyph); binary search on
+            # measured prefixes instead.
+            low, high = 0, len(text)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.extents(scaledFont, text[:middle])[4] <= available:
+                    low = middle
+                else:
+                    high = middle - 1
+            length = low
+
+        return text[:length].rstrip() + ellipsis
+
+    def show(self, ctx, scaledFont, text):
+        """Draw `text` at the context's current point, like `show_text`.
+
+        """
+        ctx.set_scaled_font(scaledFont)
+
+        glyphs = self.measure(scaledFont, text).glyphs
+        if glyphs is None:
+            ctx.show_text(text)
+            return
+
+        x, y = ctx.get_current_point()
+        ctx.show_glyphs([(index, x + glyphX, y + glyphY) for index, glyphX, glyphY in glyphs])
+
+    def clear(self):
+        self.entries.clear()
+
+
+textCache = TextCache()
+
+
 class Align(object):
-    def __init__(self, ctx, width, height, leftPadding=0, rightPadding=0):
+    def __init__(self, ctx, width, height, leftPadding=0, rightPadding=0, measure=None):
         self.ctx, self.width, self.height = ctx, width, height
         self.leftPadding, self.rightPadding = leftPadding, rightPadding
 
+        # A function returning the extents of the given text (like `text_extents`); defaults to the context's.
+        self.extents = measure or ctx.text_extents
+
     def center(self, text):
-        xBearing, yBearing, textWidth, textHeight = self.ctx.text_extents(text)[:4]
+        xBearing, yBearing, textWidth, textHeight = self.extents(text)[:4]
 
         return (
                 (self.width - textWidth) / 2 - xBearing,
@@ -93,7 +207,7 @@ class Align(object):
                 )
 
     def left(self, text):
-        xBearing, yBearing, textWidth, textHeight = self.ctx.text_extents(text)[:4]
+        xBearing, yBearing, textWidth, textHeight = self.extents(text)[:4]
 
         return (
                 self.leftPadding - xBearing,
@@ -101,7 +215,7 @@ class Align(object):
                 )
 
     def right(self, text):
-        xBearing, yBearing, textWidth, textHeight = self.ctx.text_extents(text)[:4]
+        xBearing, yBearing, textWidth, textHeight = self.extents(text)[:4]
 
         return (
                 self.width - textWidth - self.rightPadding - xBearing,
@@ -118,3 +232,23 @@ def getFont(family, slant, weight):
     except KeyError:
         font = fontCache[family, slant, weight] = Font(family, slant, weight)
         return font
+
+
+scaledFontCache = dict()
+
+
+def getScaledFont(font, size, fontOptions=None):
+    """Get a `cairo.ScaledFont` for the given font face, size, and font options. (the global options by default)
+
+    """
+    if fontOptions is None:
+        fontOptions = options.fontOptions
+
+    key = (font, size, optionsKey(fontOptions))
+
+    try:
+        return scaledFontCache[key]
+    except KeyError:
+        scaledFont = scaledFontCache[key] = cairo.ScaledFont(
+                font, cairo.Matrix(xx=size, yy=size), cairo.Matrix(), fontOptions)
+        return scaledFont
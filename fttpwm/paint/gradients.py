@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import logging
 
 import cairo
@@ -26,3 +27,65 @@ def linearGradient(orientation, *colors):
             gradient.add_color_stop_rgba(position, *color)
 
     return gradient
+
+
+class GradientCache(object):
+    """Renders gradients once for each size they're drawn at, and caches the results as image patterns.
+
+    Gradients defined on the unit square (like the ones `linearGradient` creates) are rendered at the requested size;
+    purely vertical or horizontal linear gradients only need a one-pixel-wide (or -high) strip, which is stretched to
+    fill the rest of the area using EXTEND_PAD. The gradients themselves are never modified, so themes can share them.
+
+    """
+    maxEntries = 256
+
+    def __init__(self):
+        self.entries = OrderedDict()
+
+    def get(self, gradient, width, height):
+        """Get a pattern which draws `gradient` stretched over the rect from (0, 0) to (`width`, `height`).
+
+        """
+        width, height = max(int(round(width)), 1), max(int(round(height)), 1)
+
+        stripWidth, stripHeight = width, height
+        if isinstance(gradient, cairo.LinearGradient):
+            x0, y0, x1, y1 = gradient.get_linear_points()
+            if x0 == x1:
+                stripWidth = 1  # Vertical gradient; every column is the same.
+            elif y0 == y1:
+                stripHeight = 1  # Horizontal gradient; every row is the same.
+
+        key = (gradient, stripWidth, stripHeight)
+
+        try:
+            pattern = self.entries.pop(key)
+        except KeyError:
+            pattern = self.render(gradient, stripWidth, stripHeight)
+
+            if len(self.entries) >= self.maxEntries:
+                self.entries.popitem(last=False)
+
+        # (re)insert the entry at the most-recently-used end.
+        self.entries[key] = pattern
+        return pattern
+
+    def render(self, gradient, width, height):
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        context = cairo.Context(surface)
+
+        # Scale the context instead of setting the gradient's matrix, so we don't modify the (shared) gradient.
+        context.scale(width, height)
+        context.set_source(gradient)
+        context.paint()
+        surface.flush()
+
+        pattern = cairo.SurfacePattern(surface)
+        pattern.set_extend(cairo.EXTEND_PAD)
+        return pattern
+
+    def clear(self):
+        self.entries.clear()
+
+
+gradientCache = GradientCache()
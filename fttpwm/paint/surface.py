@@ -6,24 +6,43 @@ Licensed under the MIT license; see the LICENSE file for details.
 
 """
 from abc import ABCMeta, abstractmethod
+import json
+import logging
+from os.path import join
 
 from xcb.xproto import CW, EventMask
 
 import xpybutil
 import xpybutil.event
+import xpybutil.window
 
 import cairo
 
 from .. import singletons
+from ..eventloop.idle import IdlePriority
 from ..settings import settings
+from ..utils.x import convertAttributes
+from ..xdg import basedir
+
+
+logger = logging.getLogger("fttpwm.paint.surface")
 
 
 class CacheableCairoSurface(object):
+    """A Cairo surface for an X drawable, split into a background (drawn rarely) and a foreground (redrawn often).
+
+    The drawing itself is done by `painter`, which must implement `setupBackground`, `setupForeground`,
+    `drawBackground` and `drawForeground`, each taking a Cairo context; alternatively, a subclass may override those
+    methods. Call `setup` once the painter is ready to draw, `updateForeground` when the foreground changes, and
+    `updateBackground` when the background changes.
+
+    """
     __metaclass__ = ABCMeta
 
-    def __init__(self, width, height, targetDrawableID=None):
+    def __init__(self, width, height, targetDrawableID=None, painter=None):
         self.width = width
         self.height = height
+        self.painter = painter
         self.mapped = False
         self.cleanUpTarget = False
 
@@ -47,8 +66,16 @@ class CacheableCairoSurface(object):
 
         self.targetDrawableID = targetDrawableID
 
+    def setup(self):
+        self.onSetup()
+
     def cleanup(self):
         if self.targetDrawableID is not None:
+            xpybutil.event.disconnect('ConfigureNotify', self.targetDrawableID)
+            xpybutil.event.disconnect('Expose', self.targetDrawableID)
+            xpybutil.event.disconnect('MapNotify', self.targetDrawableID)
+            xpybutil.event.disconnect('UnmapNotify', self.targetDrawableID)
+
             self.onCleanup()
         self.targetDrawableID = None
 
@@ -57,16 +84,18 @@ class CacheableCairoSurface(object):
             self.onPaint()
 
     def onConfigureNotify(self, event):
-        self.onResize(event.width, event.height)
+        if (event.width, event.height) != (self.width, self.height):
+            self.onResize(event.width, event.height)
 
     def onExpose(self, event):
         # A count of 0 denotes the last Expose event in a series of contiguous Expose events; this check lets us
         # collapse such series into a single call to paint() so we don't get extraneous redraws.
         if event.count == 0:
-            self.eventloop.callWhenIdle(self.paint)
+            singletons.eventloop.callWhenIdle(self.paint, priority=IdlePriority.Paint)
 
     def onMapNotify(self, event):
         self.mapped = True
+        singletons.eventloop.callWhenIdle(self.paint, priority=IdlePriority.Paint)
 
     def onUnmapNotify(self, event):
         self.mapped = False
@@ -79,8 +108,8 @@ class CacheableCairoSurface(object):
     @abstractmethod
     def onCleanup(self):
         if self.cleanUpTarget:
-            self.core.UnmapWindow(self.targetDrawableID)
-            self.core.DestroyWindow(self.targetDrawableID)
+            xpybutil.conn.core.UnmapWindow(self.targetDrawableID)
+            xpybutil.conn.core.DestroyWindow(self.targetDrawableID)
 
     @abstractmethod
     def onPaint(self):
@@ -99,22 +128,18 @@ class CacheableCairoSurface(object):
     def updateForeground(self):
         pass
 
-    # To be implemented by the final surface subclass, which provides the actual drawing logic.
-    @abstractmethod
+    # To be implemented by the painter (or by a final surface subclass), which provides the actual drawing logic.
     def setupBackground(self, context):
-        pass
+        self.painter.setupBackground(context)
 
-    @abstractmethod
     def setupForeground(self, context):
-        pass
+        self.painter.setupForeground(context)
 
-    @abstractmethod
     def drawBackground(self, context):
-        pass
+        self.painter.drawBackground(context)
 
-    @abstractmethod
     def drawForeground(self, context):
-        pass
+        self.painter.drawForeground(context)
 
 
 class NoCachingSurface(CacheableCairoSurface):
@@ -170,17 +195,16 @@ class XPixmapSurface(CacheableCairoSurface):
     def setupPixmaps(self, width, height):
         self.createPixmaps(width, height)
 
-        attribMask, attribValues = self.convertAttributes({
+        xpybutil.conn.core.ChangeWindowAttributes(self.targetDrawableID, *convertAttributes({
                 CW.BackPixmap: self.combinedPixmapID
-                })
-        xpybutil.conn.core.ChangeWindowAttributes(self.targetDrawableID, attribMask, attribValues)
+                }))
 
     def createPixmaps(self, width, height):
         self.pixmapWidth = width
         self.pixmapHeight = height
 
         # Set up background pixmap.
-        self.backgroundPixmapID = self.conn.generate_id()
+        self.backgroundPixmapID = xpybutil.conn.generate_id()
         xpybutil.conn.core.CreatePixmap(
                 singletons.x.depth, self.backgroundPixmapID, self.targetDrawableID, width, height)
 
@@ -195,8 +219,9 @@ class XPixmapSurface(CacheableCairoSurface):
         self.backgroundPattern = cairo.SurfacePattern(self.backgroundSurface)
 
         # Set up combined pixmap.
-        self.combinedPixmapID = self.conn.generate_id()
-        xpybutil.conn.core.CreatePixmap(self.depth, self.combinedPixmapID, self.targetDrawableID, width, height)
+        self.combinedPixmapID = xpybutil.conn.generate_id()
+        xpybutil.conn.core.CreatePixmap(
+                singletons.x.depth, self.combinedPixmapID, self.targetDrawableID, width, height)
 
         self.combinedSurface = cairo.XCBSurface(
                 xpybutil.conn, self.combinedPixmapID, singletons.x.visual, width, height)
@@ -217,6 +242,9 @@ class XPixmapSurface(CacheableCairoSurface):
         self.backgroundSurface.finish()
         self.backgroundSurface = None
 
+        xpybutil.conn.core.FreePixmap(self.combinedPixmapID)
+        self.combinedPixmapID = None
+
         xpybutil.conn.core.FreePixmap(self.backgroundPixmapID)
         self.backgroundPixmapID = None
 
@@ -271,18 +299,6 @@ class CairoPixmapSurface(XPixmapSurface):
         self.createPixmaps(width, height)
         self.combinedPattern = cairo.SurfacePattern(self.combinedSurface)
 
-    def destroyPixmaps(self):
-        self.combinedContext = None
-        self.combinedSurface.finish()
-        self.combinedSurface = None
-
-        self.backgroundContext = None
-        self.backgroundSurface.finish()
-        self.backgroundSurface = None
-
-        xpybutil.conn.core.FreePixmap(self.backgroundPixmapID)
-        self.backgroundPixmapID = None
-
     def onCleanup(self):
         self.context = None
         self.surface.finish()
@@ -315,7 +331,12 @@ class CairoImageSurface(CacheableCairoSurface):
     resizeThreshold = 20
 
     def onSetup(self):
+        # Set up Cairo context for the target window.
+        self.surface = cairo.XCBSurface(
+                xpybutil.conn, self.targetDrawableID, singletons.x.visual, self.width, self.height)
+        self.context = cairo.Context(self.surface)
         self.setupImages(self.width, self.height)
+        self.paint()
 
     def setupImages(self, width, height):
         self.imageWidth = width
@@ -324,7 +345,6 @@ class CairoImageSurface(CacheableCairoSurface):
         # Set up background image.
         self.backgroundSurface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
         self.backgroundContext = cairo.Context(self.backgroundSurface)
-        self.setupWindowBackground(self.backgroundContext)
 
         self.setupBackground(self.backgroundContext)
         self.drawBackground(self.backgroundContext)
@@ -335,7 +355,6 @@ class CairoImageSurface(CacheableCairoSurface):
         # Set up combined image.
         self.combinedSurface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
         self.combinedContext = cairo.Context(self.combinedSurface)
-        self.setupWindowBackground(self.combinedContext)
 
         self.setupForeground(self.combinedContext)
         self.combinedContext.set_source(self.backgroundPattern)
@@ -355,6 +374,9 @@ class CairoImageSurface(CacheableCairoSurface):
         self.backgroundSurface = None
 
     def onCleanup(self):
+        self.context = None
+        self.surface.finish()
+        self.surface = None
         self.destroyImages()
         super(CairoImageSurface, self).onCleanup()
 
@@ -393,6 +415,54 @@ class CairoImageSurface(CacheableCairoSurface):
         self.paint()
 
 
+# The caching strategies measured by `cairo_bench.py`, by name.
+surfaceCacheMethods = dict(
+        (cls.__name__, cls)
+        for cls in (NoCachingSurface, XPixmapSurface, CairoPixmapSurface, CairoImageSurface)
+        )
+
+# Where `cairo_bench.py --save` stores its results, relative to $XDG_CACHE_HOME; a JSON object mapping the name of each
+# caching strategy to its best time.
+benchmarkResultsFile = 'fttpwm/surface-benchmark.json'
+
 settings.setDefaults(
-        surfaceCacheMethod=CairoPixmapSurface,
+        # The caching strategy to use for surfaces such as the status bar; one of the classes above, or 'auto' to
+        # use whichever was fastest in the last run of `cairo_bench.py --save`. (CairoPixmapSurface if it wasn't run)
+        surfaceCacheMethod='auto',
         )
+
+_fastestSurfaceCacheMethod = None
+
+
+def fastestSurfaceCacheMethod():
+    global _fastestSurfaceCacheMethod
+
+    if _fastestSurfaceCacheMethod is None:
+        _fastestSurfaceCacheMethod = CairoPixmapSurface
+
+        try:
+            with open(join(basedir.cache.home, benchmarkResultsFile)) as resultsFile:
+                results = json.load(resultsFile)
+
+            fastest = min((time, name) for name, time in results.iteritems() if name in surfaceCacheMethods)[1]
+            _fastestSurfaceCacheMethod = surfaceCacheMethods[fastest]
+            logger.info("Using %s, the fastest surface caching strategy in saved benchmark results.", fastest)
+
+        except (IOError, ValueError, AttributeError):
+            logger.debug("No usable surface benchmark results; defaulting to %s.",
+                    _fastestSurfaceCacheMethod.__name__)
+
+    return _fastestSurfaceCacheMethod
+
+
+def createSurface(width, height, targetDrawableID=None, painter=None):
+    """Create a surface using the configured caching strategy. (see the `surfaceCacheMethod` setting)
+
+    """
+    method = settings.surfaceCacheMethod
+    if method == 'auto':
+        method = fastestSurfaceCacheMethod()
+    elif isinstance(method, basestring):
+        method = surfaceCacheMethods[method]
+
+    return method(width, height, targetDrawableID, painter)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: Text rendering backends
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+from collections import namedtuple, OrderedDict
+import logging
+
+try:
+    import pango
+    import pangocairo
+except ImportError:
+    pango = None
+
+import cairo
+
+from ..settings import settings
+from . import fonts
+
+
+logger = logging.getLogger("fttpwm.paint.text")
+
+settings.setDefaults(
+        # Which text backend to use: 'toy' (Cairo's toy font API; fast, but with no font fallback or shaping), 'pango'
+        # (requires PyGTK's pango module), or 'auto' (the toy backend for ASCII-only strings, and Pango for everything
+        # else, if it's available)
+        textBackend='auto',
+        )
+
+
+FontSpec = namedtuple('FontSpec', 'family slant weight size')
+
+# Text extents, in the same form as the first five values of Cairo's `text_extents`.
+TextExtents = namedtuple('TextExtents', 'xBearing yBearing width height xAdvance')
+
+
+def isASCII(text):
+    try:
+        if isinstance(text, unicode):
+            text.encode('ascii')
+        else:
+            text.decode('ascii')
+    except UnicodeError:
+        return False
+
+    return True
+
+
+class ToyTextBackend(object):
+    """Draws text with Cairo's toy font API, caching extents and glyphs in `fonts.textCache`.
+
+    """
+    def scaledFont(self, font):
+        return fonts.getScaledFont(fonts.getFont(font.family, font.slant, font.weight), font.size)
+
+    def extents(self, font, text):
+        return TextExtents(*fonts.textCache.extents(self.scaledFont(font), text)[:5])
+
+    def show(self, ctx, font, text):
+        fonts.textCache.show(ctx, self.scaledFont(font), text)
+
+    def ellipsize(self, font, text, maxWidth, ellipsis=u'…'):
+        return fonts.textCache.ellipsize(self.scaledFont(font), text, maxWidth, ellipsis)
+
+
+class PangoTextBackend(object):
+    """Draws text with Pango, which gives us font fallback and proper shaping for non-Latin scripts.
+
+    Laying out text is expensive, so layouts are cached per (font, font options, string), up to `maxLayouts` of them.
+
+    """
+    maxLayouts = 1024
+
+    slants = {
+            cairo.FONT_SLANT_NORMAL: 'STYLE_NORMAL',
+            cairo.FONT_SLANT_ITALIC: 'STYLE_ITALIC',
+            cairo.FONT_SLANT_OBLIQUE: 'STYLE_OBLIQUE',
+            }
+
+    weights = {
+            cairo.FONT_WEIGHT_NORMAL: 'WEIGHT_NORMAL',
+            cairo.FONT_WEIGHT_BOLD: 'WEIGHT_BOLD',
+            }
+
+    def __init__(self):
+        self.layouts = OrderedDict()
+        self.descriptions = dict()
+        self.contexts = dict()
+
+    def description(self, font):
+        try:
+            return self.descriptions[font]
+        except KeyError:
+            description = pango.FontDescription(font.family)
+            description.set_style(getattr(pango, self.slants[font.slant]))
+            description.set_weight(getattr(pango, self.weights[font.weight]))
+
+            # Toy font sizes are in user space units (pixels), not points.
+            description.set_absolute_size(font.size * pango.SCALE)
+
+            self.descriptions[font] = description
+            return description
+
+    def context(self):
+        fontOptions = fonts.options.fontOptions
+        key = fonts.optionsKey(fontOptions)
+
+        try:
+            return self.contexts[key]
+        except KeyError:
+            context = self.contexts[key] = pangocairo.cairo_font_map_get_default().create_context()
+            pangocairo.context_set_font_options(context, fontOptions)
+            return context
+
+    def layout(self, font, text):
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+
+        context = self.context()
+        key = (font, context, text)
+
+        try:
+            layout = self.layouts.pop(key)
+        except KeyError:
+            layout = pango.Layout(context)
+            layout.set_font_description(self.description(font))
+            layout.set_text(text)
+
+            if len(self.layouts) >= self.maxLayouts:
+                self.layouts.popitem(last=False)
+
+        # (re)insert the entry at the most-recently-used end.
+        self.layouts[key] = layout
+        return layout
+
+    def extents(self, font, text):
+        layout = self.layout(font, text)
+        (inkX, inkY, inkWidth, inkHeight), logical = layout.get_pixel_extents()
+
+        # Like Cairo's extents, make the bearings relative to the baseline instead of the top of the layout.
+        baseline = layout.get_baseline() / float(pango.SCALE)
+        return TextExtents(inkX, inkY - baseline, inkWidth, inkHeight, logical[2])
+
+    def show(self, ctx, font, text):
+        layout = self.layout(font, text)
+
+        # Cairo draws text with its baseline at the current point, but Pango draws layouts from their top left corner.
+        x, y = ctx.get_current_point()
+        ctx.move_to(x, y - layout.get_baseline() / float(pango.SCALE))
+
+        pangocairo.CairoContext(ctx).show_layout(layout)
+
+    def ellipsize(self, font, text, maxWidth, ellipsis=u'…'):
+        if not text or self.extents(font, text).xAdvance <= maxWidth:
+            return text
+
+        available = maxWidth - self.extents(font, ellipsis).xAdvance
+
+        # The character under the point `available` pixels along is the first one that doesn't fit.
+        layout = self.layout(font, text)
+        index = layout.xy_to_index(int(max(available, 0) * pango.SCALE), 0)[0]
+
+        return layout.get_text()[:index].decode('utf-8', 'replace').rstrip() + ellipsis
+
+
+class AutoTextBackend(object):
+    """Uses the toy backend for ASCII-only strings, where it renders just as well and costs much less, and Pango for
+    everything else.
+
+    """
+    def __init__(self):
+        self.toy = ToyTextBackend()
+        self.pango = PangoTextBackend()
+
+    def backendFor(self, text):
+        return self.toy if isASCII(text) else self.pango
+
+    def extents(self, font, text):
+        return self.backendFor(text).extents(font, text)
+
+    def show(self, ctx, font, text):
+        self.backendFor(text).show(ctx, font, text)
+
+    def ellipsize(self, font, text, maxWidth, ellipsis=u'…'):
+        return self.backendFor(text).ellipsize(font, text, maxWidth, ellipsis)
+
+
+backends = {
+        'toy': ToyTextBackend,
+        'pango': PangoTextBackend,
+        'auto': AutoTextBackend,
+        }
+
+_backend = None
+_backendName = None
+
+
+def backend():
+    """Get the text backend selected by the `textBackend` setting.
+
+    """
+    global _backend, _backendName
+
+    name = settings.textBackend
+    if name != _backendName:
+        if name not in backends:
+            logger.warn("Unknown text backend %r; falling back to the toy text backend.", name)
+            _backend = ToyTextBackend()
+        elif name != 'toy' and pango is None:
+            logger.warn("Couldn't import pango; falling back to the toy text backend.")
+            _backend = ToyTextBackend()
+        else:
+            _backend = backends[name]()
+
+        _backendName = name
+
+    return _backend
@@ -63,6 +63,13 @@ class BaseWallpaper(object):
     def paint(self, context, targetX, targetY, targetW, targetH):
         pass
 
+    def getCacheKey(self, targetW, targetH):
+        """Get a hashable value identifying this wallpaper as rendered at the given size, for the rendered wallpaper
+        cache; return None if it's cheap enough to render that caching isn't worthwhile.
+
+        """
+        return None
+
 
 class SolidColor(BaseWallpaper):
     def __init__(self, color=(0, 0, 0), *args, **kwargs):
@@ -87,6 +94,21 @@ class ScalableWallpaper(BaseWallpaper):
 
         return float(resultW) / sourceW, float(resultH) / sourceH
 
+    def getCacheKey(self, targetW, targetH):
+        # Only wallpapers loaded from files are worth caching.
+        filename = getattr(self, 'filename', None)
+        if filename is None:
+            return None
+
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+
+        # The file's modification time and size tell us if it's changed since we cached it.
+        return (type(self).__name__, os.path.abspath(filename), stat.st_mtime, stat.st_size,
+                targetW, targetH, self.scaleMode, self.position, getattr(self, 'extendMode', None))
+
     def getScaledSize(self, targetW, targetH):
         sourceW, sourceH = self.sourceSize
         scaleMode = self.scaleMode
@@ -179,21 +201,37 @@ else:
     class SVG(ScalableWallpaper):
         def __init__(self, filename, *args, **kwargs):
             self.filename = filename
+            self.svg = None
+            self.loaded = False
 
-            if os.path.exists(filename):
-                logger.info("Loading SVG wallpaper: %s", filename)
-                self.svg = rsvg.Handle(file=filename)
-                sourceSize = self.svg.get_properties('width', 'height')
-            else:
-                logger.warning("Specified SVG wallpaper %r does not exist!", filename)
-                self.svg = None
-                sourceSize = (0, 0)
-
-            super(SVG, self).__init__(sourceSize=sourceSize, *args, **kwargs)
+            super(SVG, self).__init__(sourceSize=(0, 0), *args, **kwargs)
 
         def __unicode__(self):
             return "<SVG wallpaper: {}>".format(self.filename)
 
+        def load(self):
+            """Parse the SVG file, if we haven't yet.
+
+            This is put off until the wallpaper is actually rendered, so starting with a cached rendering never needs
+            rsvg at all.
+
+            """
+            if self.loaded:
+                return
+
+            self.loaded = True
+
+            if os.path.exists(self.filename):
+                logger.info("Loading SVG wallpaper: %s", self.filename)
+                self.svg = rsvg.Handle(file=self.filename)
+                self.sourceSize = self.svg.get_properties('width', 'height')
+            else:
+                logger.warning("Specified SVG wallpaper %r does not exist!", self.filename)
+
+        def getScaledSize(self, targetW, targetH):
+            self.load()
+            return super(SVG, self).getScaledSize(targetW, targetH)
+
         def getContextMatrix(self, targetX, targetY, targetW, targetH):
             matrix = cairo.Matrix()
             matrix.translate(targetX, targetY)
@@ -201,6 +239,7 @@ else:
             return matrix
 
         def paint(self, context, targetX, targetY, targetW, targetH):
+            self.load()
             if self.svg is not None:
                 context.set_matrix(self.getContextMatrix(targetX, targetY, targetW, targetH))
                 self.svg.render_cairo(context)
@@ -6,17 +6,30 @@ Licensed under the MIT license; see the LICENSE file for details.
 
 """
 from argparse import Namespace
+from hashlib import sha1
 import logging
+import os
+from os.path import join
 import struct
 
 import xcb
 from xcb.xproto import Atom, CW, CloseDown, Kill, PropMode
 
+try:
+    import xcb.randr
+except ImportError:
+    randr = None
+else:
+    randr = xcb.randr
+
 import cairo
 
+from .atoms import atoms
 from .settings import settings
 from .paint.wallpaper import SVG
+from .utils.geometry import Rect
 from .utils.x import convertAttributes, findCurrentVisual
+from .xdg import basedir
 from . import resources
 
 
@@ -24,18 +37,135 @@ logger = logging.getLogger("fttpwm.setroot")
 
 settings.setDefaults(
         wallpaper=SVG(resources.fullPath('default-wallpaper.svg')),
+        # Whether to keep rendered copies of file-based wallpapers (in $XDG_CACHE_HOME/fttpwm/wallpaper), so they don't
+        # need to be rendered again on each start.
+        cacheRenderedWallpaper=True,
         )
 
+# Rendered wallpapers are cached in this directory, relative to $XDG_CACHE_HOME.
+wallpaperCacheDir = 'fttpwm/wallpaper'
+
+# How many of the most recently used renderings to keep in the cache, so switching between output layouts (docking
+# and undocking a laptop, say) doesn't mean rendering from scratch each time.
+maxCachedWallpapers = 8
+
+
+def getOutputGeometries(conn, rootID, screenWidth, screenHeight):
+    """Get the geometry of each active output (CRTC, really) using RandR, or of the whole screen if that's unavailable.
+
+    Outputs which mirror each other are only returned once.
+
+    """
+    if randr is not None:
+        try:
+            ext = conn(randr.key)
+            screenResources = ext.GetScreenResourcesCurrent(rootID).reply()
+
+            # Send all of the CRTC queries before waiting on any of them.
+            cookies = [ext.GetCrtcInfo(crtc, screenResources.config_timestamp) for crtc in screenResources.crtcs]
+            conn.flush()
+
+            outputs = []
+            for cookie in cookies:
+                crtc = cookie.reply()
+
+                # Disabled CRTCs have no mode.
+                if crtc.mode != 0 and crtc.width and crtc.height:
+                    geometry = (crtc.x, crtc.y, crtc.width, crtc.height)
+                    if geometry not in outputs:
+                        outputs.append(geometry)
+
+            if outputs:
+                return [Rect(*geometry) for geometry in outputs]
+
+        except Exception:
+            logger.exception("Couldn't get output geometry from RandR! Treating the screen as a single output.")
+
+    return [Rect(0, 0, screenWidth, screenHeight)]
+
+
+def renderWallpaper(wallpaper, width, height, cacheKey):
+    """Render the given wallpaper at the given size to an image surface, using the rendered wallpaper cache if we can.
+
+    """
+    cacheFile = None
+
+    if cacheKey is not None and settings.cacheRenderedWallpaper:
+        cacheFile = join(wallpaperCacheDir, sha1(repr(cacheKey)).hexdigest() + '.png')
+        cachePath = join(basedir.cache.home, cacheFile)
+
+        try:
+            image = cairo.ImageSurface.create_from_png(cachePath)
+        except (IOError, MemoryError, cairo.Error):
+            pass
+        else:
+            if (image.get_width(), image.get_height()) == (width, height):
+                logger.debug("Loaded %dx%d wallpaper from cache: %s", width, height, cachePath)
+
+                # Mark this rendering as recently used, so `pruneWallpaperCache` keeps it.
+                try:
+                    os.utime(cachePath, None)
+                except OSError:
+                    pass
+
+                return image, cacheFile
+
+    logger.debug("Rendering %dx%d wallpaper...", width, height)
+
+    image = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+    wallpaper.paint(cairo.Context(image), 0, 0, width, height)
+    image.flush()
+
+    if cacheFile is not None:
+        try:
+            with basedir.cache.writeFile(cacheFile, 'wb') as imageFile:
+                image.write_to_png(imageFile)
+        except (IOError, OSError, cairo.Error):
+            logger.exception("Couldn't save rendered wallpaper to the cache!")
+
+    return image, cacheFile
+
+
+def pruneWallpaperCache(keep):
+    """Delete all but the `maxCachedWallpapers` most recently used cached wallpapers, so old renderings don't pile up.
+
+    The ones in `keep` (the renderings currently in use) are never deleted.
+
+    """
+    cacheDir = join(basedir.cache.home, wallpaperCacheDir)
+    keep = set(os.path.basename(filename) for filename in keep if filename is not None)
+
+    try:
+        filenames = [filename for filename in os.listdir(cacheDir) if filename.endswith('.png')]
+    except OSError:
+        return
+
+    def lastUsed(filename):
+        try:
+            return os.path.getmtime(join(cacheDir, filename))
+        except OSError:
+            return 0
+
+    filenames.sort(key=lastUsed, reverse=True)
+
+    for filename in filenames[maxCachedWallpapers:]:
+        if filename not in keep:
+            try:
+                os.unlink(join(cacheDir, filename))
+            except OSError:
+                logger.warn("Couldn't remove stale cached wallpaper %r.", filename, exc_info=True)
+
 
 def setWallpaper():
     conn = xcb.connect()
     cookies = Namespace()
 
-    def getAtom(name):
-        return conn.core.InternAtom(True, len(name), name)
-
     def getOrCreateAtom(name):
-        return conn.core.InternAtom(False, len(name), name)
+        # Atom IDs are shared between connections, so use the atom table if it has this one.
+        if name in atoms:
+            return atoms.get(name)
+
+        return conn.core.InternAtom(False, len(name), name).reply().atom
 
     setup = conn.get_setup()
     screenNumber = conn.pref_screen
@@ -64,9 +194,36 @@ def setWallpaper():
     surface = cairo.XCBSurface(conn, pixmapID, visual, screenWidth, screenHeight)
     context = cairo.Context(surface)
 
-    # Draw the background image.
-    #TODO: Xinerama/XRandR support!
-    settings.wallpaper.paint(context, 0, 0, screenWidth, screenHeight)
+    # Fill any area not covered by an output (only visible in screenshots, but still...)
+    context.set_source_rgb(0, 0, 0)
+    context.paint()
+
+    # Draw the background image on each output; outputs with the same size share a rendering.
+    wallpaper = settings.wallpaper
+    renderings = dict()
+    for output in getOutputGeometries(conn, rootID, screenWidth, screenHeight):
+        size = (output.width, output.height)
+        cacheKey = wallpaper.getCacheKey(*size)
+
+        # Wallpapers which aren't worth caching are cheap to draw, so paint those straight onto the root pixmap.
+        if cacheKey is None:
+            context.save()
+            context.rectangle(*output)
+            context.clip()
+            wallpaper.paint(context, output.x, output.y, output.width, output.height)
+            context.restore()
+            continue
+
+        if size not in renderings:
+            renderings[size] = renderWallpaper(wallpaper, output.width, output.height, cacheKey)
+
+        image, cacheFile = renderings[size]
+        context.set_source_surface(image, output.x, output.y)
+        context.rectangle(*output)
+        context.fill()
+
+    if settings.cacheRenderedWallpaper:
+        pruneWallpaperCache(cacheFile for image, cacheFile in renderings.itervalues())
 
     surface.flush()
     conn.flush()
@@ -74,9 +231,9 @@ def setWallpaper():
     # Set root window properties and background.
     packedPixmapID = struct.pack('I', pixmapID)
     cookies.setRootPmapIDProp = conn.core.ChangePropertyChecked(PropMode.Replace, rootID,
-            xRootPmapIDProp.reply().atom, Atom.PIXMAP, 32, 1, packedPixmapID)
+            xRootPmapIDProp, Atom.PIXMAP, 32, 1, packedPixmapID)
     cookies.setEsetrootPmapIDProp = conn.core.ChangePropertyChecked(PropMode.Replace, rootID,
-            esetrootPmapIDProp.reply().atom, Atom.PIXMAP, 32, 1, packedPixmapID)
+            esetrootPmapIDProp, Atom.PIXMAP, 32, 1, packedPixmapID)
 
     # Doing these in one combined ChangeWindowAttributes call seems to make BackPixel overwrite BackPixmap, so...
     cookies.setBackPixel = conn.core.ChangeWindowAttributesChecked(rootID, *convertAttributes({
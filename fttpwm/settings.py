@@ -25,17 +25,31 @@ class Settings(object):
         self.__defaultSettings.update(kwargs)
 
     def loadSettings(self):
+        self.applySettings(self.readSettings())
+
+    def readSettings(self):
+        """Read all settings files, and return the resulting settings as a dictionary.
+
+        This doesn't touch the current settings, so it can safely be run on a worker thread; pass the result to
+        `applySettings` (on the event loop's thread) to actually use it.
+
+        """
         logger.info("Loading settings...")
-        self.__settings.clear()
+        values = dict()
 
         # Load each settings file, overwriting lower-priority settings with higher-priority ones.
         for filename in reversed(config_dirs.findAllFiles("fttpwm/config.py") + [self.__defaultConfigFile]):
             if exists(filename):
                 # We've found a settings file; load it.
                 logger.debug("Found settings file: %s", filename)
-                execfile(filename, self.__settings)
+                execfile(filename, values)
 
         logger.info("Finished loading settings.")
+        return values
+
+    def applySettings(self, values):
+        self.__settings.clear()
+        self.__settings.update(values)
 
 
 settings = Settings()
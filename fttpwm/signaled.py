@@ -98,8 +98,16 @@ class SignaledDict(dict):
         super(SignaledDict, self).__init__(*args, **kwargs)
         self.updated = Signal()
 
+    def __setitem__(self, key, value):
+        # Compare just the one value instead of hashing the whole dict before and after, like `_UpdateAction` does.
+        # (which, since dicts aren't hashable, would only hash the keys, and miss changed values)
+        if key in self and self[key] == value:
+            return
+
+        super(SignaledDict, self).__setitem__(key, value)
+        self.updated()
+
     __delitem__ = _UpdateAction('__delitem__')
-    __setitem__ = _UpdateAction('__setitem__')
     clear = _UpdateAction('clear')
     pop = _UpdateAction('pop')
     popitem = _UpdateAction('popitem')
@@ -9,15 +9,18 @@ from collections import Mapping
 from datetime import timedelta
 import logging
 
-from xcb.xproto import CW, ConfigureNotifyEvent
+from xcb.xproto import CW
 
 import xpybutil
-import xpybutil.event
 import xpybutil.ewmh as ewmh
+import xpybutil.window
 
 import cairo
 
+from ..paint.context import pushContext
+from ..paint.surface import createSurface
 from ..settings import settings
+from ..utils.geometry import Rect
 from ..utils.time import StrftimeFormatter
 from .. import singletons
 
@@ -34,6 +37,9 @@ settings.setDefaults(
         #statusBarCenterFormat='FTTPWM',
         statusBarCenterFormat='',
         statusBarTitle='**statusbar**',
+        # Status bar widgets (instances of `fttpwm.statusbar.base.BaseWidget` subclasses) to show at the right end of
+        # the status bar, from left to right
+        statusBarWidgets=[],
         )
 
 
@@ -95,6 +101,14 @@ class StatusBarFormatter(Mapping):
 
 
 class StatusBar(object):
+    """The status bar window; its background is rendered once and cached, and only its text is redrawn on each update.
+
+    The caching strategy is chosen by the `surfaceCacheMethod` setting. (see `fttpwm.paint.surface`)
+
+    Widgets (see `statusBarWidgets`) are packed against the right end of the bar, and draw into the same surface, each
+    within the area allotted to it.
+
+    """
     @classmethod
     def startIfConfigured(cls):
         if settings.enableStatusBar:
@@ -102,147 +116,150 @@ class StatusBar(object):
 
     def __init__(self):
         self.windowID = xpybutil.conn.generate_id()
-        self.backPixmapID = None
 
         self.logger = logging.getLogger("fttpwm.statusbar.{}".format(self.windowID))
         self.logger.info("Setting up status bar.")
 
-        self.width, self.height = singletons.x.screenWidth, settings.theme.statusBar['height']
-        self.x, self.y = 0, singletons.x.screenHeight - self.height
+        width, height = singletons.x.screenWidth, settings.theme.statusBar['height']
+        self.x, self.y = 0, singletons.x.screenHeight - height
 
         self.formatter = StatusBarFormatter()
 
+        self.widgets = list()
+        self.widgetRects = list()
+        self.widgetLayoutSize = None
+        for widget in settings.statusBarWidgets:
+            self.addWidget(widget)
+
         # Create status bar window.
         self.windowAttributes = {
                 CW.OverrideRedirect: 1,
                 CW.BackPixel: singletons.x.black,
                 }
         self.windowID, createWindowCookie = singletons.x.createWindow(
-                self.x, self.y, self.width, self.height,
+                self.x, self.y, width, height,
                 attributes=self.windowAttributes, windowID=self.windowID, checked=True
                 )
         ewmh.set_wm_name(self.windowID, settings.statusBarTitle)
 
         setWMStrutPartialCookie = ewmh.set_wm_strut_partial_checked(
                 self.windowID,
-                0, 0, 0, self.height,  # left, right, top, bottom,
-                0, 0,                  # left_start_y, left_end_y
-                0, 0,                  # right_start_y, right_end_y,
-                0, 0,                  # top_start_x, top_end_x,
-                0, self.width          # bottom_start_x, bottom_end_x
+                0, 0, 0, height,  # left, right, top, bottom,
+                0, 0,             # left_start_y, left_end_y
+                0, 0,             # right_start_y, right_end_y,
+                0, 0,             # top_start_x, top_end_x,
+                0, width          # bottom_start_x, bottom_end_x
                 )
 
-        # Set up Cairo.
-        self.surface = cairo.XCBSurface(xpybutil.conn, self.windowID, singletons.x.visual, self.width, self.height)
-        self.context = cairo.Context(self.surface)
-        self.context.set_operator(cairo.OPERATOR_OVER)
+        # Set up the cached surface; it handles Expose, ConfigureNotify, MapNotify and UnmapNotify for us.
+        self.surface = createSurface(width, height, self.windowID, painter=self)
+        self.surface.setup()
 
-        self.subscribeToEvents()
+        xpybutil.window.listen(self.windowID, 'ButtonPress', 'Exposure', 'PropertyChange', 'StructureNotify')
 
         xpybutil.conn.flush()
 
         createWindowCookie.check()
         setWMStrutPartialCookie.check()
 
-        self.mapped = False
         try:
             xpybutil.conn.core.MapWindowChecked(self.windowID).check()
         except:
             self.logger.exception("Error mapping!")
 
-        singletons.eventloop.callEvery(timedelta(seconds=1), self.paint)
+        self.repaintTimer = singletons.eventloop.callEvery(timedelta(seconds=1), self.paint)
         singletons.wm.workspaces.currentChanged.connect(self.paint)
 
-    def subscribeToEvents(self):
-        self.logger.info("Subscribing to events.")
-
-        # Frame window events
-        xpybutil.event.connect('ConfigureNotify', self.windowID, self.onConfigureNotify)
-        xpybutil.event.connect('Expose', self.windowID, self.onExpose)
-        xpybutil.event.connect('MapNotify', self.windowID, self.onMapNotify)
-        xpybutil.event.connect('UnmapNotify', self.windowID, self.onUnmapNotify)
-
-        xpybutil.window.listen(self.windowID, 'ButtonPress', 'Exposure', 'PropertyChange', 'StructureNotify')
-
-    ## X events ####
-    def onConfigureNotify(self, event):
-        # If there's any other ConfigureNotify events for this window in the queue, ignore this one.
-        xpybutil.event.read(block=False)
-        for ev in xpybutil.event.peek():
-            if isinstance(ev, ConfigureNotifyEvent) and ev.window == self.windowID:
-                return
-
-        if (self.x, self.y) != (event.x, event.y):
-            self.logger.trace("onConfigureNotify: Window position changed to %r.", (event.x, event.y))
-            self.x, self.y = event.x, event.y
-
-        if (self.width, self.height) != (event.width, event.height):
-            self.logger.trace("onConfigureNotify: Window size changed to %r.", (event.width, event.height))
-
-            # Window size changed; resize surface and redraw.
-            self.surface.set_size(event.width, event.height)
-            self.width, self.height = event.width, event.height
-
-            # Ditch old background pixmap so it's regenerated
-            xpybutil.conn.core.FreePixmap(self.backPixmapID)
-            self.backPixmapID = None
-
-            self.paint()
-
-    def onExpose(self, event):
-        # A count of 0 denotes the last Expose event in a series of contiguous Expose events; this check lets us
-        # collapse such series into a single call to paint() so we don't get extraneous redraws.
-        if event.count == 0:
-            self.paint()
-
-    def onMapNotify(self, event):
-        self.mapped = True
-        self.paint()
-
-    def onUnmapNotify(self, event):
-        self.mapped = False
+    @property
+    def width(self):
+        return self.surface.width
 
-    def paintBackground(self):
-        cookies = list()
-        self.backPixmapID = xpybutil.conn.generate_id()
+    @property
+    def height(self):
+        return self.surface.height
 
-        cookies.append(xpybutil.conn.core.CreatePixmapChecked(
-                singletons.x.depth, self.backPixmapID, self.windowID, self.width, self.height
-                ))
+    @property
+    def textWidth(self):
+        """The width of the part of the bar left over for the status text, to the left of any widgets.
+
+        """
+        rects = self.layoutWidgets()
+        return rects[0].x if rects else self.width
+
+    ## Widgets ####
+    def addWidget(self, widget):
+        widget.statusBar = self
+        self.widgets.append(widget)
+        self.widgetLayoutSize = None
+
+    def removeWidget(self, widget):
+        self.widgets.remove(widget)
+        widget.statusBar = None
+        self.widgetLayoutSize = None
+
+    def layoutWidgets(self):
+        """Get the rect allotted to each widget, laying them out again if the bar's size has changed.
+
+        Each widget gets its minimum width, and as much of the bar's height as its size limits allow, centered
+        vertically.
+
+        """
+        size = (self.width, self.height)
+        if size == self.widgetLayoutSize:
+            return self.widgetRects
+
+        rects = list()
+        x = self.width
+        for widget in reversed(self.widgets):
+            (minWidth, minHeight), (maxWidth, maxHeight) = widget.minSize, widget.maxSize
+
+            height = max(minHeight, min(self.height, maxHeight or self.height))
+            x -= minWidth
+            rects.append(Rect(x, (self.height - height) // 2, minWidth, height))
+
+        rects.reverse()
+
+        self.widgetRects = rects
+        self.widgetLayoutSize = size
+        return rects
+
+    def drawWidgets(self, context, method):
+        for widget, rect in zip(self.widgets, self.layoutWidgets()):
+            with pushContext(context):
+                context.rectangle(*rect)
+                context.clip()
+
+                try:
+                    getattr(widget, method)(context, rect)
+                except Exception:
+                    self.logger.exception("Error calling %s on status bar widget %r!", method, widget)
+
+    ## Painting (called by our surface) ####
+    def setupBackground(self, context):
+        context.set_operator(cairo.OPERATOR_OVER)
 
-        surface = cairo.XCBSurface(xpybutil.conn, self.backPixmapID, singletons.x.visual,
-                self.width, self.height)
-        context = cairo.Context(surface)
+    def setupForeground(self, context):
         context.set_operator(cairo.OPERATOR_OVER)
 
+    def drawBackground(self, context):
         self.logger.trace("Painting status bar background...")
         settings.theme.paintStatusBarBackground(context, self)
+        self.drawWidgets(context, 'drawBackground')
         self.logger.trace("Done painting status bar background.")
 
-        surface.flush()
-        self.bgPattern = cairo.SurfacePattern(surface)
-
-        xpybutil.conn.flush()
-        for cookie in cookies:
-            cookie.check()
-
-    def paint(self):
-        if not self.mapped:
-            return
-
-        if self.backPixmapID is None:
-            self.paintBackground()
-
+    def drawForeground(self, context):
         self.leftText = self.formatter.format(settings.statusBarLeftFormat)
         self.rightText = self.formatter.format(settings.statusBarRightFormat)
         self.centerText = self.formatter.format(settings.statusBarCenterFormat)
 
-        self.context.set_source(self.bgPattern)
-        self.context.paint()
+        settings.theme.paintStatusBar(context, self)
+        self.drawWidgets(context, 'drawForeground')
 
-        settings.theme.paintStatusBar(self.context, self)
-
-        self.surface.flush()
-        xpybutil.conn.flush()
+    def paint(self):
+        # Only the text changes over time; the surface redraws it over the cached background.
+        if self.surface.mapped:
+            self.surface.updateForeground()
+            xpybutil.conn.flush()
 
+        # Keep our repaint timer running, even while unmapped, so we start updating once we're mapped.
         return True
@@ -5,120 +5,26 @@ Licensed under the MIT license; see the LICENSE file for details.
 
 """
 from abc import ABCMeta, abstractmethod
-import logging
 
-from xcb.xproto import CW
 
-import xpybutil
-import xpybutil.event
-
-import cairo
-
-from ..settings import settings
-from ..utils.x import convertAttributes
-from ..utils.time import StrftimeFormatter
-from .. import singletons
+class BaseWidget(object):
+    """Base class for status bar widgets.
 
+    Widgets don't own any X resources; the status bar calls `drawBackground` when its cached background is rendered and
+    `drawForeground` each time the foreground is updated, passing the area allotted to the widget. (drawing is clipped
+    to that area) Each widget is given its minimum width, and a height within its size limits.
 
-class BaseWidget(object):
+    """
     __metaclass__ = ABCMeta
 
     def __init__(self, minSize=(16, 16), maxSize=(None, 16)):
         self.minSize = minSize
         self.maxSize = maxSize
-        self._statusBar = None
-        self.surface = None
-
-    @property
-    def statusBar(self):
-        return self._statusBar
-
-    @statusBar.setter
-    def statusBar(self, statusBar):
-        self._statusBar = statusBar
-
-        self.context = None
-        if self.surface is not None:
-            self.surface.finish()
+        self.statusBar = None
 
-        self.surface = cairo.XCBSurface(xpybutil.conn, statusBar.windowID, singletons.x.visual,
-                statusBar.width, statusBar.height)
-        self.context = cairo.Context(self.surface)
-        self.context.set_operator(cairo.OPERATOR_OVER)
-
-    @abstractmethod
-    def paint(self, target, x, y, width, height):
+    def drawBackground(self, context, rect):
         pass
 
-
-class PixmapBackedWidget(BaseWidget):
-    def __init__(self, *args, **kwargs):
-        super(PixmapBackedWidget, self).__init__(*args, **kwargs)
-
-        self.pixmapID = None
-
-        self.logger = logging.getLogger('.'.join(__name__, type(self).__name__))
-
     @abstractmethod
-    def paintPixmap(self):
+    def drawForeground(self, context, rect):
         pass
-
-    def createPixmap(self, x, y, width, height):
-        cookies = list()
-        self.pixmapID = xpybutil.conn.generate_id()
-
-        cookies.append(xpybutil.conn.core.CreatePixmapChecked(
-                singletons.x.depth, self.pixmapID, self.statusBar.windowID, width, height
-                ))
-
-        # Set up Cairo.
-        self.pixmapSurface = cairo.XCBSurface(xpybutil.conn, self.pixmapID, singletons.x.visual,
-                self.width, self.height)
-        self.pixmapContext = cairo.Context(self.pixmapSurface)
-        self.pixmapContext.set_operator(cairo.OPERATOR_OVER)
-
-        self.logger.trace("Painting status bar background...")
-        settings.theme.paintStatusBarWidgetBackground(self.pixmapContext, self)
-        self.logger.trace("Done painting status bar background.")
-
-        xpybutil.conn.flush()
-
-        cookies.append(xpybutil.conn.core.ChangeWindowAttributesChecked(self.windowID, *convertAttributes({
-                CW.BackPixmap: self.pixmapID
-                })))
-
-    def paint(self, target, x, y, width, height):
-        if not self.mapped:
-            return
-
-        if self.pixmapID is None:
-            self.createPixmap(x, y, width, height)
-            self.paintPixmap()
-
-        formatter = StrftimeFormatter()
-        now = formatter.now
-        kwargs = {
-                'isodate': now.date().isoformat(),
-                'isotime': now.time().replace(microsecond=0).isoformat(),
-                'isodatetime': now.replace(microsecond=0).isoformat(' '),
-                'workspaces': singletons.wm.workspaces,
-                }
-
-        def doText(fmt):
-            if callable(fmt):
-                return fmt()
-            else:
-                return formatter.format(fmt, **kwargs)
-
-        self.leftText = doText(settings.statusBarLeftFormat)
-        self.rightText = doText(settings.statusBarRightFormat)
-        self.centerText = doText(settings.statusBarCenterFormat)
-
-        # Clear the window to the background pixmap.
-        xpybutil.conn.core.ClearAreaChecked(False, self.windowID, 0, 0, 0, 0).check()
-
-        # Draw the status bar text.
-        self.surface.mark_dirty()
-        settings.theme.paintStatusBar(self.context, self)
-        self.surface.flush()
-        xpybutil.conn.flush()
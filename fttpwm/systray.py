@@ -1,6 +1,6 @@
 from xcb.xproto import Atom
 
-from xpybutil.util import get_atom as atom
+from .atoms import atom
 
 
 # For a KDE-compatible systray, we need to set this property: (to the ID of the root window of this screen?)
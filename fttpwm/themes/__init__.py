@@ -10,11 +10,20 @@ import logging
 
 import xpybutil.ewmh as ewmh
 
+from ..paint.cache import RenderCache
+from ..paint.gradients import gradientCache
+from ..paint.text import FontSpec
+from ..settings import settings
 from ..utils.geometry import Rect
 
 
 logger = logging.getLogger("fttpwm.themes")
 
+settings.setDefaults(
+        # The maximum amount of memory (in bytes) to use for caching pre-rendered titlebars and tabs.
+        tabCacheSize=4 * 1024 * 1024,
+        )
+
 
 class BaseTheme(object):
     """The base class for all themes; cannot be used directly.
@@ -24,6 +33,8 @@ class BaseTheme(object):
 
     def __init__(self):
         self.currentFrame = None
+        self.tabCache = None
+        self.fonts = dict()
 
     def __getitem__(self, key):
         return self.getFrameThemeValue(self.currentFrame, key)
@@ -51,6 +62,21 @@ class BaseTheme(object):
 
         return normalVal
 
+    def getFont(self, **state):
+        """Get the font to use in the given state, as a `FontSpec`.
+
+        The result is cached, so this doesn't have to look up every font value again for each paint.
+
+        """
+        key = tuple(sorted(state.iteritems()))
+
+        try:
+            return self.fonts[key]
+        except KeyError:
+            font = self.fonts[key] = FontSpec(*self.getThemeValues(
+                    'fontFace', 'fontSlant', 'fontWeight', 'fontSize', **state))
+            return font
+
     def getFrameExtents(self, frame):
         """Retrieve the frame sizes appropriate for the given frame's window.
 
@@ -74,12 +100,68 @@ class BaseTheme(object):
         ewmh.set_frame_extents(frame.clientWindowID, *self.getFrameExtents(frame))
         ewmh.set_wm_window_opacity(frame.frameWindowID, self.getFrameThemeValue(frame, 'opacity'))
 
+    def drawTab(self, ctx, frame, tabGeom=None):
+        """Draw the titlebar or tab for the given frame, using a cached copy if we've drawn an identical one before.
+
+        Tabs are cached by focus state, size, and visible title; everything else `paintTab` draws must only depend on
+        those.
+
+        """
+        if tabGeom is None:
+            tabGeom = Rect(0, 0, frame.width - 1, self.getFrameThemeValue(frame, 'titlebarHeight') - 1)
+        elif not isinstance(tabGeom, Rect):
+            tabGeom = Rect(*tabGeom)
+
+        frame.setVisibleTitle(self.getVisibleTitle(frame, tabGeom))
+
+        if self.tabCache is None:
+            self.tabCache = RenderCache(settings.tabCacheSize)
+
+        # Bevels are drawn along the rect's far edges, so tabs cover one more pixel than their size in each direction.
+        width, height = tabGeom.width + 1, tabGeom.height + 1
+        key = (frame.focused, width, height, frame.visibleTitle)
+
+        surface = self.tabCache.get(key, ctx.get_target(), width, height,
+                lambda tabCtx: self.paintTab(tabCtx, frame, Rect(0, 0, tabGeom.width, tabGeom.height)))
+
+        if surface is None:
+            # Too big to cache; just draw it directly.
+            self.paintTab(ctx, frame, tabGeom)
+            return
+
+        ctx.save()
+        ctx.set_source_surface(surface, tabGeom.x, tabGeom.y)
+        ctx.rectangle(tabGeom.x, tabGeom.y, width, height)
+        ctx.fill()
+        ctx.restore()
+
+    def getVisibleTitle(self, frame, tabGeom):
+        """Get the title to display in the given tab for the given frame; themes should override this to shorten
+        titles which don't fit. (`paintTab` draws `frame.visibleTitle`, which is set to the result before painting)
+
+        """
+        return frame.title
+
+    def clearCaches(self):
+        """Discard all cached renderings; call this after changing any of the theme's values.
+
+        """
+        if self.tabCache is not None:
+            self.tabCache.clear()
+
+        self.fonts.clear()
+        gradientCache.clear()
+
     @abstractmethod
     def paintTab(self, ctx, frame, tabGeom=None):
         pass
 
     @abstractmethod
     def paintWindow(self, ctx, frame, titleGeom=None):
+        """Paint the frame's border and background, and its titlebar unless it shows a shared tab bar. (see
+        `WindowFrame.tabBar`)
+
+        """
         pass
 
     @abstractmethod
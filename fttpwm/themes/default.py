@@ -7,7 +7,7 @@ Licensed under the MIT license; see the LICENSE file for details.
 """
 import cairo
 
-from ..paint import fonts
+from ..paint import fonts, text
 from ..paint.color import Color
 from ..paint.context import pushContext, drawBevel, drawFill, drawText
 from ..paint.gradients import linearGradient, Direction
@@ -55,12 +55,11 @@ class Default(BaseTheme):
 
     def paintTab(self, ctx, frame, tabGeom=None):
         GFTV = lambda x: self.getFrameThemeValues(frame, *x.split())
-        titlebarBackground, innerBackground, textColor, fontFace, fontSlant, fontWeight, fontSize, titlebarHeight = \
-                GFTV(
-                'titlebarBackground innerBackground textColor fontFace fontSlant fontWeight fontSize titlebarHeight'
+        titlebarBackground, innerBackground, textColor, titlebarHeight = GFTV(
+                'titlebarBackground innerBackground textColor titlebarHeight'
                 )
 
-        font = fonts.getFont(fontFace, fontSlant, fontWeight)
+        font = self.getFont(focused=frame.focused)
 
         if not tabGeom:
             tabGeom = Rect(0, 0, frame.width - 1, titlebarHeight - 1)
@@ -74,7 +73,7 @@ class Default(BaseTheme):
         drawBevel(ctx, tabGeom)
 
         with pushContext(ctx):
-            innerGeom = tabGeom.shrinkCentered(36, 4)
+            innerGeom = self.getTitleGeometry(tabGeom)
 
             if innerBackground is not None:
                 # Draw inner bevel
@@ -84,27 +83,31 @@ class Default(BaseTheme):
                 drawFill(ctx, innerGeom, innerBackground)
 
             # Draw title text
-            drawText(ctx, frame.title, innerGeom, textColor, font, fontSize)
+            drawText(ctx, frame.visibleTitle, innerGeom, textColor, font)
+
+    def getTitleGeometry(self, tabGeom):
+        return tabGeom.shrinkCentered(36, 4)
+
+    def getVisibleTitle(self, frame, tabGeom):
+        return text.backend().ellipsize(self.getFont(focused=frame.focused), frame.title,
+                self.getTitleGeometry(tabGeom).width)
 
     def paintWindow(self, ctx, frame, titleGeom=None):
         frameBackground, titlebarHeight = self.getFrameThemeValues(frame, 'frameBackground', 'titlebarHeight')
 
         # Draw frame background
-        nonTitleArea = frame.geometry.shrink(0, titlebarHeight).move(0, titlebarHeight)
+        nonTitleArea = Rect(0, titlebarHeight, frame.width, frame.height - titlebarHeight)
         drawFill(ctx, nonTitleArea, frameBackground)
 
-        self.paintTab(ctx, frame, titleGeom)
+        # Frames showing a shared tab bar get their tabs (including their own) copied from it.
+        if frame.tabBar is None:
+            self.drawTab(ctx, frame, titleGeom)
 
     def paintStatusBarBackground(self, ctx, bar):
         background = self.getThemeValue('background', statusBar=True)
 
         # Draw titlebar background (and window border, since we're using ctx.paint instead of ctx.fill)
-        background.set_matrix(cairo.Matrix(
-                xx=1 / float(bar.width),
-                yy=1 / float(bar.height)
-                ))
-        ctx.set_source(background)
-        ctx.paint()
+        drawFill(ctx, Rect(0, 0, bar.width, bar.height), background, clip=False)
 
         # Draw outer titlebar bevel
         ctx.set_line_width(1)
@@ -126,24 +129,20 @@ class Default(BaseTheme):
         ctx.stroke()
 
     def paintStatusBar(self, ctx, bar):
-        GBTV = lambda x: self.getThemeValues(*x.split(), statusBar=True)
-        textColor, fontFace, fontSlant, fontWeight, fontSize = GBTV(
-                'textColor fontFace fontSlant fontWeight fontSize'
-                )
+        textColor = self.getThemeValue('textColor', statusBar=True)
+        font = self.getFont(statusBar=True)
+        backend = text.backend()
 
         # Set up text drawing
         ctx.set_source_rgba(*textColor)
-        ctx.select_font_face(fontFace, fontSlant, fontWeight)
-        ctx.set_font_options(fonts.options.fontOptions)
-        ctx.set_font_size(fontSize)
 
         # Draw title text
-        align = fonts.Align(ctx, bar.width, bar.height)
+        align = fonts.Align(ctx, bar.textWidth, bar.height, measure=lambda string: backend.extents(font, string))
 
-        for pos, text in [
+        for pos, string in [
                 (align.left, bar.leftText),
                 (align.center, bar.centerText),
                 (align.right, bar.rightText),
                 ]:
-            ctx.move_to(*pos(text))
-            ctx.show_text(text)
+            ctx.move_to(*pos(string))
+            backend.show(ctx, font, string)
@@ -110,3 +110,34 @@ class Rect(object):
                 self.x + moveByX, self.y + moveByY,
                 self.width, self.height
                 )
+
+    @property
+    def area(self):
+        return max(0, self.width) * max(0, self.height)
+
+    @property
+    def empty(self):
+        return self.width <= 0 or self.height <= 0
+
+    def intersection(self, other):
+        """Get the area covered by both this rect and `other`, or None if they don't overlap.
+
+        """
+        left, top = max(self.x, other.x), max(self.y, other.y)
+        right = min(self.x + self.width, other.x + other.width)
+        bottom = min(self.y + self.height, other.y + other.height)
+
+        if right <= left or bottom <= top:
+            return None
+
+        return Rect(left, top, right - left, bottom - top)
+
+    def union(self, other):
+        """Get the smallest rect which covers both this rect and `other`.
+
+        """
+        left, top = min(self.x, other.x), min(self.y, other.y)
+        right = max(self.x + self.width, other.x + other.width)
+        bottom = max(self.y + self.height, other.y + other.height)
+
+        return Rect(left, top, right - left, bottom - top)
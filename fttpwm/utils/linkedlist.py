@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: LinkedList class
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+
+
+class LinkedList(object):
+    """A circular, doubly-linked list of unique, hashable items.
+
+    Links are stored in a dict keyed by item, so membership tests, finding an item's neighbors, and inserting, removing
+    or moving an item by one position are all constant-time. Only positional operations (`insert`, `index`) need to
+    walk the list.
+
+    """
+    def __init__(self, items=()):
+        # Maps each item to a [previous, next] pair; the last item's next is the first item, and vice versa.
+        self.links = dict()
+        self.first = None
+
+        for item in items:
+            self.append(item)
+
+    def __len__(self):
+        return len(self.links)
+
+    def __contains__(self, item):
+        return item in self.links
+
+    def __iter__(self):
+        item = self.first
+        for _ in range(len(self.links)):
+            yield item
+            item = self.links[item][1]
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self))
+
+    @property
+    def last(self):
+        if self.first is not None:
+            return self.links[self.first][0]
+
+    def _link(self, item, before=None):
+        """Insert `item` just before `before`, or at the end of the list if `before` is None.
+
+        """
+        if item in self.links:
+            raise ValueError("{!r} is already in the list!".format(item))
+
+        if not self.links:
+            self.links[item] = [item, item]
+            self.first = item
+            return
+
+        successor = self.first if before is None else before
+        predecessor = self.links[successor][0]
+
+        self.links[item] = [predecessor, successor]
+        self.links[predecessor][1] = item
+        self.links[successor][0] = item
+
+        if before is not None and before == self.first:
+            self.first = item
+
+    def append(self, item):
+        self._link(item)
+
+    def insertBefore(self, item, before):
+        self._link(item, before)
+
+    def insertAfter(self, item, after):
+        self._link(item, self.next(after, wrap=False))
+
+    def insert(self, index, item):
+        """Insert `item` at the given position, walking the list from the front; indices past the end append.
+
+        """
+        if index >= len(self.links):
+            self.append(item)
+            return
+
+        before = self.first
+        for _ in range(max(index, 0)):
+            before = self.links[before][1]
+
+        self._link(item, before)
+
+    def remove(self, item):
+        previous, next = self.links.pop(item)
+
+        if not self.links:
+            self.first = None
+            return
+
+        self.links[previous][1] = next
+        self.links[next][0] = previous
+
+        if item == self.first:
+            self.first = next
+
+    def discard(self, item):
+        if item in self.links:
+            self.remove(item)
+
+    def clear(self):
+        self.links.clear()
+        self.first = None
+
+    def next(self, item, wrap=True):
+        """Get the item after `item`; at the end of the list, this is the first item, or None if `wrap` is False.
+
+        """
+        next = self.links[item][1]
+        if not wrap and next == self.first:
+            return None
+
+        return next
+
+    def previous(self, item, wrap=True):
+        """Get the item before `item`; at the start of the list, this is the last item, or None if `wrap` is False.
+
+        """
+        if not wrap and item == self.first:
+            return None
+
+        return self.links[item][0]
+
+    def sibling(self, item, n):
+        """Get the item `n` positions after (n > 0) or before (n < 0) `item`, wrapping around at either end.
+
+        """
+        step = 1 if n > 0 else 0
+        for _ in range(abs(n)):
+            item = self.links[item][step]
+
+        return item
+
+    def move(self, item, n):
+        """Move `item` forward (n > 0) or backward (n < 0) by `n` positions, stopping at either end of the list.
+
+        """
+        target = item
+        if n > 0:
+            for _ in range(n):
+                next = self.next(target, wrap=False)
+                if next is None:
+                    break
+                target = next
+
+        else:
+            for _ in range(-n):
+                previous = self.previous(target, wrap=False)
+                if previous is None:
+                    break
+                target = previous
+
+        if target == item:
+            return
+
+        self.remove(item)
+
+        if n > 0:
+            self.insertAfter(item, target)
+        else:
+            self.insertBefore(item, target)
+
+    def index(self, item):
+        if item not in self.links:
+            raise ValueError("{!r} is not in the list!".format(item))
+
+        for index, other in enumerate(self):
+            if other == item:
+                return index
@@ -1,14 +1,22 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
-"""FTTPWM: Time formatting utility class
+"""FTTPWM: Time utilities
 
 Copyright (c) 2012-2013 David H. Bronke
 Licensed under the MIT license; see the LICENSE file for details.
 
 """
+import ctypes
+import ctypes.util
 import datetime
+import logging
+import os
 import re
 import string
+import time
+
+
+logger = logging.getLogger("fttpwm.utils.time")
 
 
 class StrftimeFormatter(string.Formatter):
@@ -56,3 +64,45 @@ class StrftimeFormatter(string.Formatter):
             return kwargs.get('now_no_ms', self.now_no_ms)
 
         return super(StrftimeFormatter, self).get_value(key, args, kwargs)
+
+
+def _findMonotonicClock():
+    """Find the best available monotonic clock function.
+
+    Python 2 doesn't have `time.monotonic`, so on Linux we call `clock_gettime(CLOCK_MONOTONIC)` through ctypes. If
+    neither is available, we fall back to `time.time`, which will jump if the system clock is changed.
+
+    """
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+
+    CLOCK_MONOTONIC = 1
+
+    class timespec(ctypes.Structure):
+        _fields_ = [
+                (str('tv_sec'), ctypes.c_long),
+                (str('tv_nsec'), ctypes.c_long),
+                ]
+
+    try:
+        librt = ctypes.CDLL(ctypes.util.find_library(str('rt')) or str('librt.so.1'), use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    except (OSError, AttributeError):
+        logger.warn("Couldn't find clock_gettime; falling back to time.time for timers. Timers may misbehave if the "
+                "system clock changes!")
+        return time.time
+
+    def monotonic():
+        ts = timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(ts)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        return ts.tv_sec + ts.tv_nsec * 1e-9
+
+    return monotonic
+
+
+monotonic = _findMonotonicClock()
@@ -17,9 +17,9 @@ from xcb.xproto import Atom, CW, EventMask, InputFocus, PropMode, SetMode
 import xpybutil
 import xpybutil.event
 import xpybutil.ewmh as ewmh
-from xpybutil.util import get_atom as atom
 import xpybutil.window
 
+from .atoms import atom
 from .ewmh import EWMHAction, EWMHWindowState, EWMHWindowType
 from .settings import settings
 from .setroot import setWallpaper
@@ -77,6 +77,13 @@ class WM(object):
 
         self._lastFocusedWindow = None
 
+        # Struts fetched while handling a MapRequest, kept so the following MapNotify doesn't need to fetch them again.
+        self.pendingMapStruts = dict()
+
+        # Settings decide the workspaces, layouts, theme and bindings used by everything below, so they need to be
+        # loaded before we create any workspaces or start managing windows.
+        settings.loadSettings()
+
         self.workspaces = WorkspaceManager()
         self.workspaces.currentChanged.connect(self.onWorkspaceChanged)
 
@@ -90,10 +97,10 @@ class WM(object):
         self.checkForOtherWMs()
         self.startManaging()
 
-        settings.loadSettings()
-
         logger.info("Applying settings...")
-        setWallpaper()
+
+        # Rendering the wallpaper can take a while, and nothing else waits on it, so do it on a worker thread.
+        singletons.eventloop.runInExecutor(setWallpaper)
         bindKeys(settings.keys)
         bindMouse(settings.mouse)
         logger.info("Finished applying settings.")
@@ -189,13 +196,21 @@ class WM(object):
     def strutsBottomSize(self):
         return sum(self.strutsBottom.values())
 
-    def getWindowStruts(self, windowID):
-        wmPartialStrutCookie = ewmh.get_wm_strut_partial(windowID)
-        wmStrutCookie = ewmh.get_wm_strut(windowID)
+    def getWindowStruts(self, windowID, callback):
+        """Fetch the struts of the given window as part of the current `XBatch`.
 
-        wmPartialStrut = wmPartialStrutCookie.reply()
-        wmStrut = wmStrutCookie.reply()
+        Once the batch is resolved, `callback` will be called with the window's struts (in the form returned by
+        `ewmh.get_wm_strut_partial`), or None if the window doesn't have any.
 
+        """
+        properties = singletons.x.properties
+
+        with singletons.x.batch() as batch:
+            wmPartialStrut = properties.get(windowID, '_NET_WM_STRUT_PARTIAL', ewmh.get_wm_strut_partial)
+            wmStrut = properties.get(windowID, '_NET_WM_STRUT', ewmh.get_wm_strut)
+            batch.whenResolved(lambda: callback(self.combineStruts(wmPartialStrut.value, wmStrut.value)))
+
+    def combineStruts(self, wmPartialStrut, wmStrut):
         if wmPartialStrut is not None:
             return wmPartialStrut
 
@@ -336,7 +351,8 @@ class WM(object):
                 atom('_NET_WM_WINDOW_TYPE'),
                 atom('_NET_WM_PID'), atom('WM_CLIENT_MACHINE'),  # Support for killing hung processes
                 atom('_NET_FRAME_EXTENTS'),
-                #atom('_NET_WM_VISIBLE_NAME'), atom('_NET_WM_VISIBLE_ICON_NAME'),  # TODO: Elide titles, and set these!
+                atom('_NET_WM_VISIBLE_NAME'),
+                #atom('_NET_WM_VISIBLE_ICON_NAME'),  # TODO: Set this if we ever display icon names!
                 atom('_NET_WM_STRUT'), atom('_NET_WM_STRUT_PARTIAL'),
                 #atom('_NET_WM_ICON_GEOMETRY'), atom('_NET_WM_ICON'),
                 #atom('_NET_WM_USER_TIME'),  # TODO: Support for user activity tracking and startup notification
@@ -375,12 +391,6 @@ class WM(object):
         cookies = []
         cookies.append(xpybutil.conn.core.ChangeSaveSetChecked(SetMode.Insert, clientWindowID))
 
-        #FIXME: Move into WorkspaceManager.placeOnWorkspace!
-        #FIXME: We should pay attention to the _NET_WM_DESKTOP value if initially set by the client, and try to put the
-        # window on that desktop. If it is not set, or the specified desktop doesn't exist, then we should set it.
-        #ewmh.get_wm_desktop(clientWindowID)
-        ewmh.set_wm_desktop(clientWindowID, 0)
-
         frame = WindowFrame(clientWindowID)
         logger.debug("manageWindow: Created new frame: %r", frame)
 
@@ -435,16 +445,26 @@ class WM(object):
         clientWindowID = event.window
         logger.debug("onMapRequest: %r", clientWindowID)
 
-        struts = self.getWindowStruts(clientWindowID)
+        self.getWindowStruts(clientWindowID, lambda struts: self.finishMapRequest(clientWindowID, struts))
+
+    def finishMapRequest(self, clientWindowID, struts):
         if struts is not None:
             logger.debug("onMapRequest: Found struts on window; skipping window management.")
+            self.pendingMapStruts[clientWindowID] = struts
 
-            try:
-                xpybutil.conn.core.MapWindowChecked(clientWindowID).check()
-            except:
-                logger.exception("onMapRequest: Error mapping client window %r!", clientWindowID)
+            def onMapped(value, error):
+                if error is not None:
+                    logger.error("onMapRequest: Error mapping client window %r: %s", clientWindowID, error)
+
+                    # No MapNotify will come to use these struts; don't leave them to be picked up if the ID is reused.
+                    self.pendingMapStruts.pop(clientWindowID, None)
+
+            with singletons.x.batch() as batch:
+                batch.add(xpybutil.conn.core.MapWindowChecked(clientWindowID), onMapped)
+
+            return
 
-        elif clientWindowID not in self.windows:
+        if clientWindowID not in self.windows:
             # If we don't already have a frame for this client, create one.
             self.manageWindow(clientWindowID)
 
@@ -460,7 +480,18 @@ class WM(object):
         windowID = event.window
         logger.debug("onMapNotify: %r", windowID)
 
-        struts = self.getWindowStruts(windowID)
+        if windowID in self.frameWindows:
+            # This is one of our own frames; they never have struts.
+            return
+
+        try:
+            struts = self.pendingMapStruts.pop(windowID)
+        except KeyError:
+            self.getWindowStruts(windowID, lambda struts: self.applyWindowStruts(windowID, struts))
+        else:
+            self.applyWindowStruts(windowID, struts)
+
+    def applyWindowStruts(self, windowID, struts):
         logger.debug("Struts: %r", struts)
         if struts is not None:
             for side in 'left right top bottom'.split():
@@ -468,9 +499,11 @@ class WM(object):
                     logger.debug("onMapNotify: Found strut on %s side: %s", side, struts[side])
                     self.struts[side][windowID] = struts[side]
 
-            # Listen for UnmapNotify events so we can ditch the struts when the window unmaps.
-            xpybutil.window.listen(windowID, 'StructureNotify')
+            # Listen for UnmapNotify events so we can ditch the struts when the window unmaps, and for property
+            # changes so its cached struts stay valid if it's mapped again.
+            xpybutil.window.listen(windowID, 'PropertyChange', 'StructureNotify')
             xpybutil.event.connect('UnmapNotify', windowID, self.onUnmapNotify)
+            singletons.x.properties.watch(windowID)
 
     def onUnmapNotify(self, event):
         windowID = event.window
@@ -13,9 +13,10 @@ import weakref
 import xcb
 
 import xpybutil.ewmh as ewmh
-from xpybutil.util import get_atom as atom
 
 from . import singletons
+from .atoms import atom, atoms
+from .eventloop.idle import IdlePriority
 from .settings import settings
 from .signals import Signal
 from .signaled import SignaledList, SignaledDict
@@ -51,6 +52,10 @@ settings.setDefaults(
         )
 
 
+def layoutInfoPropFor(index):
+    return '_FTTPWM_WORKSPACE_{}_LAYOUT_INFO'.format(index)
+
+
 class WorkspaceManager(object):
     def __init__(self):
         self.workspaces = SignaledList()
@@ -77,6 +82,9 @@ class WorkspaceManager(object):
         del self.workspaces[:]
         self.workspacesByName.clear()
 
+        # Intern all of the workspaces' layout info atoms at once, instead of one at a time in `Workspace.updateIndex`.
+        atoms.preload(layoutInfoPropFor(index) for index in range(len(settings.workspaces)))
+
         for index, name in enumerate(settings.workspaces):
             self.createWorkspace(name, index)
 
@@ -95,7 +103,7 @@ class WorkspaceManager(object):
 
         # Pay attention to the _NET_WM_DESKTOP value if initially set by the client, and try to put the window on that
         # workspace. The workspace will then set _NET_WM_DESKTOP to its index.
-        workspaceNum = ewmh.get_wm_desktop(frame.clientWindowID)
+        workspaceNum = singletons.x.properties.get(frame.clientWindowID, '_NET_WM_DESKTOP', ewmh.get_wm_desktop).wait()
         if workspaceNum is None or workspaceNum >= len(self.workspaces):
             workspaceNum = self.currentIndex
 
@@ -194,6 +202,13 @@ class WorkspaceManager(object):
     def namesAfterCurrent(self):
         return [ws.name for ws in self.afterCurrent]
 
+    @property
+    def arrangesCoalesced(self):
+        """The number of workspace arrangement requests which were folded into an already-queued arrangement.
+
+        """
+        return sum(ws.arrangesCoalesced for ws in self.workspaces)
+
     def switchTo(self, workspace):
         if isinstance(workspace, basestring):
             workspace = self.workspacesByName[workspace]
@@ -216,6 +231,11 @@ class Workspace(object):
         self.focusedWindowClosed = Signal()
         self.focusedWindowClosed.connect(self.onFocusedWindowClosed)
 
+        # Layout info is saved on the root window, so it survives restarts; see `_queryLayoutInfo`.
+        self.layoutInfo = SignaledDict()
+        self.layoutInfo.updated.connect(self._scheduleLayoutInfoUpdate)
+        self.layoutInfoLoaded = False
+
         self.indexUpdated = Signal()
         self._index = None
         self.index = index
@@ -226,6 +246,9 @@ class Workspace(object):
 
         self.layout = settings.defaultLayout
 
+        # How many arrangement requests were folded into an arrangement that was already queued.
+        self.arrangesCoalesced = 0
+
         # Start with no local (workspace-specific) struts.
         self.localStrutsLeft, self.localStrutsRight = 0, 0
         self.localStrutsTop, self.localStrutsBottom = 0, 0
@@ -347,7 +370,7 @@ class Workspace(object):
 
         self.index = self.manager.workspaces.index(self)
 
-        self.layoutInfoProp = '_FTTPWM_WORKSPACE_{}_LAYOUT_INFO'.format(self.index)
+        self.layoutInfoProp = layoutInfoPropFor(self.index)
         self.layoutInfoAtom = atom(self.layoutInfoProp)
 
         if not gotLayoutInfo:
@@ -417,15 +440,26 @@ class Workspace(object):
     def _setLayoutInfo(self, value, error):
         value = json.loads(value) if value else {}
 
-        self.layoutInfo = SignaledDict(value)
-        self.layoutInfo.updated.connect(lambda: singletons.eventloop.callWhenIdle(self._updateLayoutInfo))
+        # Anything layouts stored before the saved info arrived takes precedence over it.
+        value.update(self.layoutInfo)
+        self.layoutInfo.update(value)
+
+        # The property was deleted when we read it, so write it back even if nothing changed.
+        self._scheduleLayoutInfoUpdate()
+
+        # Give layouts which restore state from the saved info a chance to do so.
+        if not self.layoutInfoLoaded:
+            self.layoutInfoLoaded = True
+            self.arrangeWindows()
+
+    def _scheduleLayoutInfoUpdate(self):
+        singletons.eventloop.callWhenIdle(self._updateLayoutInfo, priority=IdlePriority.Properties)
 
     def _updateLayoutInfo(self):
         #TODO: This should probably done through the X Session Management Protocol instead of using properties.
-        if self.clientWindowID is not None:
-            self.logger.trace("_updateLayoutInfo: Setting %r: %r", self.layoutInfoProp, json.dumps(self.layoutInfo))
+        self.logger.trace("_updateLayoutInfo: Setting %r: %r", self.layoutInfoProp, json.dumps(self.layoutInfo))
 
-            singletons.x.setProperty(singletons.x.root, self.layoutInfoAtom, json.dumps(self.layoutInfo))
+        singletons.x.setProperty(singletons.x.root, self.layoutInfoAtom, json.dumps(self.layoutInfo))
 
     def arrangeLocalDocks(self):
         #TODO: Rearrange any local (workspace-specific) dock windows as needed!
@@ -436,6 +470,26 @@ class Workspace(object):
         self.arrangeWindows()
 
     def arrangeWindows(self, *source):
+        """Request that this workspace's windows be arranged.
+
+        The arrangement is deferred until the event loop is idle, so any number of requests made while handling one
+        batch of events (a strut change plus a newly-mapped window, say) only arrange the workspace once. Use
+        `arrangeWindowsNow` if the new geometry is needed immediately.
+
+        Hidden workspaces aren't arranged at all; `show` arranges a workspace whenever it's shown.
+
+        """
+        if not self.visible:
+            return
+
+        if not singletons.eventloop.callWhenIdle(self.arrangeWindowsNow, priority=IdlePriority.Layout):
+            self.arrangesCoalesced += 1
+
+    def arrangeWindowsNow(self):
+        # The workspace may have been hidden since this arrangement was queued.
+        if not self.visible:
+            return
+
         if not self.hasViewableFrames:
             return
 
@@ -446,6 +500,9 @@ class Workspace(object):
 
         ewmh.set_current_desktop(self.index)
         self.visible = True
+
+        # Showing always re-arranges: that picks up any changes made while we were hidden, and it's also what maps our
+        # frames again.
         self.arrangeWindows()
 
     def hide(self):
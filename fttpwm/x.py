@@ -6,19 +6,25 @@ Licensed under the MIT license; see the LICENSE file for details.
 
 """
 from collections import deque
+from contextlib import contextmanager
 import logging
+from operator import attrgetter
 
 import xcb
 from xcb.xproto import Atom, Mapping, PropMode
 from xcb.xproto import WindowClass
 from xcb.xproto import CirculateRequestEvent, ConfigureRequestEvent, MapRequestEvent
-from xcb.xproto import MappingNotifyEvent
+from xcb.xproto import DestroyNotifyEvent, MappingNotifyEvent
+from xcb.xproto import ConfigureNotifyEvent, ExposeEvent, MotionNotifyEvent, PropertyNotifyEvent
+from xcb.xproto import ButtonPressEvent, ButtonReleaseEvent, EnterNotifyEvent, KeyPressEvent, KeyReleaseEvent
+from xcb.xproto import LeaveNotifyEvent
 
 import xpybutil
 import xpybutil.event
 import xpybutil.util
 import xpybutil.window
 
+from .atoms import atoms, knownAtoms
 from .settings import settings
 from .utils.x import findCurrentVisual
 from .signals import Signal
@@ -32,6 +38,231 @@ settings.setDefaults(
         )
 
 
+# Input events which end a run of MotionNotify events; motion events are never collapsed across one of these, so
+# handlers still see where the pointer was when a button was pressed or released, etc.
+motionBarrierEvents = frozenset((
+        ButtonPressEvent, ButtonReleaseEvent,
+        EnterNotifyEvent, LeaveNotifyEvent,
+        KeyPressEvent, KeyReleaseEvent,
+        ))
+
+
+def compressEvents(events):
+    """Collapse redundant events in the given list of events, so handlers only see the latest state.
+
+    - MotionNotify events are collapsed to the last one for each window in each run of motion events.
+    - ConfigureNotify events are collapsed to the last one for each (event, window) pair.
+    - PropertyNotify events are collapsed to the last one for each (window, atom) pair.
+    - Expose events are merged into the last one for each window, whose rectangle is grown to cover all of them.
+
+    Returns a new list containing the remaining events, in their original order.
+
+    """
+    kept = list()
+    seen = set()
+    seenMotion = set()
+    exposures = dict()
+
+    # Walk backwards through the events, so the first event we see for each key is the one we want to keep.
+    for event in reversed(events):
+        eventClass = event.__class__
+
+        if eventClass is MotionNotifyEvent:
+            if event.event in seenMotion:
+                continue
+            seenMotion.add(event.event)
+
+        elif eventClass is ConfigureNotifyEvent:
+            key = (eventClass, event.event, event.window)
+            if key in seen:
+                continue
+            seen.add(key)
+
+        elif eventClass is PropertyNotifyEvent:
+            key = (eventClass, event.window, event.atom)
+            if key in seen:
+                continue
+            seen.add(key)
+
+        elif eventClass is ExposeEvent:
+            latest = exposures.get(event.window)
+            if latest is not None:
+                right = max(latest.x + latest.width, event.x + event.width)
+                bottom = max(latest.y + latest.height, event.y + event.height)
+                latest.x = min(latest.x, event.x)
+                latest.y = min(latest.y, event.y)
+                latest.width = right - latest.x
+                latest.height = bottom - latest.y
+                continue
+            exposures[event.window] = event
+
+        elif eventClass in motionBarrierEvents:
+            seenMotion.clear()
+
+        kept.append(event)
+
+    kept.reverse()
+    return kept
+
+
+class PendingReply(object):
+    """The result of a request made as part of an `XBatch`.
+
+    Once the batch has been resolved, `value` holds the request's reply (or None if it failed), and `error` holds the
+    exception raised while retrieving it (or None if it succeeded).
+
+    """
+    def __init__(self, cookie, callback=None):
+        self.cookie = cookie
+        self.callback = callback
+        self.resolved = False
+        self.value = None
+        self.error = None
+
+    def fetch(self):
+        if self.resolved:
+            return
+
+        try:
+            if self.cookie is None:
+                pass
+            elif hasattr(self.cookie, 'reply'):
+                self.value = self.cookie.reply()
+            else:
+                # Checked requests with no reply (VoidCookie) only report errors.
+                self.cookie.check()
+        except Exception as ex:
+            self.error = ex
+
+        self.resolved = True
+        self.cookie = None
+
+    def wait(self):
+        """Block until this request's reply arrives (if it hasn't already), and return its value.
+
+        """
+        self.fetch()
+        return self.value
+
+
+class XBatch(object):
+    """Collects requests so that their replies can all be retrieved together, in a single round-trip.
+
+    Use `XConnection.batch` to get the current batch; requests added to it are resolved when the outermost batch
+    context exits. Callbacks are called with `(value, error)` once every reply in the batch has arrived, in the order
+    their requests were added, so a callback may use the `PendingReply` objects for any request in the same batch.
+    Requests added from inside a callback are resolved together in another round-trip before the batch finishes.
+
+    If given, `awaitedReplies` is the list of `(cookie, callback)` pairs from `XConnection.whenReplied`; any of those
+    still waiting when the batch waits on the server are resolved along with it.
+
+    """
+    def __init__(self, conn, awaitedReplies=None):
+        self.conn = conn
+        self.pending = list()
+        self.awaitedReplies = awaitedReplies if awaitedReplies is not None else list()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, cookie, callback=None):
+        """Add a request's `cookie` to this batch, and return a `PendingReply` for it.
+
+        """
+        reply = PendingReply(cookie, callback)
+        self.pending.append(reply)
+        return reply
+
+    def whenResolved(self, callback):
+        """Call `callback` (with no arguments) once all of the requests added to this batch so far have been resolved.
+
+        """
+        self.add(None, lambda value, error: callback())
+
+    def resolve(self):
+        """Retrieve the replies for all pending requests, and call their callbacks.
+
+        """
+        while self.pending:
+            pending, self.pending = self.pending, list()
+
+            # The server answers requests in order, so the replies we're awaiting will have arrived by the time these
+            # have. Collect them now: if a blocking wait elsewhere already read them off the socket, it won't become
+            # readable again for them.
+            if self.awaitedReplies and any(reply.cookie is not None for reply in pending):
+                pending[:0] = [PendingReply(cookie, callback) for cookie, callback in self.awaitedReplies]
+                del self.awaitedReplies[:]
+
+            # Send every request before we wait on any of them, so the server can answer them all at once.
+            self.conn.flush()
+
+            for reply in pending:
+                reply.fetch()
+
+            for reply in pending:
+                if reply.callback is not None:
+                    try:
+                        reply.callback(reply.value, reply.error)
+                    except Exception:
+                        logger.exception("Error in batched reply callback %r!", reply.callback)
+
+
+class PropertyCache(object):
+    """Caches the values of properties on client windows.
+
+    Values are only cached for windows which have been passed to `watch`, since we have to be listening for
+    PropertyNotify events on a window to know when its cached values go stale. A window's cached value for a property
+    is invalidated when a PropertyNotify for that property arrives, and all of its values are dropped when it's
+    destroyed.
+
+    """
+    def __init__(self, xconn):
+        self.xconn = xconn
+
+        # Maps each watched window ID to a dict mapping property atoms to `PendingReply` objects.
+        self.windows = dict()
+
+    def watch(self, windowID):
+        self.windows.setdefault(windowID, dict())
+
+    def forget(self, windowID):
+        self.windows.pop(windowID, None)
+
+    def get(self, windowID, name, request):
+        """Get a `PendingReply` for the value of the property `name` on the given window.
+
+        If the value isn't cached, `request(windowID)` (for instance, `ewmh.get_wm_name`) is called to request it as
+        part of the current `XBatch`; use `PendingReply.wait` to get the value right away.
+
+        """
+        entries = self.windows.get(windowID)
+        atom = atoms.get(name)
+
+        if entries is not None:
+            reply = entries.get(atom)
+
+            # Failed requests aren't cached.
+            if reply is not None and reply.error is None:
+                return reply
+
+        with self.xconn.batch() as batch:
+            reply = batch.add(request(windowID))
+
+        if entries is not None:
+            entries[atom] = reply
+
+        return reply
+
+    def onPropertyNotify(self, event):
+        entries = self.windows.get(event.window)
+        if entries:
+            if entries.pop(event.atom, None) is not None:
+                logger.trace("Invalidated cached %s on window %r.", atoms.describe(event.atom), event.window)
+
+    def onDestroyNotify(self, event):
+        self.forget(event.window)
+
+
 class XConnection(object):
     def __init__(self):
         self.startupFinished = False
@@ -47,6 +278,10 @@ class XConnection(object):
         self.setup = self.conn.get_setup()
         self.screenNumber = self.conn.pref_screen
         self.screen = self.setup.roots[self.screenNumber]
+
+        # Intern every atom we know we'll need in one burst, instead of paying a round-trip for each one as it's used.
+        atoms.preload(knownAtoms + ['WM_S{}'.format(self.screenNumber)], self.conn)
+        atoms.installIntoXpybutil()
         self.root = self.screen.root
         self.depth = self.screen.root_depth
         self.visualID = self.screen.root_visual
@@ -61,6 +296,15 @@ class XConnection(object):
         self.pendingUpdateKeyboardMapping = None
         self.pendingUpdateModifierMapping = None
 
+        # Maps each event class to the function which dispatches events of that class; see `createDispatcher`.
+        self.dispatchers = dict()
+
+        self.currentBatch = None
+        self.properties = PropertyCache(self)
+
+        # (cookie, callback) pairs for replies to fetch the next time the X connection is readable; see `whenReplied`.
+        self.awaitedReplies = list()
+
         singletons.eventloop.register(self.conn, self.handleXCBComm)
 
     def __getattr__(self, name):
@@ -72,13 +316,61 @@ class XConnection(object):
         """
         return getattr(self.conn, name)
 
-    def allocColor(self, color):
+    @contextmanager
+    def batch(self):
+        """Get the current `XBatch`, starting a new one if needed.
+
+        The batch is resolved when the outermost `with singletons.x.batch()` block exits; `handleXCBComm` wraps each
+        round of event handling in one, so requests made by event handlers are resolved together after all of the
+        waiting events have been handled.
+
+        """
+        if self.currentBatch is not None:
+            yield self.currentBatch
+            return
+
+        batch = self.currentBatch = XBatch(self.conn, self.awaitedReplies)
+        try:
+            yield batch
+
+        finally:
+            try:
+                batch.resolve()
+            finally:
+                self.currentBatch = None
+
+    def whenReplied(self, cookie, callback):
+        """Call `callback` with `(value, error)` once the reply to the given request `cookie` has come in.
+
+        The request is sent immediately, and its reply is fetched along with any others as part of the next batch
+        which waits on the server, or the one resolved the next time the X connection becomes readable, instead of
+        waiting on it right away.
+
+        """
+        self.awaitedReplies.append((cookie, callback))
+        self.conn.flush()
+
+    def allocColor(self, color, callback=None):
         """Allocate the given color and return its XID.
 
         `color` must be a tuple `(r, g, b)` where `r`, `g`, and `b` are between 0 and 1.
 
+        If `callback` is given, the request is made as part of the current `XBatch` instead of blocking, and `callback`
+        will be called with the color's XID (or None if allocation failed) once the batch is resolved.
+
         """
-        return self.conn.core.AllocColor(self.colormap, *color).reply().pixel
+        cookie = self.conn.core.AllocColor(self.colormap, *color)
+
+        if callback is None:
+            return cookie.reply().pixel
+
+        def onReply(reply, error):
+            if error is not None:
+                logger.error("Error allocating color %r: %s", color, error)
+            callback(reply.pixel if reply is not None else None)
+
+        with self.batch() as batch:
+            batch.add(cookie, onReply)
 
     def createWindow(self, x, y, width, height, attributes={}, windowID=None, parentID=None, borderWidth=0,
             windowClass=WindowClass.InputOutput, checked=False):
@@ -141,7 +433,7 @@ class XConnection(object):
         data_len = (2 ** 32 - 1) if data_len is None else data_len
 
         if isinstance(property, basestring):
-            property = xpybutil.util.get_atom(property)
+            property = atoms.get(property)
 
         cookie = xpybutil.conn.core.GetProperty(delete, windowID, property, type, data_offset, data_len)
 
@@ -195,6 +487,72 @@ class XConnection(object):
         except:
             logger.exception("Exception while updating xpybutil bindings for new modifier mapping!")
 
+    def onMappingNotify(self, event):
+        # MappingNotify events get sent to the xpybutil.keybind.update_keyboard_mapping function, to update the stored
+        # keyboard mapping. Don't process them right now; wait for the queue to empty first.
+        if event.request == Mapping.Keyboard:
+            logger.info("Got MappingNotifyEvent with request=Keyboard; queueing updateKeyboardMapping().")
+            if self.pendingUpdateKeyboardMapping is None:
+                singletons.eventloop.callWhenIdle(self.updateKeyboardMapping)
+            self.pendingUpdateKeyboardMapping = event
+
+        elif event.request == Mapping.Modifier:
+            logger.info("Got MappingNotifyEvent with request=Modifier; queueing updateModifierMapping().")
+            if self.pendingUpdateModifierMapping is None:
+                singletons.eventloop.callWhenIdle(self.updateModifierMapping)
+            self.pendingUpdateModifierMapping = event
+
+    def createDispatcher(self, event):
+        """Create a function which dispatches events of the same type as `event` to the callbacks registered for them
+        through `xpybutil.event.connect`.
+
+        """
+        eventClass = event.__class__
+
+        if eventClass is MappingNotifyEvent:
+            return self.onMappingNotify
+
+        if issubclass(eventClass, (CirculateRequestEvent, ConfigureRequestEvent, MapRequestEvent)):
+            # Send all SubstructureRedirect *Request events to the parent window, which should be the window which had
+            # the SubstructureRedirect mask set on it. (that is, if i'm reading the docs correctly)
+            getWindow = attrgetter('parent')
+
+        else:
+            # Every event of a given type has the same fields, so we only need to figure out which one holds the window
+            # once per type.
+            for attr in ('event', 'window', 'owner', 'requestor'):
+                if hasattr(event, attr):
+                    getWindow = attrgetter(attr)
+                    break
+            else:
+                getWindow = lambda event: None
+
+        callbacks = getattr(xpybutil.event, '__callbacks')
+
+        def dispatch(event):
+            window = getWindow(event)
+            for cb in callbacks.get((eventClass, window), ()):
+                try:
+                    cb(event)
+                except Exception:
+                    logger.exception("Error while calling callback %r for %r event on %r! Continuing...",
+                            cb, eventClass, window)
+
+        # Some events need to update the property cache before any handlers see them.
+        updateCache = {
+                PropertyNotifyEvent: self.properties.onPropertyNotify,
+                DestroyNotifyEvent: self.properties.onDestroyNotify,
+                }.get(eventClass)
+
+        if updateCache is None:
+            return dispatch
+
+        def updateCacheAndDispatch(event):
+            updateCache(event)
+            dispatch(event)
+
+        return updateCacheAndDispatch
+
     def handleXCBComm(self, stream, evt):
         """Read all incoming data from the X server, and process all resulting events.
 
@@ -202,67 +560,40 @@ class XConnection(object):
         #NOTE: This does several things that xpybutil.event.main doesn't do:
         # - ensures that the WM gets MapRequest events
         # - ensures that windows get SelectionRequest when appropriate
+        dispatchers = self.dispatchers
+
         try:
-            try:
-                xpybutil.event.read(block=False)
-            except xcb.ProtocolException, error:
-                self.printXCBExc(error)
-
-            for e in xpybutil.event.queue():
-                w = None
-
-                if isinstance(e, MappingNotifyEvent):
-                    # MappingNotify events get sent to the xpybutil.keybind.update_keyboard_mapping function, to
-                    # update the stored keyboard mapping.
-
-                    if e.request == Mapping.Keyboard:
-                        logger.info("Got MappingNotifyEvent with request=Keyboard; queueing updateKeyboardMapping().")
-                        if self.pendingUpdateKeyboardMapping is None:
-                            singletons.eventloop.callWhenIdle(self.updateKeyboardMapping)
-                        self.pendingUpdateKeyboardMapping = e
-
-                    elif e.request == Mapping.Modifier:
-                        logger.info("Got MappingNotifyEvent with request=Modifier; queueing updateModifierMapping().")
-                        if self.pendingUpdateModifierMapping is None:
-                            singletons.eventloop.callWhenIdle(self.updateModifierMapping)
-                        self.pendingUpdateModifierMapping = e
-
-                    # Don't process this event right now; wait for the queue to empty first.
+            # Keep going until the queue is completely empty; waiting on replies while handling events can pull more
+            # events off the socket without it becoming readable again, and with an edge-triggered event loop we
+            # wouldn't hear about those until something else arrived.
+            while True:
+                try:
+                    xpybutil.event.read(block=False)
+                except xcb.ProtocolException, error:
+                    self.printXCBExc(error)
                     continue
 
-                elif isinstance(e, (CirculateRequestEvent, ConfigureRequestEvent, MapRequestEvent)):
-                    # Send all SubstructureRedirect *Request events to the parent window, which should be the
-                    # window which had the SubstructureRedirect mask set on it. (that is, if i'm reading the docs
-                    # correctly)
-                    w = e.parent
-                elif hasattr(e, 'event'):
-                    w = e.event
-                elif hasattr(e, 'window'):
-                    w = e.window
-                elif hasattr(e, 'owner'):
-                    w = e.owner
-                elif hasattr(e, 'requestor'):
-                    w = e.requestor
-
-                key = (e.__class__, w)
-                #logger.debug("Calling callbacks for %r event on window %r...", *key)
-                for cb in getattr(xpybutil.event, '__callbacks').get(key, []):
-                    #logger.debug("  Calling callback %r...", cb)
-                    try:
-                        cb(e)
-                    except Exception:
-                        logger.exception("Error while calling callback %r for %r event on %r! Continuing...",
-                                cb, e.__class__, w)
-                    #logger.debug("  Callback %r finished.", cb)
-                #logger.debug("Finished calling callbacks for %r event on window %r.", *key)
-
-                #XXX: Debugging...
-                #if isinstance(e, ConfigureNotifyEvent):
-                #    logger.debug("Got ConfigureNotifyEvent: %r; w=%r; listeners: %r",
-                #            e.__dict__, w, getattr(xpybutil.event, '__callbacks').get(key, []))
-                #if isinstance(e, MapRequestEvent):
-                #    logger.debug("Got MapRequestEvent: %r; w=%r; listeners: %r",
-                #            e.__dict__, w, getattr(xpybutil.event, '__callbacks').get(key, []))
+                events = list(xpybutil.event.queue())
+                if not events:
+                    break
+
+                with self.batch():
+                    for e in compressEvents(events):
+                        try:
+                            dispatch = dispatchers[e.__class__]
+                        except KeyError:
+                            dispatch = dispatchers[e.__class__] = self.createDispatcher(e)
+
+                        dispatch(e)
+
+            # The server has answered us since these requests were sent, so fetch their replies now, together.
+            if self.awaitedReplies:
+                with self.batch() as batch:
+                    # `XBatch` keeps a reference to this list, so empty it in place.
+                    awaited = self.awaitedReplies[:]
+                    del self.awaitedReplies[:]
+                    for cookie, callback in awaited:
+                        batch.add(cookie, callback)
 
             self.conn.flush()
 
@@ -4,6 +4,7 @@ This module aims to implement the Desktop Application Autostart Specification ve
 http://standards.freedesktop.org/autostart-spec/autostart-spec-0.5.html
 
 """
+from .. import singletons
 from . import basedir, desktopentry
 
 
@@ -14,11 +15,24 @@ def getEntries():
             yield entry
 
 
-def execute():
+def executeAll():
     for entry in getEntries():
         entry.execute()
 
 
+def execute():
+    """Start all enabled autostart entries.
+
+    If the event loop is running, this happens on a worker thread, since finding and parsing the entries means reading
+    through several directories.
+
+    """
+    if singletons.eventloop is None:
+        executeAll()
+    else:
+        singletons.eventloop.runInExecutor(executeAll)
+
+
 if __name__ == '__main__':
     for entry in getEntries():
         print list(entry.getExec([]))
@@ -115,7 +115,7 @@ class BaseDirManager(object):
         #   case it may chose [sic] to present an error message to the user.
         fullpath = join(self.home, filename)
         if not isdir(dirname(fullpath)):
-            os.makedirs(fullpath, 0700)
+            os.makedirs(dirname(fullpath), 0700)
 
         return open(fullpath, mode)
 
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: LinkedList tests
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+import unittest
+
+from fttpwm.utils.linkedlist import LinkedList
+
+
+class LinkedListTests(unittest.TestCase):
+    def setUp(self):
+        self.items = LinkedList('abcde')
+
+    def assertOrder(self, expected):
+        self.assertEqual(list(self.items), list(expected))
+        self.assertEqual(len(self.items), len(expected))
+        self.assertEqual(self.items.first, expected[0] if expected else None)
+        self.assertEqual(self.items.last, expected[-1] if expected else None)
+
+        # The links must agree in both directions.
+        self.assertEqual([self.items.previous(item) for item in expected], list(expected[-1:] + expected[:-1]))
+
+    def testAppendAndIndex(self):
+        self.assertOrder('abcde')
+        self.assertEqual([self.items.index(item) for item in 'abcde'], range(5))
+        self.assertRaises(ValueError, self.items.index, 'z')
+        self.assertRaises(ValueError, self.items.append, 'a')
+
+    def testInsert(self):
+        self.items.insert(0, 'x')
+        self.assertOrder('xabcde')
+
+        self.items.insert(-3, 'y')
+        self.assertOrder('yxabcde')
+
+        self.items.insert(7, 'z')
+        self.assertOrder('yxabcdez')
+
+        self.items.insert(100, 'w')
+        self.assertOrder('yxabcdezw')
+
+        self.items.insert(3, 'v')
+        self.assertOrder('yxavbcdezw')
+
+    def testInsertBeforeAndAfter(self):
+        self.items.insertBefore('x', 'a')
+        self.assertOrder('xabcde')
+
+        self.items.insertAfter('y', 'e')
+        self.assertOrder('xabcdey')
+
+        self.items.insertAfter('z', 'b')
+        self.assertOrder('xabzcdey')
+
+    def testRemove(self):
+        self.items.remove('a')
+        self.assertOrder('bcde')
+
+        self.items.remove('e')
+        self.assertOrder('bcd')
+
+        self.items.discard('z')
+        self.items.discard('c')
+        self.assertOrder('bd')
+
+        self.items.remove('b')
+        self.items.remove('d')
+        self.assertOrder('')
+        self.assertRaises(KeyError, self.items.remove, 'b')
+
+    def testNextAndPrevious(self):
+        self.assertEqual(self.items.next('e'), 'a')
+        self.assertIsNone(self.items.next('e', wrap=False))
+        self.assertEqual(self.items.previous('a'), 'e')
+        self.assertIsNone(self.items.previous('a', wrap=False))
+        self.assertEqual(self.items.next('b', wrap=False), 'c')
+
+    def testSibling(self):
+        self.assertEqual(self.items.sibling('c', 0), 'c')
+        self.assertEqual(self.items.sibling('c', 2), 'e')
+        self.assertEqual(self.items.sibling('c', -2), 'a')
+
+        # Siblings wrap around at both ends.
+        self.assertEqual(self.items.sibling('e', 1), 'a')
+        self.assertEqual(self.items.sibling('a', -1), 'e')
+        self.assertEqual(self.items.sibling('d', 7), 'a')
+
+    def testMove(self):
+        self.items.move('b', 2)
+        self.assertOrder('acdbe')
+
+        self.items.move('b', -3)
+        self.assertOrder('bacde')
+
+    def testMoveStopsAtEnds(self):
+        self.items.move('a', -1)
+        self.assertOrder('abcde')
+
+        self.items.move('e', 1)
+        self.assertOrder('abcde')
+
+        self.items.move('d', 10)
+        self.assertOrder('abced')
+
+        self.items.move('b', -10)
+        self.assertOrder('baced')
+
+        self.items.move('b', 10)
+        self.assertOrder('acedb')
+
+        self.items.move('b', -10)
+        self.assertOrder('baced')
+
+    def testSingleItem(self):
+        items = self.items = LinkedList('a')
+
+        items.move('a', 1)
+        items.move('a', -1)
+        self.assertOrder('a')
+        self.assertEqual(items.sibling('a', 3), 'a')
+        self.assertIsNone(items.next('a', wrap=False))
+        self.assertIsNone(items.previous('a', wrap=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: Split tree tests
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+import unittest
+
+from fttpwm.layout.splittree import Leaf, Split, Tree
+
+
+class FakeFrame(object):
+    def __init__(self, clientWindowID):
+        self.clientWindowID = clientWindowID
+
+    def __repr__(self):
+        return '<FakeFrame {}>'.format(self.clientWindowID)
+
+
+class TreeTests(unittest.TestCase):
+    def setUp(self):
+        self.frames = [FakeFrame(clientWindowID) for clientWindowID in range(1, 7)]
+        self.tree = Tree()
+
+    def checkTree(self):
+        """Check that every split's ratios add up to 1, the parent links are right, and `order` matches the leaves.
+
+        """
+        tree = self.tree
+        leaves = []
+
+        def walk(node, parent):
+            self.assertIs(node.parent, parent)
+
+            if isinstance(node, Leaf):
+                self.assertIs(tree.leaves[node.frame], node)
+                leaves.append(node.frame)
+                return
+
+            self.assertGreater(len(node.children), 1, "Splits with fewer than 2 children should be collapsed.")
+            self.assertAlmostEqual(sum(child.ratio for child in node.children), 1.0)
+            for child in node.children:
+                walk(child, node)
+
+        if tree.root is not None:
+            self.assertEqual(tree.root.ratio, 1.0)
+            walk(tree.root, None)
+
+        self.assertEqual(leaves, list(tree.order))
+        self.assertEqual(len(leaves), len(tree.leaves))
+
+    def leaf(self, index):
+        return self.tree.leaves[self.frames[index]]
+
+    def build(self):
+        """Build the tree [0 | [1 / 2] | 3].
+
+        """
+        a, b, c, d = self.frames[:4]
+
+        self.tree.addFirst(a)
+        self.tree.split(self.leaf(0), b, horizontal=True, after=True)
+        self.tree.split(self.leaf(1), d, horizontal=True, after=True)
+        self.tree.split(self.leaf(1), c, horizontal=False, after=True)
+        self.checkTree()
+
+    def testSplit(self):
+        self.build()
+
+        root = self.tree.root
+        self.assertTrue(root.horizontal)
+        self.assertEqual([child.ratio for child in root.children], [0.5, 0.25, 0.25])
+
+        column = root.children[1]
+        self.assertIsInstance(column, Split)
+        self.assertFalse(column.horizontal)
+        self.assertEqual([leaf.frame for leaf in column.children], self.frames[1:3])
+        self.assertEqual(list(self.tree.order), self.frames[:4])
+
+    def testSplitBefore(self):
+        a, b = self.frames[:2]
+
+        self.tree.addFirst(a)
+        self.tree.split(self.leaf(0), b, horizontal=False, after=False)
+        self.checkTree()
+
+        self.assertEqual(list(self.tree.order), [b, a])
+        self.assertEqual([leaf.frame for leaf in self.tree.root.children], [b, a])
+
+    def testAddAtEdge(self):
+        self.build()
+
+        self.tree.addAtEdge(self.frames[4], horizontal=True, atEnd=True, fair=True)
+        self.checkTree()
+        self.assertAlmostEqual(self.leaf(4).ratio, 0.25)
+
+        self.tree.addAtEdge(self.frames[5], horizontal=False, atEnd=False, fair=False)
+        self.checkTree()
+        self.assertEqual(self.tree.order.first, self.frames[5])
+        self.assertFalse(self.tree.root.horizontal)
+
+    def testRemove(self):
+        self.build()
+
+        # Removing one leaf from the vertical split collapses it into its remaining child, which keeps its ratio.
+        self.tree.remove(self.frames[2])
+        self.checkTree()
+        self.assertIs(self.leaf(1).parent, self.tree.root)
+        self.assertEqual(self.leaf(1).ratio, 0.25)
+
+        self.tree.remove(self.frames[0])
+        self.checkTree()
+        self.assertAlmostEqual(self.leaf(1).ratio, 0.5)
+
+        self.tree.remove(self.frames[3])
+        self.checkTree()
+        self.assertIs(self.tree.root, self.leaf(1))
+
+        self.tree.remove(self.frames[1])
+        self.checkTree()
+        self.assertIsNone(self.tree.root)
+
+    def testSwap(self):
+        self.build()
+        a, b, c, d = self.frames[:4]
+        aLeaf, bLeaf = self.leaf(0), self.leaf(1)
+
+        self.tree.swap(a, b)
+        self.checkTree()
+        self.assertEqual(list(self.tree.order), [b, a, c, d])
+        self.assertIs(self.leaf(0), bLeaf)
+        self.assertIs(self.leaf(1), aLeaf)
+
+        # Swapping with the previous frame works too.
+        self.tree.swap(d, c)
+        self.checkTree()
+        self.assertEqual(list(self.tree.order), [b, a, d, c])
+
+    def testResize(self):
+        self.build()
+
+        self.tree.resize(self.frames[0], 0.2, 0.05)
+        self.checkTree()
+        self.assertAlmostEqual(self.leaf(0).ratio, 0.7)
+
+        self.tree.resize(self.frames[0], 1.0, 0.05)
+        self.checkTree()
+        self.assertAlmostEqual(self.leaf(0).ratio, 0.9)
+
+    def testRestore(self):
+        self.build()
+        self.tree.resize(self.frames[0], 0.1, 0.05)
+        description = self.tree.root.describe()
+        ratios = dict((frame, self.tree.leaves[frame].ratio) for frame in self.frames[:4])
+
+        framesByWindowID = dict((frame.clientWindowID, frame) for frame in self.frames)
+        self.tree = Tree()
+        self.tree.restore(description, framesByWindowID)
+        self.checkTree()
+
+        # With every window present, the saved ratios come back exactly.
+        self.assertEqual(self.tree.root.describe(), description)
+        self.assertEqual(dict((frame, self.tree.leaves[frame].ratio) for frame in self.frames[:4]), ratios)
+
+    def testRestoreWithMissingWindows(self):
+        self.build()
+        description = self.tree.root.describe()
+
+        # Leave out window 3 (frames[2]), which collapses the vertical split, and window 1 (frames[0]).
+        framesByWindowID = dict((frame.clientWindowID, frame) for frame in (self.frames[1], self.frames[3]))
+        self.tree = Tree()
+        self.tree.restore(description, framesByWindowID)
+        self.checkTree()
+
+        self.assertEqual(list(self.tree.order), [self.frames[1], self.frames[3]])
+        self.assertAlmostEqual(self.leaf(1).ratio, 0.5)
+        self.assertAlmostEqual(self.leaf(3).ratio, 0.5)
+
+    def testRestoreNothing(self):
+        self.tree.restore({'children': [{'window': 42, 'ratio': 1.0}]}, {})
+        self.checkTree()
+        self.assertIsNone(self.tree.root)
+
+
+if __name__ == '__main__':
+    unittest.main()
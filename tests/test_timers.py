@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""FTTPWM: TimerWheel tests
+
+Copyright (c) 2013 David H. Bronke
+Licensed under the MIT license; see the LICENSE file for details.
+
+"""
+import math
+import random
+import unittest
+
+from fttpwm.eventloop.timers import TimerWheel
+
+
+class FakeClock(object):
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TimerWheelTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+
+        # A tiny wheel (4 slots per level, 2 levels, so 15 ticks of range) makes cascading and out-of-range timers
+        # easy to reach.
+        self.wheel = TimerWheel(resolution=1.0, slotBits=2, levels=2, clock=self.clock)
+
+    def addTimer(self, delay):
+        return self.wheel.add(self.clock.now + delay, lambda: None)
+
+    def advanceTo(self, now):
+        self.clock.now = now
+        return self.wheel.advance()
+
+    def testEmpty(self):
+        self.assertEqual(len(self.wheel), 0)
+        self.assertIsNone(self.wheel.nextDeadline)
+        self.assertEqual(self.advanceTo(2000.0), [])
+
+    def testPastDeadlineFiresOnNextAdvance(self):
+        timer = self.wheel.add(self.clock.now - 5, lambda: None)
+
+        self.assertEqual(self.wheel.nextDeadline, timer.deadline)
+        self.assertEqual(self.wheel.advance(), [timer])
+        self.assertFalse(timer.pending)
+
+    def testOutOfRangeTimer(self):
+        far = self.addTimer(100)
+        near = self.addTimer(3)
+
+        self.assertEqual(len(self.wheel), 2)
+        self.assertEqual(self.wheel.nextDeadline, near.deadline)
+        self.assertEqual(self.advanceTo(1010.0), [near])
+
+        # The out-of-range timer must still be reported, both before and after it comes within range.
+        self.assertEqual(self.wheel.nextDeadline, far.deadline)
+        self.assertEqual(self.advanceTo(1095.0), [])
+        self.assertEqual(self.wheel.nextDeadline, far.deadline)
+        self.assertEqual(self.advanceTo(1100.0), [far])
+        self.assertEqual(len(self.wheel), 0)
+
+    def testRemove(self):
+        timer = self.addTimer(20)
+        other = self.addTimer(2)
+
+        timer.cancel()
+        self.assertEqual(len(self.wheel), 1)
+        self.assertEqual(self.wheel.nextDeadline, other.deadline)
+
+        other.cancel()
+        self.assertEqual(len(self.wheel), 0)
+        self.assertIsNone(self.wheel.nextDeadline)
+        self.assertEqual(self.advanceTo(2000.0), [])
+
+    def testMatchesSortedListModel(self):
+        rand = random.Random(1234)
+        model = []
+
+        def modelKey(timer):
+            return (timer.deadline, timer.sequence)
+
+        for step in range(2000):
+            action = rand.random()
+
+            if action < 0.5:
+                # Mostly near timers, but some far enough out to overflow the wheel.
+                delay = rand.uniform(0, 40) if rand.random() < 0.8 else rand.uniform(0, 5)
+                model.append(self.addTimer(delay))
+
+            elif action < 0.65 and model:
+                timer = rand.choice(model)
+                model.remove(timer)
+                timer.cancel()
+
+            else:
+                now = self.clock.now + rand.uniform(0, 8)
+                targetTick = int(now / self.wheel.resolution)
+
+                due = sorted(
+                        (timer for timer in model if math.ceil(timer.deadline / self.wheel.resolution) <= targetTick),
+                        key=modelKey)
+                for timer in due:
+                    model.remove(timer)
+
+                self.assertEqual(self.advanceTo(now), due, "Wrong timers expired at step {}.".format(step))
+
+            self.assertEqual(len(self.wheel), len(model))
+            self.assertEqual(self.wheel.nextDeadline, min(timer.deadline for timer in model) if model else None,
+                    "Wrong nextDeadline at step {}.".format(step))
+
+
+if __name__ == '__main__':
+    unittest.main()